@@ -0,0 +1,349 @@
+"""
+Fake Keycloak for benchmarks.
+
+Implements the subset of Keycloak the gateway and IAM call: the realm
+token endpoint (password, refresh_token and uma-ticket grants), revoke,
+JWKS, the OpenID discovery document, the admin users/roles/clients API
+and the custom MFA endpoints. Access tokens are real RS256 JWTs signed
+with a key generated at startup, so the gateway verifies them exactly as
+it verifies Keycloak's.
+
+State lives in memory. Every realm user accepts its own password and the
+shared bench password (BENCH_PASSWORD), because IAM generates random
+passwords the load generator never sees. OTP codes are accepted when they
+equal BENCH_OTP.
+
+Run with: uvicorn bench.fake_keycloak:create_app --factory
+Environment:
+    REALM, CLIENT_ID, SERVER_URL    must match the services' settings
+    BENCH_PASSWORD                  shared password (default "bench-password")
+    BENCH_OTP                       accepted OTP code (default "123456")
+    BENCH_KEYCLOAK_LATENCY_MS       added to every response (default 0)
+    BENCH_ACCESS_TOKEN_TTL          access token lifetime in seconds (default 300)
+"""
+
+import asyncio
+import os
+import time
+import uuid
+import jwt
+from typing import Dict, Optional
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+
+KID = "bench"
+BUILTIN_ROLES = ("offline_access", "uma_authorization")
+CUSTOM_ROLES = ("user", "admin", "systemAdmin")
+
+
+def _error(status_code: int, error: str, description: str) -> JSONResponse:
+    return JSONResponse({"error": error, "error_description": description}, status_code=status_code)
+
+
+class Realm:
+    """In-memory users, roles and signing key of one realm."""
+
+    def __init__(self, name: str, issuer: str, client_id: str, password: str, otp: str, token_ttl: int):
+        self.name = name
+        self.issuer = issuer
+        self.client_id = client_id
+        self.password = password
+        self.otp = otp
+        self.token_ttl = token_ttl
+        self.client_uuid = str(uuid.uuid4())
+        self.client_secret = uuid.uuid4().hex
+        self._private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        self.jwk = {
+            **jwt.algorithms.RSAAlgorithm.to_jwk(self._private_key.public_key(), as_dict=True),
+            "kid": KID, "use": "sig", "alg": "RS256",
+        }
+        self.roles: Dict[str, dict] = {}
+        for role_name in (f"default-roles-{name.lower()}", *BUILTIN_ROLES, *CUSTOM_ROLES):
+            self.roles[role_name] = {
+                "id": str(uuid.uuid4()),
+                "name": role_name,
+                "description": f"${{role_{role_name}}}" if role_name in BUILTIN_ROLES else role_name,
+                "composite": False,
+                "clientRole": False,
+                "containerId": name,
+            }
+        self.users: Dict[str, dict] = {}
+        self._by_username: Dict[str, str] = {}
+        self.revoked: set = set()
+
+    # users
+
+    def add_user(self, body: dict) -> Optional[dict]:
+        username = body["username"].lower()
+        if username in self._by_username:
+            return None
+        credentials = body.get("credentials") or [{}]
+        user = {
+            "id": str(uuid.uuid4()),
+            "username": username,
+            "firstName": body.get("firstName"),
+            "lastName": body.get("lastName"),
+            "email": body.get("email"),
+            "enabled": body.get("enabled", True),
+            "requiredActions": list(body.get("requiredActions") or []),
+            "password": credentials[0].get("value"),
+            "totp": False,
+            "roles": set(),
+        }
+        self.users[user["id"]] = user
+        self._by_username[username] = user["id"]
+        return user
+
+    def find_user(self, username: str) -> Optional[dict]:
+        user_id = self._by_username.get(username.lower())
+        return self.users.get(user_id) if user_id else None
+
+    def delete_user(self, user_id: str) -> bool:
+        user = self.users.pop(user_id, None)
+        if user:
+            self._by_username.pop(user["username"], None)
+        return user is not None
+
+    def check_password(self, user: dict, password: str) -> bool:
+        return user["enabled"] and password in (user["password"], self.password)
+
+    @staticmethod
+    def representation(user: dict) -> dict:
+        return {key: value for key, value in user.items() if key not in ("password", "totp", "roles")}
+
+    # tokens
+
+    def sign(self, claims: dict) -> str:
+        return jwt.encode(claims, self._private_key, algorithm="RS256", headers={"kid": KID})
+
+    def issue_tokens(self, user: dict) -> dict:
+        now = int(time.time())
+        access = {
+            "iss": self.issuer,
+            "aud": self.client_id,
+            "azp": self.client_id,
+            "sub": user["id"],
+            "typ": "Bearer",
+            "iat": now,
+            "exp": now + self.token_ttl,
+            "jti": uuid.uuid4().hex,
+            "preferred_username": user["username"],
+            "email": user["email"],
+            "realm_access": {"roles": sorted(user["roles"])},
+        }
+        refresh = {
+            "iss": self.issuer,
+            "aud": self.issuer,
+            "sub": user["id"],
+            "typ": "Refresh",
+            "iat": now,
+            "exp": now + self.token_ttl * 6,
+            "jti": uuid.uuid4().hex,
+        }
+        return {
+            "access_token": self.sign(access),
+            "expires_in": self.token_ttl,
+            "refresh_token": self.sign(refresh),
+            "refresh_expires_in": self.token_ttl * 6,
+            "token_type": "Bearer",
+            "scope": "openid",
+        }
+
+    def admin_token(self) -> dict:
+        now = int(time.time())
+        token = self.sign({"iss": f"{self.issuer.rsplit('/', 1)[0]}/master", "sub": "admin", "iat": now, "exp": now + 60})
+        return {"access_token": token, "expires_in": 60, "token_type": "Bearer"}
+
+    def decode_refresh(self, token: str) -> Optional[dict]:
+        try:
+            claims = jwt.decode(
+                token, self._private_key.public_key(), algorithms=["RS256"], audience=self.issuer, issuer=self.issuer
+            )
+        except jwt.InvalidTokenError:
+            return None
+        if claims.get("typ") != "Refresh" or claims["jti"] in self.revoked:
+            return None
+        return claims
+
+
+def create_app() -> FastAPI:
+    realm_name = os.environ.get("REALM", "templateRealm")
+    server_url = os.environ.get("SERVER_URL", "http://127.0.0.1:9000").rstrip("/")
+    latency = float(os.environ.get("BENCH_KEYCLOAK_LATENCY_MS", "0")) / 1000
+    realm = Realm(
+        name=realm_name,
+        issuer=f"{server_url}/realms/{realm_name}",
+        client_id=os.environ.get("CLIENT_ID", "templateApp"),
+        password=os.environ.get("BENCH_PASSWORD", "bench-password"),
+        otp=os.environ.get("BENCH_OTP", "123456"),
+        token_ttl=int(os.environ.get("BENCH_ACCESS_TOKEN_TTL", "300")),
+    )
+
+    app = FastAPI(title="Fake Keycloak")
+    app.state.realm = realm
+
+    @app.middleware("http")
+    async def simulated_latency(request: Request, call_next):
+        if latency:
+            await asyncio.sleep(latency)
+        return await call_next(request)
+
+    @app.get("/")
+    async def root():
+        return {"status": "ok"}
+
+    # realm endpoints
+
+    @app.get("/realms/{name}/.well-known/openid-configuration")
+    async def discovery(name: str):
+        base = f"{server_url}/realms/{name}/protocol/openid-connect"
+        return {"issuer": f"{server_url}/realms/{name}", "token_endpoint": f"{base}/token", "jwks_uri": f"{base}/certs"}
+
+    @app.get("/realms/{name}/protocol/openid-connect/certs")
+    async def certs(name: str):
+        return {"keys": [realm.jwk]}
+
+    @app.post("/realms/{name}/protocol/openid-connect/token")
+    async def token(name: str, request: Request):
+        form = await request.form()
+        grant_type = form.get("grant_type")
+        if name == "master":
+            return realm.admin_token()
+        if grant_type == "password":
+            user = realm.find_user(form.get("username", ""))
+            if not user or not realm.check_password(user, form.get("password", "")):
+                return _error(401, "invalid_grant", "Invalid user credentials")
+            if user["requiredActions"]:
+                return _error(400, "invalid_grant", "Account is not fully set up")
+            if user["totp"] and form.get("totp") != realm.otp:
+                return _error(401, "invalid_grant", "Invalid user credentials")
+            return realm.issue_tokens(user)
+        if grant_type == "refresh_token":
+            claims = realm.decode_refresh(form.get("refresh_token", ""))
+            user = realm.users.get(claims["sub"]) if claims else None
+            if not user:
+                return _error(400, "invalid_grant", "Invalid refresh token")
+            return realm.issue_tokens(user)
+        if grant_type == "urn:ietf:params:oauth:grant-type:uma-ticket":
+            # every authenticated caller is granted every resource
+            return {"access_token": "rpt", "token_type": "Bearer", "expires_in": realm.token_ttl}
+        return _error(400, "unsupported_grant_type", f"Unsupported grant type {grant_type}")
+
+    @app.post("/realms/{name}/protocol/openid-connect/revoke")
+    async def revoke(name: str, request: Request):
+        claims = realm.decode_refresh((await request.form()).get("token", ""))
+        if claims:
+            realm.revoked.add(claims["jti"])
+        return Response(status_code=200)
+
+    # custom MFA endpoints (keycloak_extensions/mfa-provider)
+
+    @app.post("/realms/{name}/mfa/auth/validate")
+    async def mfa_validate(name: str, body: dict):
+        user = realm.find_user(body.get("username", ""))
+        return {"valid": bool(user and realm.check_password(user, body.get("password", "")))}
+
+    @app.post("/realms/{name}/mfa/totp/enroll")
+    async def mfa_enroll(name: str, body: dict):
+        if body.get("userId") not in realm.users:
+            return _error(404, "not_found", "User not found")
+        return {"qrCodeDataUrl": "data:image/png;base64,iVBORw0KGgo=", "secret": "JBSWY3DPEHPK3PXP"}
+
+    @app.post("/realms/{name}/mfa/totp/verify")
+    async def mfa_verify(name: str, body: dict):
+        user = realm.users.get(body.get("userId"))
+        verified = bool(user) and body.get("otp") == realm.otp
+        if verified:
+            user["totp"] = True
+        return {"verified": verified}
+
+    # admin API
+
+    @app.get("/admin/realms/{name}/users")
+    async def list_users(name: str, username: Optional[str] = None):
+        if username:
+            user = realm.find_user(username)
+            return [realm.representation(user)] if user else []
+        return [realm.representation(user) for user in realm.users.values()]
+
+    @app.post("/admin/realms/{name}/users")
+    async def create_user(name: str, body: dict):
+        user = realm.add_user(body)
+        if not user:
+            return _error(409, "conflict", "User exists with same username")
+        return Response(status_code=201, headers={"Location": f"{server_url}/admin/realms/{name}/users/{user['id']}"})
+
+    @app.get("/admin/realms/{name}/users/{user_id}")
+    async def get_user(name: str, user_id: str):
+        user = realm.users.get(user_id)
+        return realm.representation(user) if user else _error(404, "not_found", "User not found")
+
+    @app.put("/admin/realms/{name}/users/{user_id}")
+    async def update_user(name: str, user_id: str, body: dict):
+        user = realm.users.get(user_id)
+        if not user:
+            return _error(404, "not_found", "User not found")
+        for key in ("firstName", "lastName", "email", "enabled", "requiredActions"):
+            if key in body:
+                user[key] = body[key]
+        return Response(status_code=204)
+
+    @app.delete("/admin/realms/{name}/users/{user_id}")
+    async def delete_user(name: str, user_id: str):
+        return Response(status_code=204) if realm.delete_user(user_id) else _error(404, "not_found", "User not found")
+
+    @app.put("/admin/realms/{name}/users/{user_id}/reset-password")
+    async def reset_password(name: str, user_id: str, body: dict):
+        if user_id not in realm.users:
+            return _error(404, "not_found", "User not found")
+        realm.users[user_id]["password"] = body.get("value")
+        return Response(status_code=204)
+
+    @app.post("/admin/realms/{name}/users/{user_id}/logout")
+    async def logout_user(name: str, user_id: str):
+        return Response(status_code=204)
+
+    @app.get("/admin/realms/{name}/users/{user_id}/role-mappings/realm")
+    async def get_role_mappings(name: str, user_id: str):
+        user = realm.users.get(user_id)
+        if not user:
+            return _error(404, "not_found", "User not found")
+        return [realm.roles[role] for role in sorted(user["roles"])]
+
+    @app.post("/admin/realms/{name}/users/{user_id}/role-mappings/realm")
+    async def add_role_mappings(name: str, user_id: str, request: Request):
+        user = realm.users.get(user_id)
+        if not user:
+            return _error(404, "not_found", "User not found")
+        user["roles"].update(role["name"] for role in await request.json())
+        return Response(status_code=204)
+
+    @app.delete("/admin/realms/{name}/users/{user_id}/role-mappings/realm")
+    async def remove_role_mappings(name: str, user_id: str, request: Request):
+        user = realm.users.get(user_id)
+        if not user:
+            return _error(404, "not_found", "User not found")
+        user["roles"].difference_update(role["name"] for role in await request.json())
+        return Response(status_code=204)
+
+    @app.get("/admin/realms/{name}/roles")
+    async def list_roles(name: str):
+        return list(realm.roles.values())
+
+    @app.get("/admin/realms/{name}/roles/{role_name}")
+    async def get_role(name: str, role_name: str):
+        role = realm.roles.get(role_name)
+        return role if role else _error(404, "not_found", "Could not find role")
+
+    @app.get("/admin/realms/{name}/clients")
+    async def list_clients(name: str, clientId: Optional[str] = None):
+        if clientId and clientId != realm.client_id:
+            return []
+        return [{"id": realm.client_uuid, "clientId": realm.client_id}]
+
+    @app.get("/admin/realms/{name}/clients/{client_uuid}/client-secret")
+    async def client_secret(name: str, client_uuid: str):
+        return {"type": "secret", "value": realm.client_secret}
+
+    return app
@@ -0,0 +1,36 @@
+"""
+IAM entrypoint for benchmarks.
+
+Runs the unmodified IAM app with two stand-ins swapped in before startup:
+Beanie is initialised on the in-memory database from bench.mongo, and the
+Keycloak authorization sync is skipped (the fake Keycloak has no authz
+resources; its uma-ticket grant always allows). Everything else, including
+role loading, system admin creation and the admin token manager, runs
+against the fake Keycloak exactly as in production.
+
+Run from iam/src with PYTHONPATH=.:<repo root>:
+    uvicorn bench.iam_app:app
+"""
+
+from beanie import init_beanie
+import main
+from core.config import Settings
+from bench.mongo import AsyncMongoClient
+
+
+async def init_memory_db(self):
+    from domains.users.models import User
+    from domains.service_versions.models import ServiceVersion
+
+    type(self)._motor_client = AsyncMongoClient()
+    await init_beanie(database=type(self)._motor_client[self.DB_NAME], document_models=[User, ServiceVersion])
+
+
+async def skip_authorization_sync(cleanup_and_build: bool = False) -> bool:
+    return True
+
+
+Settings.init_db = init_memory_db
+main.initialize_keycloak_server = skip_authorization_sync
+
+app = main.app
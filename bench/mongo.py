@@ -0,0 +1,153 @@
+"""
+In-memory MongoDB for benchmarks: a minimal Motor-compatible async facade
+over mongomock, enough for Beanie and the IAM data layer to run unchanged.
+
+Every call runs synchronously on the event loop. That keeps the database
+cost close to zero, so measured latency is dominated by the services
+themselves, not by a real mongod (which a benchmark run must not need).
+"""
+
+import mongomock
+from pymongo.errors import OperationFailure
+
+_CURSOR_METHODS = {"find", "aggregate", "list_indexes"}
+
+
+class AsyncCursor:
+    """Async iteration and to_list() over a mongomock cursor."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __getattr__(self, name):
+        attr = getattr(self._cursor, name)
+        if not callable(attr):
+            return attr
+
+        def chain(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            return self if result is self._cursor else result
+        return chain
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._cursor)
+        except StopIteration:
+            raise StopAsyncIteration
+
+    async def to_list(self, length=None):
+        if length is None:
+            return list(self._cursor)
+        items = []
+        for document in self._cursor:
+            items.append(document)
+            if len(items) >= length:
+                break
+        return items
+
+
+class AsyncCollection:
+    """Collection whose methods are awaitable; find/aggregate return AsyncCursor."""
+
+    def __init__(self, collection, database):
+        self._collection = collection
+        self.database = database
+        self.name = collection.name
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if not callable(attr):
+            return attr
+        if name in _CURSOR_METHODS:
+            return lambda *args, **kwargs: AsyncCursor(attr(*args, **_drop_unsupported(kwargs)))
+
+        async def call(*args, **kwargs):
+            return attr(*args, **_drop_unsupported(kwargs))
+        return call
+
+    def with_options(self, *args, **kwargs):
+        return self
+
+    def watch(self, *args, **kwargs):
+        # mongomock has no change streams; answer like a standalone mongod
+        raise OperationFailure("The $changeStream stage is only supported on replica sets", code=40573)
+
+    def __getitem__(self, name):
+        return AsyncCollection(self._collection[name], self.database)
+
+
+class AsyncDatabase:
+    def __init__(self, database, client):
+        self._database = database
+        self.client = client
+        self.name = database.name
+
+    def __getitem__(self, name):
+        return AsyncCollection(self._database[name], self)
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    async def command(self, command, *args, **kwargs):
+        if command in ("ping", {"ping": 1}):
+            return {"ok": 1.0}
+        if command in ("buildInfo", "buildinfo", {"buildInfo": 1}):
+            return {"version": "7.0.0", "versionArray": [7, 0, 0, 0], "ok": 1.0}
+        return self._database.command(command, *args, **kwargs)
+
+    async def list_collection_names(self, *args, **kwargs):
+        return self._database.list_collection_names()
+
+
+class AsyncSession:
+    """Client session stand-in; mongomock has no sessions, so operations ignore it."""
+
+    def __init__(self, client, causal_consistency=None, **kwargs):
+        self.client = client
+        self.causal_consistency = bool(causal_consistency)
+        self.in_transaction = False
+
+    async def end_session(self):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+
+class AsyncMongoClient:
+    """Stand-in for AsyncIOMotorClient backed by a process-local mongomock client."""
+
+    def __init__(self):
+        self._client = mongomock.MongoClient(tz_aware=True)
+
+    def __getitem__(self, name):
+        return AsyncDatabase(self._client[name], self)
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    async def start_session(self, causal_consistency=None, **kwargs):
+        return AsyncSession(self, causal_consistency, **kwargs)
+
+    async def server_info(self):
+        return {"version": "7.0.0", "versionArray": [7, 0, 0, 0], "ok": 1.0}
+
+    def close(self):
+        self._client.close()
+
+
+def _drop_unsupported(kwargs: dict) -> dict:
+    # Motor/Beanie pass sessions and comments that mongomock rejects or ignores
+    kwargs.pop("session", None)
+    kwargs.pop("comment", None)
+    return kwargs
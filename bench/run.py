@@ -0,0 +1,244 @@
+"""
+Benchmark runner.
+
+Starts the fake Keycloak, IAM (in-memory MongoDB) and the gateway as local
+uvicorn processes, seeds users through the API, runs the selected scenarios
+at a fixed concurrency and prints throughput and p50/p95/p99 latency per
+request. With --compare, the run fails when any request regressed against
+a saved report.
+
+    python -m bench.run --scenarios login,proxy_get --concurrency 50 --duration 20 --output bench.json
+    python -m bench.run --compare bench.json --max-regression 0.15
+
+Use --gateway-url/--iam-url to benchmark already running services instead
+(their Keycloak must accept --password for the seeded users).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import secrets
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+
+from bench.scenarios import SCENARIOS, BenchContext
+from bench.stats import Recorder, compare, format_table
+
+ROOT = Path(__file__).resolve().parent.parent
+
+SERVICE_ENV = {
+    "ENVIRONMENT": "bench",
+    "REALM": "benchRealm",
+    "CLIENT_ID": "benchApp",
+    "SCOPE": "openid",
+    "AUTHORIZATION_URL": "unused",
+    "TOKEN_URL": "unused",
+    "KC_BOOTSTRAP_ADMIN_USERNAME": "admin",
+    "KC_BOOTSTRAP_ADMIN_PASSWORD": "admin",
+    "MONGO_CONNECTION_STRING": "mongodb://in-memory",
+    "DB_NAME": "bench",
+    "APP_EMAIL": "bench@example.com",
+    "APP_PASSWORD": "unused",
+    "SYSTEM_ADMIN_USER_NAME": "sysadmin",
+    "SYSTEM_ADMIN_FIRST_NAME": "System",
+    "SYSTEM_ADMIN_LAST_NAME": "Admin",
+    "SYSTEM_ADMIN_EMAIL": "sysadmin@example.com",
+    "SYSTEM_ADMIN_PASSWORD": "bench-password",
+    # the load generator logs in from one IP, far beyond the default limits
+    "GATEWAY_LOGIN_RATE_LIMIT_PER_USERNAME": "100000000",
+    "GATEWAY_LOGIN_RATE_LIMIT_PER_IP": "100000000",
+}
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_ready(url: str, process: subprocess.Popen, timeout: float, log_path: Path):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with {process.returncode}, see {log_path}")
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} not ready after {timeout}s, see {log_path}")
+
+
+@contextmanager
+def local_stack(args, log_dir: Path):
+    """Run the fake Keycloak, IAM and gateway; yields (gateway_url, iam_url, identity_key)."""
+    keycloak_port, iam_port, gateway_port = _free_port(), _free_port(), _free_port()
+    keycloak_url = f"http://127.0.0.1:{keycloak_port}"
+    iam_url = f"http://127.0.0.1:{iam_port}"
+    gateway_url = f"http://127.0.0.1:{gateway_port}"
+    identity_key = secrets.token_hex(16)
+
+    env = {
+        **os.environ,
+        **SERVICE_ENV,
+        "SERVER_URL": keycloak_url,
+        "KEYCLOAK_FRONTEND_URL": keycloak_url,
+        "BENCH_PASSWORD": args.password,
+        "BENCH_OTP": args.otp,
+        "BENCH_KEYCLOAK_LATENCY_MS": str(args.keycloak_latency_ms),
+        "IAM_HOST": "127.0.0.1",
+        "IAM_PORT": str(iam_port),
+        "IAM_URL": iam_url,
+        "GATEWAY_HOST": "127.0.0.1",
+        "GATEWAY_PORT": str(gateway_port),
+        "GATEWAY_URL": gateway_url,
+        "INTERNAL_API_KEY": identity_key,
+    }
+    services = [
+        ("keycloak", ROOT, ["bench.fake_keycloak:create_app", "--factory"], keycloak_port, f"{keycloak_url}/"),
+        ("iam", ROOT / "iam" / "src", ["bench.iam_app:app"], iam_port, f"{iam_url}/health"),
+        ("gateway", ROOT / "gateway" / "src", ["main:app"], gateway_port, f"{gateway_url}/health"),
+    ]
+    processes: List[subprocess.Popen] = []
+    try:
+        for name, cwd, target, port, ready_url in services:
+            log_path = log_dir / f"{name}.log"
+            process = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", *target, "--host", "127.0.0.1", "--port", str(port),
+                 "--log-level", "warning", "--no-access-log"],
+                cwd=cwd,
+                env={**env, "PYTHONPATH": os.pathsep.join([str(cwd), str(ROOT)])},
+                stdout=open(log_path, "wb"),
+                stderr=subprocess.STDOUT,
+            )
+            processes.append(process)
+            _wait_ready(ready_url, process, args.startup_timeout, log_path)
+        yield gateway_url, iam_url, identity_key
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+async def run_scenario(scenario, ctx: BenchContext, client: httpx.AsyncClient, args) -> Dict[str, dict]:
+    """Run one scenario closed-loop: `concurrency` workers back to back, warmup excluded."""
+    await scenario.setup(client, ctx)
+    recorder = Recorder()
+    stop_at = time.monotonic() + args.warmup + args.duration
+
+    async def worker(index: int):
+        while time.monotonic() < stop_at:
+            await scenario.run(client, ctx, recorder, index)
+
+    async def measure():
+        await asyncio.sleep(args.warmup)
+        recorder.recording = True
+
+    await asyncio.gather(measure(), *(worker(i) for i in range(args.concurrency)))
+    return recorder.summary(args.duration)
+
+
+async def run_benchmarks(args, gateway_url: str, iam_url: str, identity_key) -> Dict[str, dict]:
+    ctx = BenchContext(
+        gateway_url=gateway_url,
+        iam_url=iam_url,
+        admin_username=args.admin_username,
+        password=args.password,
+        otp=args.otp,
+        identity_key=identity_key,
+        users=args.users,
+        bulk_rows=args.bulk_rows,
+        crud_target=args.crud_target,
+    )
+    limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency * 2)
+    results: Dict[str, dict] = {}
+    async with httpx.AsyncClient(timeout=args.request_timeout, limits=limits) as client:
+        for name in args.scenarios:
+            print(f"running {name}: {SCENARIOS[name].description}", file=sys.stderr)
+            results.update(await run_scenario(SCENARIOS[name](), ctx, client, args))
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench.run", description=__doc__.split("\n\n")[1])
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"comma-separated scenarios (default: all of {', '.join(SCENARIOS)})")
+    parser.add_argument("--concurrency", type=int, default=20, help="concurrent workers per scenario")
+    parser.add_argument("--duration", type=float, default=10, help="measured seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=2, help="unmeasured seconds before each scenario")
+    parser.add_argument("--users", type=int, default=20, help="users seeded per scenario")
+    parser.add_argument("--bulk-rows", type=int, default=20, help="rows per proxy_upload request")
+    parser.add_argument("--crud-target", choices=("gateway", "iam"), default="gateway",
+                        help="send iam_crud through the gateway or directly to IAM")
+    parser.add_argument("--keycloak-latency-ms", type=float, default=0, help="delay added to every fake Keycloak response")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--compare", help="baseline JSON report; exit 1 on regression")
+    parser.add_argument("--max-regression", type=float, default=0.10,
+                        help="allowed p95/p99 growth and throughput drop as a fraction (default 0.10)")
+    parser.add_argument("--gateway-url", help="benchmark a running gateway instead of starting one")
+    parser.add_argument("--iam-url", default="", help="IAM URL of the running stack (for --crud-target iam)")
+    parser.add_argument("--identity-key", default=os.environ.get("IDENTITY_SIGNING_KEY") or os.environ.get("INTERNAL_API_KEY"),
+                        help="identity signing key of the running stack (for --crud-target iam)")
+    parser.add_argument("--admin-username", default=SERVICE_ENV["SYSTEM_ADMIN_USER_NAME"])
+    parser.add_argument("--password", default="bench-password", help="password accepted for every seeded user")
+    parser.add_argument("--otp", default="123456", help="OTP code accepted by Keycloak")
+    parser.add_argument("--request-timeout", type=float, default=30)
+    parser.add_argument("--startup-timeout", type=float, default=60)
+    parser.add_argument("--log-dir", help="service logs directory (default: a temporary directory)")
+    args = parser.parse_args(argv)
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+    return args
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    log_dir = Path(args.log_dir or tempfile.mkdtemp(prefix="bench-"))
+    log_dir.mkdir(parents=True, exist_ok=True)
+
+    if args.gateway_url:
+        results = asyncio.run(run_benchmarks(args, args.gateway_url, args.iam_url, args.identity_key))
+    else:
+        with local_stack(args, log_dir) as (gateway_url, iam_url, identity_key):
+            results = asyncio.run(run_benchmarks(args, gateway_url, iam_url, identity_key))
+        print(f"service logs: {log_dir}", file=sys.stderr)
+
+    config = {key: getattr(args, key) for key in ("concurrency", "duration", "warmup", "users", "bulk_rows",
+                                                   "crud_target", "keycloak_latency_ms")}
+    report = {"created_at": datetime.now(timezone.utc).isoformat(), "config": config, "results": results}
+    print(format_table(results))
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        if baseline.get("config") != config:
+            print(f"warning: baseline config {baseline.get('config')} differs from {config}", file=sys.stderr)
+        regressions = compare(baseline["results"], results, args.max_regression)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) vs {args.compare}:")
+            print("\n".join(f"  {line}" for line in regressions))
+            return 1
+        print(f"\nno regressions vs {args.compare} (max {args.max_regression:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,275 @@
+"""
+Benchmark scenarios.
+
+Each scenario seeds what it needs through the public API in setup() and
+then runs iterations of one user journey in run(). All traffic goes
+through the gateway except iam_crud with target "iam", which calls IAM
+directly with a signed identity envelope to isolate the service's own cost.
+"""
+
+import itertools
+import uuid
+from typing import Dict, List, Optional
+
+import httpx
+
+from bench.stats import Recorder
+from shared.identity import encode_identity
+
+
+class BenchContext:
+    """Endpoints, credentials and seeded users shared by the scenarios."""
+
+    def __init__(
+        self,
+        gateway_url: str,
+        iam_url: str,
+        admin_username: str,
+        password: str,
+        otp: str,
+        identity_key: Optional[str],
+        users: int,
+        bulk_rows: int,
+        crud_target: str,
+    ):
+        self.gateway_url = gateway_url.rstrip("/")
+        self.iam_url = iam_url.rstrip("/")
+        self.admin_username = admin_username
+        self.password = password
+        self.otp = otp
+        self.identity_key = identity_key
+        self.users = users
+        self.bulk_rows = bulk_rows
+        self.crud_target = crud_target
+        self.run_id = uuid.uuid4().hex[:4]
+        self._counter = itertools.count()
+        self.admin: Optional[dict] = None
+
+    def unique_name(self, kind: str) -> str:
+        # usernames are limited to 20 characters of [a-zA-Z0-9_-]
+        return f"b{self.run_id}{kind}{next(self._counter)}"
+
+    def api(self, path: str) -> str:
+        return f"{self.gateway_url}/api/{path}"
+
+    @staticmethod
+    def bearer(session: dict) -> dict:
+        return {"Authorization": f"Bearer {session['access_token']}"}
+
+    async def login(self, client: httpx.AsyncClient, username: str, totp: Optional[str] = None) -> dict:
+        body = {"username": username, "password": self.password}
+        if totp:
+            body["totp"] = totp
+        response = await client.post(self.api("login"), json=body)
+        if response.status_code != 200:
+            raise RuntimeError(f"Login of {username} failed: {response.status_code} {response.text}")
+        return response.json()
+
+    async def ensure_admin(self, client: httpx.AsyncClient) -> dict:
+        if self.admin is None:
+            self.admin = await self.login(client, self.admin_username)
+        return self.admin
+
+    async def create_users(self, client: httpx.AsyncClient, kind: str, count: int, enable_mfa: bool = False) -> List[str]:
+        """Create users through the gateway as the system admin and return their usernames."""
+        admin = await self.ensure_admin(client)
+        usernames = []
+        for _ in range(count):
+            username = self.unique_name(kind)
+            response = await client.post(
+                self.api("user/create"),
+                json=_user_body(username, enable_mfa),
+                headers=self.bearer(admin),
+            )
+            if response.status_code != 200:
+                raise RuntimeError(f"Seeding {username} failed: {response.status_code} {response.text}")
+            usernames.append(username)
+        return usernames
+
+
+def _user_body(username: str, enable_mfa: bool = False) -> dict:
+    return {
+        "user_name": username,
+        "first_name": "Bench",
+        "last_name": "User",
+        "email": f"{username}@example.com",
+        "roles": ["user"],
+        "enable_mfa": enable_mfa,
+    }
+
+
+class Scenario:
+    name = ""
+    description = ""
+
+    async def setup(self, client: httpx.AsyncClient, ctx: BenchContext):
+        pass
+
+    async def run(self, client: httpx.AsyncClient, ctx: BenchContext, recorder: Recorder, worker: int):
+        raise NotImplementedError
+
+
+class Login(Scenario):
+    name = "login"
+    description = "Password login (token, user lookup)"
+
+    async def setup(self, client, ctx):
+        self.usernames = await ctx.create_users(client, "l", ctx.users)
+        self._next = itertools.cycle(self.usernames)
+
+    async def run(self, client, ctx, recorder, worker):
+        await recorder.request(
+            client, "login", "POST", ctx.api("login"), json={"username": next(self._next), "password": ctx.password}
+        )
+
+
+class LoginMfaVerify(Scenario):
+    name = "login_mfa_verify"
+    description = "MFA login: password challenge, then password + OTP"
+
+    async def setup(self, client, ctx):
+        self.usernames = await ctx.create_users(client, "v", ctx.users, enable_mfa=True)
+        for username in self.usernames:
+            # completes CONFIGURE_TOTP so later logins require the OTP
+            await ctx.login(client, username, totp=ctx.otp)
+        self._next = itertools.cycle(self.usernames)
+
+    async def run(self, client, ctx, recorder, worker):
+        username = next(self._next)
+        await recorder.request(
+            client, "login_mfa_challenge", "POST", ctx.api("login"),
+            json={"username": username, "password": ctx.password},
+        )
+        await recorder.request(
+            client, "login_mfa_verify", "POST", ctx.api("login"),
+            json={"username": username, "password": ctx.password, "totp": ctx.otp},
+        )
+
+
+class LoginMfaSetup(Scenario):
+    name = "login_mfa_setup"
+    description = "First login of an MFA user (TOTP enrollment QR code)"
+
+    async def setup(self, client, ctx):
+        self.usernames = await ctx.create_users(client, "s", ctx.users, enable_mfa=True)
+        self._next = itertools.cycle(self.usernames)
+
+    async def run(self, client, ctx, recorder, worker):
+        await recorder.request(
+            client, "login_mfa_setup", "POST", ctx.api("login"), json={"username": next(self._next), "password": ctx.password}
+        )
+
+
+class Refresh(Scenario):
+    name = "refresh"
+    description = "Token refresh"
+
+    async def setup(self, client, ctx):
+        usernames = await ctx.create_users(client, "r", ctx.users)
+        self.tokens = [(await ctx.login(client, username))["refresh_token"] for username in usernames]
+        self._next = itertools.cycle(self.tokens)
+
+    async def run(self, client, ctx, recorder, worker):
+        await recorder.request(client, "refresh", "POST", ctx.api("refresh"), json={"refresh_token": next(self._next)})
+
+
+class _Sessions(Scenario):
+    """Base for scenarios that call the API as logged-in users (one per worker slot)."""
+
+    async def setup(self, client, ctx):
+        usernames = await ctx.create_users(client, "p", ctx.users)
+        self.sessions = [await ctx.login(client, username) for username in usernames]
+
+    def session(self, worker: int) -> dict:
+        return self.sessions[worker % len(self.sessions)]
+
+
+class ProxyGet(_Sessions):
+    name = "proxy_get"
+    description = "Proxied GET of the caller's own profile (user/get)"
+
+    async def run(self, client, ctx, recorder, worker):
+        await recorder.request(client, "proxy_get", "GET", ctx.api("user/get"), headers=ctx.bearer(self.session(worker)))
+
+
+class ProxyGetCached(_Sessions):
+    name = "proxy_get_cached"
+    description = "Proxied GET served from the gateway response cache (user/roles)"
+
+    async def run(self, client, ctx, recorder, worker):
+        await recorder.request(
+            client, "proxy_get_cached", "GET", ctx.api("user/roles"), headers=ctx.bearer(self.session(worker))
+        )
+
+
+class ProxyPost(_Sessions):
+    name = "proxy_post"
+    description = "Proxied JSON POST (user/get_many for the seeded users)"
+
+    async def setup(self, client, ctx):
+        await super().setup(client, ctx)
+        self.admin = await ctx.ensure_admin(client)
+        self.body = {"user_ids": [session["user"]["id"] for session in self.sessions]}
+
+    async def run(self, client, ctx, recorder, worker):
+        await recorder.request(
+            client, "proxy_post", "POST", ctx.api("user/get_many"), json=self.body, headers=ctx.bearer(self.admin)
+        )
+
+
+class ProxyUpload(Scenario):
+    name = "proxy_upload"
+    description = "Streamed upload through the gateway (CSV bulk import of new users)"
+
+    async def setup(self, client, ctx):
+        self.admin = await ctx.ensure_admin(client)
+
+    async def run(self, client, ctx, recorder, worker):
+        lines = ["user_name,first_name,last_name,email,roles"]
+        for _ in range(ctx.bulk_rows):
+            username = ctx.unique_name("u")
+            lines.append(f"{username},Bench,User,{username}@example.com,user")
+        await recorder.request(
+            client, "proxy_upload", "POST", ctx.api("user/bulk_create"),
+            content="\n".join(lines).encode(),
+            headers={**ctx.bearer(self.admin), "Content-Type": "text/csv"},
+        )
+
+
+class IamCrud(Scenario):
+    name = "iam_crud"
+    description = "Create, get, update and delete a user (through the gateway or directly on IAM)"
+
+    async def setup(self, client, ctx):
+        admin = await ctx.ensure_admin(client)
+        if ctx.crud_target == "iam":
+            if not ctx.identity_key:
+                raise RuntimeError("iam_crud with target iam needs the identity signing key")
+            self.base = ctx.iam_url
+            self.headers = {"X-Identity": encode_identity(ctx.identity_key, 3600, admin["user"]["id"], admin["user"]["roles"])}
+        else:
+            self.base = f"{ctx.gateway_url}/api/user"
+            self.headers = ctx.bearer(admin)
+
+    async def run(self, client, ctx, recorder, worker):
+        username = ctx.unique_name("c")
+        created = await recorder.request(
+            client, "crud_create", "POST", f"{self.base}/create", json=_user_body(username), headers=self.headers
+        )
+        user_id = created.json().get("user_id") if created is not None and created.status_code == 200 else None
+        if not user_id:
+            return
+        await recorder.request(client, "crud_get", "GET", f"{self.base}/get/{user_id}", headers=self.headers)
+        await recorder.request(
+            client, "crud_update", "PUT", f"{self.base}/update",
+            json={"user_id": user_id, "first_name": "Renamed"}, headers=self.headers,
+        )
+        await recorder.request(client, "crud_delete", "DELETE", f"{self.base}/delete/{user_id}", headers=self.headers)
+
+
+SCENARIOS: Dict[str, type] = {
+    scenario.name: scenario
+    for scenario in (
+        Login, LoginMfaVerify, LoginMfaSetup, Refresh, ProxyGet, ProxyGetCached, ProxyPost, ProxyUpload, IamCrud
+    )
+}
@@ -0,0 +1,125 @@
+"""
+Latency recording, percentile reports and baseline comparison.
+"""
+
+import math
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+class Recorder:
+    """
+    Per-request-name latency samples for one scenario run.
+
+    Samples are only kept while `recording` is True, so warmup traffic
+    exercises caches and pools without skewing the report.
+    """
+
+    def __init__(self):
+        self.recording = False
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.error_samples: Dict[str, str] = {}
+
+    def add(self, name: str, seconds: float, ok: bool, detail: str = ""):
+        if not self.recording:
+            return
+        self.latencies.setdefault(name, []).append(seconds)
+        if not ok:
+            self.errors[name] = self.errors.get(name, 0) + 1
+            self.error_samples.setdefault(name, detail[:200])
+
+    async def request(
+        self,
+        client: httpx.AsyncClient,
+        name: str,
+        method: str,
+        url: str,
+        expect: int = 200,
+        **kwargs,
+    ) -> Optional[httpx.Response]:
+        """Send a request, recording its latency; a status other than expect counts as an error."""
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            self.add(name, time.perf_counter() - started, False, f"{type(e).__name__}: {e}")
+            return None
+        ok = response.status_code == expect
+        self.add(name, time.perf_counter() - started, ok, "" if ok else f"{response.status_code}: {response.text}")
+        return response
+
+    def summary(self, duration: float) -> Dict[str, dict]:
+        results = {}
+        for name, values in self.latencies.items():
+            values = sorted(values)
+            errors = self.errors.get(name, 0)
+            result = {
+                "requests": len(values),
+                "errors": errors,
+                "error_rate": round(errors / len(values), 4),
+                "throughput_rps": round(len(values) / duration, 2) if duration else 0.0,
+                "mean_ms": round(sum(values) / len(values) * 1000, 3),
+                "max_ms": round(values[-1] * 1000, 3),
+            }
+            for pct in PERCENTILES:
+                result[f"p{pct}_ms"] = round(percentile(values, pct) * 1000, 3)
+            if name in self.error_samples:
+                result["first_error"] = self.error_samples[name]
+            results[name] = result
+        return results
+
+
+def format_table(results: Dict[str, dict]) -> str:
+    header = f"{'request':<24}{'count':>8}{'err%':>7}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    lines = [header, "-" * len(header)]
+    for name, result in sorted(results.items()):
+        lines.append(
+            f"{name:<24}{result['requests']:>8}{result['error_rate'] * 100:>7.1f}{result['throughput_rps']:>10.1f}"
+            f"{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+        )
+    return "\n".join(lines)
+
+
+def compare(baseline: Dict[str, dict], current: Dict[str, dict], max_regression: float) -> List[str]:
+    """
+    Compare two reports' results request by request.
+
+    A request regresses when its p95 or p99 latency grows, or its throughput
+    drops, by more than max_regression (0.1 = 10%), or its error rate rises.
+    Requests missing from either report are skipped.
+
+    Returns:
+        One line per regression (empty when none)
+    """
+    regressions = []
+    for name, before in sorted(baseline.items()):
+        after = current.get(name)
+        if after is None:
+            continue
+        for metric in ("p95_ms", "p99_ms"):
+            if before[metric] > 0 and after[metric] > before[metric] * (1 + max_regression):
+                regressions.append(
+                    f"{name}: {metric} {before[metric]:.2f} -> {after[metric]:.2f} "
+                    f"(+{(after[metric] / before[metric] - 1) * 100:.1f}%)"
+                )
+        if before["throughput_rps"] > 0 and after["throughput_rps"] < before["throughput_rps"] * (1 - max_regression):
+            regressions.append(
+                f"{name}: throughput_rps {before['throughput_rps']:.1f} -> {after['throughput_rps']:.1f} "
+                f"(-{(1 - after['throughput_rps'] / before['throughput_rps']) * 100:.1f}%)"
+            )
+        if after["error_rate"] > before["error_rate"]:
+            regressions.append(f"{name}: error_rate {before['error_rate']:.4f} -> {after['error_rate']:.4f}")
+    return regressions
@@ -1,6 +1,7 @@
 from fastapi import FastAPI
-from .routes import gateway
+from .routes import gateway, internal
 
 
 def init_routes(app: FastAPI):
-    app.include_router(gateway.router)
\ No newline at end of file
+    app.include_router(gateway.router)
+    app.include_router(internal.router)
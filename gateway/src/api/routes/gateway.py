@@ -1,11 +1,14 @@
-from fastapi import APIRouter, Request, status
-from starlette.responses import JSONResponse
+from fastapi import APIRouter, Header, Request, Response, status
+from shared.http import FastJSONResponse
 from typing import Union
-from services.proxy import process_request, get_by_keycloak_uid
+from core.config import settings
+from services.proxy import process_request, stream_request, get_by_keycloak_uid
 from services.auth import handle_login, handle_refresh, handle_logout
+from services.rate_limit import check_login_rate, client_ip, login_limiter
 from schemas.gateway import Login, Refresh
-from auth_gateway_serverkit.middleware.auth import auth
-from auth_gateway_serverkit.middleware.auth import get_user_info
+from services.token_verifier import get_user_info
+from middleware.auth import auth
+from shared.metrics import metrics_response
 from auth_gateway_serverkit.logger import init_logger
 
 logger = init_logger(__name__)
@@ -16,20 +19,34 @@ router = APIRouter()
 
 @router.get("/health")
 async def health():
-    return JSONResponse(content={"status": "ok"}, status_code=status.HTTP_200_OK)
+    return FastJSONResponse(content={"status": "ok"}, status_code=status.HTTP_200_OK)
+
+
+@router.get("/metrics")
+async def metrics(authorization: Union[str, None] = Header(default=None)):
+    # served on the public listener, so never without a token
+    return metrics_response(authorization, settings.METRICS_TOKEN, require_token=True)
 
 
 @router.post("/api/login")
-async def login(request: Login):
+async def login(request: Login, http_request: Request):
     try:
+        retry_after = await check_login_rate(request.username, client_ip(http_request))
+        if retry_after:
+            return FastJSONResponse(
+                content={"message": "Too many login attempts"},
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                headers={"Retry-After": str(retry_after)}
+            )
+
         login_response = await handle_login(request)
 
         # MFA or error dict response (not an httpx Response)
         if isinstance(login_response, dict):
             if login_response.get("mfa_required"):
-                return JSONResponse(content=login_response, status_code=status.HTTP_200_OK)
+                return FastJSONResponse(content=login_response, status_code=status.HTTP_200_OK)
             if login_response.get("error"):
-                return JSONResponse(
+                return FastJSONResponse(
                     content={"message": login_response.get("message")},
                     status_code=login_response.get("status_code", status.HTTP_400_BAD_REQUEST)
                 )
@@ -40,10 +57,11 @@ async def login(request: Login):
             user_payload = await get_user_info(res.get("access_token"))
             user = await get_by_keycloak_uid(user_payload.id)
             if user is None:
-                return JSONResponse(
+                return FastJSONResponse(
                     content={"message": "User not found"},
                     status_code=status.HTTP_404_NOT_FOUND
                 )
+            await login_limiter.reset(f"user:{request.username.lower()}")
             data = {
                 "access_token": res.get("access_token"),
                 "expires_in": res.get("expires_in"),
@@ -51,12 +69,12 @@ async def login(request: Login):
                 "refresh_token": res.get("refresh_token"),
                 "user": user,
             }
-            return JSONResponse(content=data, status_code=status.HTTP_200_OK)
+            return FastJSONResponse(content=data, status_code=status.HTTP_200_OK)
         else:
-            return JSONResponse(content=login_response.json(), status_code=login_response.status_code)
+            return FastJSONResponse(content=login_response.json(), status_code=login_response.status_code)
     except Exception as e:
         logger.error(f"Login error: {str(e)}")
-        return JSONResponse(
+        return FastJSONResponse(
             content={"message": "Internal Server Error"},
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
@@ -67,7 +85,7 @@ async def refresh(request: Refresh):
     try:
         refresh_response = await handle_refresh(request.refresh_token)
         if refresh_response is None:
-            return JSONResponse(
+            return FastJSONResponse(
                 content={"message": "Failed to refresh token"},
                 status_code=status.HTTP_400_BAD_REQUEST
             )
@@ -76,7 +94,7 @@ async def refresh(request: Refresh):
             user_payload = await get_user_info(res.get("access_token"))
             user = await get_by_keycloak_uid(user_payload.id)
             if user is None:
-                return JSONResponse(
+                return FastJSONResponse(
                     content={"message": "User not found"},
                     status_code=status.HTTP_404_NOT_FOUND
                 )
@@ -87,14 +105,14 @@ async def refresh(request: Refresh):
                 "refresh_token": res.get("refresh_token"),
                 "user": user,
             }
-            return JSONResponse(content=data, status_code=status.HTTP_200_OK)
-        return JSONResponse(
+            return FastJSONResponse(content=data, status_code=status.HTTP_200_OK)
+        return FastJSONResponse(
             content=refresh_response.json(),
             status_code=refresh_response.status_code
         )
     except Exception as e:
         logger.error(f"Refresh error: {str(e)}")
-        return JSONResponse(
+        return FastJSONResponse(
             content={"message": "Internal Server Error"},
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
@@ -105,22 +123,22 @@ async def logout(request: Refresh):
     try:
         logout_response = await handle_logout(request.refresh_token)
         if logout_response is None:
-            return JSONResponse(
+            return FastJSONResponse(
                 content={"message": "Failed to revoke token"},
                 status_code=status.HTTP_400_BAD_REQUEST
             )
         if logout_response.status_code in (200, 204):
-            return JSONResponse(
+            return FastJSONResponse(
                 content={"message": "Logged out successfully"},
                 status_code=status.HTTP_200_OK
             )
-        return JSONResponse(
+        return FastJSONResponse(
             content=logout_response.json() if logout_response.content else {"message": "Logout failed"},
             status_code=logout_response.status_code
         )
     except Exception as e:
         logger.error(f"Logout error: {str(e)}")
-        return JSONResponse(
+        return FastJSONResponse(
             content={"message": "Internal Server Error"},
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
@@ -136,20 +154,32 @@ async def handle_request(
     path: Union[str, None] = None
 ):
     try:
+        # Large payload routes are passed through as streams, never parsed
+        if settings.is_streaming_route(service, action):
+            return await stream_request(service, action, request, path)
+
         # Process the request
         response = await process_request(service, action, request, path)
 
+        # Upstream answered in final client shape: forward its bytes unchanged
+        if isinstance(response, Response):
+            return response
+
         # Extract the status code from the response, defaulting to 400 if not found
         status_code = response.pop("status_code", status.HTTP_400_BAD_REQUEST)
 
+        # Set when the upstream is shedding load or its circuit is open
+        retry_after = response.pop("retry_after", None)
+        headers = {"Retry-After": str(retry_after)} if retry_after else None
+
         # Extract the data from the response if it exists
         data = response.get("data", response)
 
         # Return the JSON response with the appropriate status code
-        return JSONResponse(content=data, status_code=status_code)
+        return FastJSONResponse(content=data, status_code=status_code, headers=headers)
     except Exception as e:
         logger.error(f"Request error: {str(e)}")
-        return JSONResponse(
+        return FastJSONResponse(
             content={"message": "Internal Server Error"},
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
\ No newline at end of file
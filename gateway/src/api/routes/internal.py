@@ -0,0 +1,68 @@
+import hmac
+from fastapi import APIRouter, Header, status
+from shared.http import FastJSONResponse
+from typing import Union
+from core.config import settings
+from schemas.gateway import InvalidateUser, PurgeCache
+from services.user_cache import invalidate_user, user_cache
+from services.user_batcher import user_batcher
+from services.user_events import user_events
+from services.response_cache import response_cache
+from services.admin_token import admin_tokens
+from services.rate_limit import login_limiter
+from services.upstream import upstreams
+
+router = APIRouter(prefix="/internal")
+
+
+def is_internal_caller(api_key: Union[str, None]) -> bool:
+    """Check the shared internal API key sent by trusted services."""
+    if not settings.INTERNAL_API_KEY or not api_key:
+        return False
+    return hmac.compare_digest(api_key, settings.INTERNAL_API_KEY)
+
+
+@router.post("/users/invalidate")
+async def invalidate_cached_user(
+    request: InvalidateUser,
+    x_internal_key: Union[str, None] = Header(default=None)
+):
+    if not is_internal_caller(x_internal_key):
+        return FastJSONResponse(content={"message": "Access denied"}, status_code=status.HTTP_403_FORBIDDEN)
+    removed = invalidate_user(request.keycloak_uid)
+    return FastJSONResponse(content={"invalidated": removed}, status_code=status.HTTP_200_OK)
+
+
+@router.post("/cache/purge")
+async def purge_response_cache(
+    request: PurgeCache,
+    x_internal_key: Union[str, None] = Header(default=None)
+):
+    if not is_internal_caller(x_internal_key):
+        return FastJSONResponse(content={"message": "Access denied"}, status_code=status.HTTP_403_FORBIDDEN)
+    removed = response_cache.purge_tags(request.tags)
+    return FastJSONResponse(content={"purged": removed}, status_code=status.HTTP_200_OK)
+
+
+@router.get("/cache/stats")
+async def cache_stats(x_internal_key: Union[str, None] = Header(default=None)):
+    if not is_internal_caller(x_internal_key):
+        return FastJSONResponse(content={"message": "Access denied"}, status_code=status.HTTP_403_FORBIDDEN)
+    return FastJSONResponse(
+        content={
+            "users": user_cache.stats(),
+            "user_batches": user_batcher.stats(),
+            "user_events": user_events.stats(),
+            "responses": response_cache.stats(),
+            "admin_token": admin_tokens.stats(),
+            "login_rate_limit": login_limiter.stats(),
+        },
+        status_code=status.HTTP_200_OK
+    )
+
+
+@router.get("/upstreams")
+async def upstream_status(x_internal_key: Union[str, None] = Header(default=None)):
+    if not is_internal_caller(x_internal_key):
+        return FastJSONResponse(content={"message": "Access denied"}, status_code=status.HTTP_403_FORBIDDEN)
+    return FastJSONResponse(content=upstreams.health(), status_code=status.HTTP_200_OK)
@@ -18,14 +18,109 @@ class Settings(BaseSettings):
     ENVIRONMENT: str = Field(default="local", alias="ENVIRONMENT")
     CORS_ORIGINS: str = Field(default="*", alias="CORS_ORIGINS")
 
-    # environment-specific URLs
+    # environment-specific URLs (comma-separated for several instances)
     IAM_URL: str
     SERVICE_MAP: dict = {}
 
+    # client-side load balancing across instances: round_robin, least_outstanding or p2c
+    LB_STRATEGY: str = Field(default="round_robin", alias="GATEWAY_LB_STRATEGY")
+    HEALTH_CHECK_INTERVAL: float = Field(default=10.0, alias="GATEWAY_HEALTH_CHECK_INTERVAL")
+    HEALTH_CHECK_TIMEOUT: float = Field(default=2.0, alias="GATEWAY_HEALTH_CHECK_TIMEOUT")
+    HEALTH_CHECK_PATHS: list = Field(default=["/health", "/readyz"], alias="GATEWAY_HEALTH_CHECK_PATHS")
+    EJECT_AFTER_FAILURES: int = Field(default=2, alias="GATEWAY_EJECT_AFTER_FAILURES")
+    READMIT_AFTER_SUCCESSES: int = Field(default=1, alias="GATEWAY_READMIT_AFTER_SUCCESSES")
+
+    # upstream connection pools (defaults, overridable per SERVICE_MAP key)
+    UPSTREAM_MAX_CONNECTIONS: int = Field(default=100, alias="GATEWAY_UPSTREAM_MAX_CONNECTIONS")
+    UPSTREAM_MAX_KEEPALIVE: int = Field(default=20, alias="GATEWAY_UPSTREAM_MAX_KEEPALIVE")
+    UPSTREAM_KEEPALIVE_EXPIRY: float = Field(default=30.0, alias="GATEWAY_UPSTREAM_KEEPALIVE_EXPIRY")
+    UPSTREAM_CONNECT_TIMEOUT: float = Field(default=5.0, alias="GATEWAY_UPSTREAM_CONNECT_TIMEOUT")
+    UPSTREAM_READ_TIMEOUT: float = Field(default=150.0, alias="GATEWAY_UPSTREAM_READ_TIMEOUT")
+    UPSTREAM_HTTP2: bool = Field(default=False, alias="GATEWAY_UPSTREAM_HTTP2")
+    # load shedding and circuit breaker (error rate / p95 latency over the last N calls)
+    UPSTREAM_MAX_IN_FLIGHT: int = Field(default=200, alias="GATEWAY_UPSTREAM_MAX_IN_FLIGHT")
+    BREAKER_WINDOW: int = Field(default=100, alias="GATEWAY_BREAKER_WINDOW")
+    BREAKER_MIN_CALLS: int = Field(default=20, alias="GATEWAY_BREAKER_MIN_CALLS")
+    BREAKER_ERROR_RATE: float = Field(default=0.5, alias="GATEWAY_BREAKER_ERROR_RATE")
+    BREAKER_P95_MS: float = Field(default=10000, alias="GATEWAY_BREAKER_P95_MS")
+    BREAKER_OPEN_SECONDS: float = Field(default=30, alias="GATEWAY_BREAKER_OPEN_SECONDS")
+    BREAKER_HALF_OPEN_CALLS: int = Field(default=1, alias="GATEWAY_BREAKER_HALF_OPEN_CALLS")
+    # JSON object, e.g. {"user": {"max_connections": 200, "read_timeout": 30, "max_in_flight": 50}}
+    UPSTREAM_OVERRIDES: dict = Field(default={}, alias="GATEWAY_UPSTREAM_OVERRIDES")
+
+    # routes proxied as raw streams instead of parsed JSON, e.g. ["files/upload"]; explicit service/action
+    # pairs only: their bodies are never seen by the system-admin guard, so list no route taking ids in the body
+    STREAMING_ROUTES: list = Field(default=["user/bulk_create"], alias="GATEWAY_STREAMING_ROUTES")
+
+    # GET response cache: {"service/action": ttl} or {"service/action": {"ttl": 60, "stale": 300}}
+    RESPONSE_CACHE_ROUTES: dict = Field(default={"user/roles": {"ttl": 60, "stale": 300}}, alias="GATEWAY_RESPONSE_CACHE_ROUTES")
+    RESPONSE_CACHE_MAX_SIZE: int = Field(default=5000, alias="GATEWAY_RESPONSE_CACHE_MAX_SIZE")
+
+    # response compression, in order of preference ("br" and "zstd" need the brotli / zstandard packages)
+    COMPRESSION_ENCODINGS: list = Field(default=["gzip"], alias="GATEWAY_COMPRESSION_ENCODINGS")
+    COMPRESSION_MIN_SIZE: int = Field(default=1024, alias="GATEWAY_COMPRESSION_MIN_SIZE")
+    COMPRESSION_CONTENT_TYPES: list = Field(
+        default=["application/json", "application/x-ndjson", "text/"],
+        alias="GATEWAY_COMPRESSION_CONTENT_TYPES"
+    )
+
+    # GET /metrics requires 'Authorization: Bearer <token>'; metrics are not served while unset
+    METRICS_TOKEN: Optional[str] = Field(default=None, alias="GATEWAY_METRICS_TOKEN")
+
+    # tracing: W3C traceparent is always propagated; spans are recorded for sampled traces
+    # and exported to TRACING_FILE_PATH ("file") or an OTLP/HTTP collector ("otlp")
+    TRACING_EXPORTER: str = Field(default="none", alias="GATEWAY_TRACING_EXPORTER")
+    TRACING_SAMPLE_RATIO: float = Field(default=0.01, alias="GATEWAY_TRACING_SAMPLE_RATIO")
+    TRACING_FILE_PATH: str = Field(default="gateway-traces.jsonl", alias="GATEWAY_TRACING_FILE_PATH")
+    TRACING_OTLP_ENDPOINT: Optional[str] = Field(default=None, alias="GATEWAY_TRACING_OTLP_ENDPOINT")
+    # follow the sampled flag of a client's traceparent (otherwise only its trace id is kept)
+    TRACING_TRUST_INCOMING: bool = Field(default=False, alias="GATEWAY_TRACING_TRUST_INCOMING")
+
+    # internal service-to-service calls (e.g. IAM cache invalidation)
+    INTERNAL_API_KEY: Optional[str] = Field(default=None, alias="INTERNAL_API_KEY")
+    # HMAC key signing the X-Identity envelope sent upstream (defaults to INTERNAL_API_KEY)
+    IDENTITY_SIGNING_KEY: Optional[str] = Field(default=None, alias="IDENTITY_SIGNING_KEY")
+    IDENTITY_TTL: int = Field(default=60, alias="GATEWAY_IDENTITY_TTL")
+
+    # user lookup cache (keyed by Keycloak UID)
+    USER_CACHE_TTL: int = Field(default=60, alias="GATEWAY_USER_CACHE_TTL")
+    USER_CACHE_MAX_SIZE: int = Field(default=10000, alias="GATEWAY_USER_CACHE_MAX_SIZE")
+    # IAM user change feed: cached users are invalidated as they change, so they may live longer while it is connected
+    USER_EVENTS_ENABLED: bool = Field(default=True, alias="GATEWAY_USER_EVENTS_ENABLED")
+    USER_CACHE_FEED_TTL: int = Field(default=3600, alias="GATEWAY_USER_CACHE_FEED_TTL")
+    USER_EVENTS_RETRY_SECONDS: float = Field(default=5.0, alias="GATEWAY_USER_EVENTS_RETRY_SECONDS")
+    # longer than IAM's USER_EVENTS_HEARTBEAT_SECONDS, so a silent connection is detected
+    USER_EVENTS_READ_TIMEOUT: float = Field(default=45.0, alias="GATEWAY_USER_EVENTS_READ_TIMEOUT")
+    # cache misses within this window share one IAM get_many call (0 disables batching)
+    USER_BATCH_WINDOW_MS: float = Field(default=5.0, alias="GATEWAY_USER_BATCH_WINDOW_MS")
+    USER_BATCH_MAX_SIZE: int = Field(default=100, alias="GATEWAY_USER_BATCH_MAX_SIZE")
+
+    # Keycloak admin token is renewed at this fraction of its lifetime
+    ADMIN_TOKEN_REFRESH_FRACTION: float = Field(default=0.75, alias="GATEWAY_ADMIN_TOKEN_REFRESH_FRACTION")
+
+    # login rate limiting (sliding window per client IP and per username, 0 disables a limit)
+    LOGIN_RATE_LIMIT_WINDOW: int = Field(default=60, alias="GATEWAY_LOGIN_RATE_LIMIT_WINDOW")
+    LOGIN_RATE_LIMIT_PER_USERNAME: int = Field(default=10, alias="GATEWAY_LOGIN_RATE_LIMIT_PER_USERNAME")
+    LOGIN_RATE_LIMIT_PER_IP: int = Field(default=100, alias="GATEWAY_LOGIN_RATE_LIMIT_PER_IP")
+    # e.g. redis://redis:6379/0 to share counters across workers (needs the 'redis' package)
+    RATE_LIMIT_STORE_URL: Optional[str] = Field(default=None, alias="GATEWAY_RATE_LIMIT_STORE_URL")
+    RATE_LIMIT_MAX_KEYS: int = Field(default=100000, alias="GATEWAY_RATE_LIMIT_MAX_KEYS")
+    TRUST_FORWARDED_FOR: bool = Field(default=False, alias="GATEWAY_TRUST_FORWARDED_FOR")
+
+    # local token verification (JWKS + verified payload cache)
+    JWKS_MIN_REFRESH_INTERVAL: int = Field(default=30, alias="GATEWAY_JWKS_MIN_REFRESH_INTERVAL")
+    TOKEN_CACHE_MAX_SIZE: int = Field(default=50000, alias="GATEWAY_TOKEN_CACHE_MAX_SIZE")
+    TOKEN_CACHE_MAX_TTL: int = Field(default=300, alias="GATEWAY_TOKEN_CACHE_MAX_TTL")
+    ENTITLEMENT_CACHE_TTL: int = Field(default=30, alias="GATEWAY_ENTITLEMENT_CACHE_TTL")
+
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
 
     SYSTEM_ADMIN_ID: ClassVar[Optional[str]] = None
 
+    @property
+    def identity_signing_key(self) -> Optional[str]:
+        return self.IDENTITY_SIGNING_KEY or self.INTERNAL_API_KEY
+
     @property
     def reload(self) -> bool:
         """Check if the application should be reloaded based on the environment."""
@@ -36,10 +131,67 @@ class Settings(BaseSettings):
         self.SERVICE_MAP = {
             "user": self.IAM_URL,
         }
+        wildcards = [route for route in self.STREAMING_ROUTES if "*" in route]
+        if wildcards:
+            raise ValueError(f"GATEWAY_STREAMING_ROUTES must list explicit service/action routes, got {wildcards}")
+        # IAM's invalidation calls reach one worker; every worker follows the feed
+        if self.WORKERS > 1 and not self.USER_EVENTS_ENABLED:
+            raise ValueError("GATEWAY_WORKERS > 1 needs GATEWAY_USER_EVENTS_ENABLED: IAM invalidations reach a single worker")
+
+    def get_instances(self, service: str) -> list:
+        """Instance base URLs of a SERVICE_MAP entry (a URL, comma-separated URLs or a list)."""
+        urls = self.SERVICE_MAP.get(service) or []
+        if isinstance(urls, str):
+            urls = urls.split(",")
+        return [url.strip().rstrip("/") for url in urls if url.strip()]
+
+    def get_upstream_config(self, service: str) -> dict:
+        """Connection pool and breaker settings for a SERVICE_MAP entry, with per-service overrides applied."""
+        config = {
+            "max_connections": self.UPSTREAM_MAX_CONNECTIONS,
+            "max_keepalive": self.UPSTREAM_MAX_KEEPALIVE,
+            "keepalive_expiry": self.UPSTREAM_KEEPALIVE_EXPIRY,
+            "connect_timeout": self.UPSTREAM_CONNECT_TIMEOUT,
+            "read_timeout": self.UPSTREAM_READ_TIMEOUT,
+            "http2": self.UPSTREAM_HTTP2,
+            "max_in_flight": self.UPSTREAM_MAX_IN_FLIGHT,
+            "breaker_window": self.BREAKER_WINDOW,
+            "breaker_min_calls": self.BREAKER_MIN_CALLS,
+            "breaker_error_rate": self.BREAKER_ERROR_RATE,
+            "breaker_p95_ms": self.BREAKER_P95_MS,
+            "breaker_open_seconds": self.BREAKER_OPEN_SECONDS,
+            "breaker_half_open_calls": self.BREAKER_HALF_OPEN_CALLS,
+            "lb_strategy": self.LB_STRATEGY,
+        }
+        config.update(self.UPSTREAM_OVERRIDES.get(service, {}))
+        return config
+
+    def is_streaming_route(self, service: str, action: str) -> bool:
+        """Check if a service/action pair is configured for streaming pass-through."""
+        return f"{service}/{action}" in self.STREAMING_ROUTES
+
+    def get_response_cache_policy(self, service: str, action: str) -> Optional[tuple]:
+        """Return (ttl, stale) for a cacheable GET route, or None if it is not cached."""
+        policy = self.RESPONSE_CACHE_ROUTES.get(f"{service}/{action}")
+        if policy is None:
+            return None
+        if isinstance(policy, dict):
+            return float(policy.get("ttl", 0)), float(policy.get("stale", 0))
+        return float(policy), 0.0
 
     async def get_system_admin_id(self):
         if not type(self).SYSTEM_ADMIN_ID:
-            type(self).SYSTEM_ADMIN_ID = await http.get(url=self.SERVICE_MAP.get("user") + "/get_sys_id")
+            # imported here: services.identity reads these settings at import time
+            from services.identity import system_identity_headers
+            last_error = None
+            for base_url in self.get_instances("user"):
+                try:
+                    type(self).SYSTEM_ADMIN_ID = await http.get(url=base_url + "/get_sys_id", headers=system_identity_headers())
+                    break
+                except Exception as e:
+                    last_error = e
+            else:
+                raise last_error or Exception("No user service instances configured")
             logger.info(f"System admin ID: {type(self).SYSTEM_ADMIN_ID}")
         return type(self).SYSTEM_ADMIN_ID
 
@@ -4,7 +4,15 @@ from contextlib import asynccontextmanager
 from core.config import settings
 from api import init_routes
 from middleware.security_headers import SecurityHeadersMiddleware
+from services.token_verifier import token_verifier
+from services.upstream import upstreams
+from services.admin_token import admin_tokens
+from services.rate_limit import login_limiter
+from services.user_events import user_events
 from shared.logging import log_startup, log_shutdown
+from shared.http import CompressionMiddleware, FastJSONResponse
+from shared.metrics import MetricsMiddleware, HTTP_LATENCY
+from shared.tracing import TracingMiddleware, setup_tracing, shutdown_tracing
 
 SERVICE_NAME = "Gateway"
 VERSION = "1.0.0"
@@ -12,6 +20,19 @@ VERSION = "1.0.0"
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    setup_tracing(
+        SERVICE_NAME,
+        settings.TRACING_EXPORTER,
+        settings.TRACING_SAMPLE_RATIO,
+        settings.TRACING_FILE_PATH,
+        settings.TRACING_OTLP_ENDPOINT,
+    )
+    await upstreams.start()
+    await token_verifier.refresh_keys(force=True)
+    admin_tokens.install_for_serverkit()
+    admin_tokens.start_background_refresh()
+    if settings.USER_EVENTS_ENABLED:
+        user_events.start()
     log_startup(
         service_name=SERVICE_NAME,
         version=VERSION,
@@ -21,10 +42,15 @@ async def lifespan(app: FastAPI):
         workers=settings.WORKERS
     )
     yield
+    await user_events.stop()
+    await admin_tokens.stop_background_refresh()
+    await login_limiter.close()
+    await upstreams.close()
+    await shutdown_tracing()
     log_shutdown(SERVICE_NAME)
 
 
-app = FastAPI(title=SERVICE_NAME, lifespan=lifespan)
+app = FastAPI(title=SERVICE_NAME, lifespan=lifespan, default_response_class=FastJSONResponse)
 cors_origins = [o.strip() for o in settings.CORS_ORIGINS.split(",")]
 app.add_middleware(SecurityHeadersMiddleware)
 app.add_middleware(
@@ -34,6 +60,15 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+if settings.COMPRESSION_ENCODINGS:
+    app.add_middleware(
+        CompressionMiddleware,
+        encodings=settings.COMPRESSION_ENCODINGS,
+        minimum_size=settings.COMPRESSION_MIN_SIZE,
+        content_types=settings.COMPRESSION_CONTENT_TYPES,
+    )
+app.add_middleware(MetricsMiddleware, histogram=HTTP_LATENCY, path_params=("service", "action"))
+app.add_middleware(TracingMiddleware, trust_sampled=settings.TRACING_TRUST_INCOMING)
 init_routes(app)
 
 if __name__ == "__main__":
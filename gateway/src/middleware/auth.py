@@ -0,0 +1,116 @@
+"""
+Gateway auth decorator.
+
+Same contract as auth_gateway_serverkit.middleware.auth.auth, but tokens are
+verified in-process (services.token_verifier) and positive entitlement
+decisions are cached per token and resource, so a warm request does not
+call Keycloak at all.
+"""
+import time
+import httpx
+from fastapi import HTTPException, Request, status
+from functools import wraps
+from typing import Callable, Any
+from core.config import settings
+from shared.cache import TTLCache
+from shared.keycloak import keycloak_call
+from shared.metrics import register_cache
+from services.token_verifier import get_payload, token_hash
+from auth_gateway_serverkit.keycloak.client import get_client_secret
+from auth_gateway_serverkit.middleware.config import settings as auth_settings
+from auth_gateway_serverkit.logger import init_logger
+
+logger = init_logger(__name__)
+
+_entitlement_client = httpx.AsyncClient(timeout=20)
+entitlement_cache = TTLCache(max_size=settings.TOKEN_CACHE_MAX_SIZE, ttl=settings.ENTITLEMENT_CACHE_TTL)
+register_cache("entitlements", entitlement_cache.stats)
+
+
+async def check_entitlement(token: str, resource_id: str) -> bool:
+    """
+    Check if the token has access to a specific resource in Keycloak.
+
+    :param token: User's access token.
+    :param resource_id: Resource to check access for (e.g., service/action).
+    :return: True if access is granted, False otherwise.
+    """
+    try:
+        if not auth_settings.CLIENT_SECRET:
+            client_secret = await get_client_secret()
+            if not client_secret:
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail="Failed to get client secret"
+                )
+            auth_settings.CLIENT_SECRET = client_secret
+
+        token_url = f"{auth_settings.SERVER_URL}/realms/{auth_settings.REALM}/protocol/openid-connect/token"
+        headers = {
+            "Content-Type": "application/x-www-form-urlencoded",
+            "Authorization": f"Bearer {token}",
+        }
+        data = {
+            "grant_type": "urn:ietf:params:oauth:grant-type:uma-ticket",
+            "client_id": auth_settings.CLIENT_ID,
+            "client_secret": auth_settings.CLIENT_SECRET,
+            "audience": auth_settings.CLIENT_ID,
+            "permission": resource_id,
+        }
+        async with keycloak_call("entitlement"):
+            response = await _entitlement_client.post(token_url, data=data, headers=headers)
+        if response.status_code == 200 and "access_token" in response.json():
+            return True
+        logger.error(response.text)
+        return False
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error checking entitlement: {str(e)}")
+        return False
+
+
+async def is_entitled(token: str, payload: dict, resource_id: str) -> bool:
+    """Cached entitlement check; only grants are cached, never denials."""
+    cache_key = (token_hash(token), resource_id)
+    if entitlement_cache.get(cache_key):
+        return True
+    entitled = await check_entitlement(token, resource_id)
+    ttl = min(payload.get("exp", 0) - time.time(), settings.ENTITLEMENT_CACHE_TTL)
+    if entitled and ttl > 0:
+        entitlement_cache.set(cache_key, True, ttl=ttl)
+    return entitled
+
+
+def auth(get_user_by_uid: Callable[[str], Any]):
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(request: Request, *args, **kwargs):
+            token = request.headers.get("Authorization")
+            if not token:
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Authorization token missing"
+                )
+            token = token.replace("Bearer ", "")
+            payload = await get_payload(token)
+            resource = f"{kwargs.get('service')}/{kwargs.get('action')}"
+
+            # Verify that the user has the permission to execute the request
+            if not await is_entitled(token, payload, resource):
+                raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
+
+            user = await get_user_by_uid(payload.get("sub"))
+            if not user:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="User not found"
+                )
+            request.state.user = user
+
+            # Call the original function if authorization is successful
+            return await func(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
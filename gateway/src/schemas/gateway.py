@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Optional, List
 
 
 class Login(BaseModel):
@@ -16,3 +16,17 @@ class Refresh(BaseModel):
 
     class Config:
         extra = 'forbid'
+
+
+class InvalidateUser(BaseModel):
+    keycloak_uid: str = Field(min_length=1, max_length=64)
+
+    class Config:
+        extra = 'forbid'
+
+
+class PurgeCache(BaseModel):
+    tags: List[str] = Field(min_length=1, max_length=100)
+
+    class Config:
+        extra = 'forbid'
@@ -0,0 +1,8 @@
+from core.config import settings
+from shared.keycloak import AdminTokenManager, instrument_keycloak
+from auth_gateway_serverkit.keycloak.client import get_admin_token
+
+admin_tokens = AdminTokenManager(
+    fetch_token=instrument_keycloak("admin_token")(get_admin_token),
+    refresh_fraction=settings.ADMIN_TOKEN_REFRESH_FRACTION,
+)
@@ -1,9 +1,9 @@
 from fastapi import status
+from shared.keycloak import keycloak_call
 from auth_gateway_serverkit.logger import init_logger
-from auth_gateway_serverkit.keycloak.client import retrieve_client_token, refresh_client_token, revoke_client_token, get_admin_token
+from auth_gateway_serverkit.keycloak.client import retrieve_client_token, refresh_client_token, revoke_client_token
 from services.mfa import (
     validate_password,
-    get_keycloak_uid_by_username,
     get_user_required_actions,
     remove_required_action,
     enroll_mfa,
@@ -28,7 +28,8 @@ async def handle_login(login_data):
        - Password invalid -> return the original Keycloak error
     """
     try:
-        response = await retrieve_client_token(login_data.username, login_data.password, login_data.totp)
+        async with keycloak_call("token"):
+            response = await retrieve_client_token(login_data.username, login_data.password, login_data.totp)
 
         if response is None:
             return {"error": True, "message": "Authentication service unavailable", "status_code": status.HTTP_503_SERVICE_UNAVAILABLE}
@@ -56,15 +57,11 @@ async def handle_login(login_data):
 
 async def _handle_account_not_setup(login_data):
     """Handle CONFIGURE_TOTP required action flow."""
-    admin_token = await get_admin_token()
-    if not admin_token:
-        return {"error": True, "message": "Authentication service error", "status_code": status.HTTP_500_INTERNAL_SERVER_ERROR}
-
-    keycloak_uid = await get_keycloak_uid_by_username(admin_token, login_data.username)
-    if not keycloak_uid:
+    user_state = await get_user_required_actions(login_data.username)
+    if not user_state:
         return {"error": True, "message": "User not found", "status_code": status.HTTP_404_NOT_FOUND}
 
-    required_actions = await get_user_required_actions(admin_token, keycloak_uid)
+    keycloak_uid, required_actions = user_state
 
     if "CONFIGURE_TOTP" not in required_actions:
         return {"error": True, "message": f"Account setup required: {', '.join(required_actions)}", "status_code": status.HTTP_400_BAD_REQUEST}
@@ -73,7 +70,7 @@ async def _handle_account_not_setup(login_data):
         verified = await verify_mfa_otp(keycloak_uid, login_data.totp)
         if not verified:
             return {"error": True, "message": "Invalid OTP code", "status_code": status.HTTP_400_BAD_REQUEST}
-        await remove_required_action(admin_token, keycloak_uid, "CONFIGURE_TOTP")
+        await remove_required_action(keycloak_uid, "CONFIGURE_TOTP", required_actions)
         return {"mfa_required": True, "mfa_action": "setup_complete", "message": "MFA setup complete. Please login again with your OTP code."}
 
     qr_data = await enroll_mfa(keycloak_uid)
@@ -85,7 +82,8 @@ async def _handle_account_not_setup(login_data):
 
 async def handle_refresh(refresh_token: str):
     try:
-        return await refresh_client_token(refresh_token)
+        async with keycloak_call("refresh"):
+            return await refresh_client_token(refresh_token)
     except Exception as e:
         logger.error(f"Error during refresh: {str(e)}")
         raise
@@ -93,7 +91,8 @@ async def handle_refresh(refresh_token: str):
 
 async def handle_logout(refresh_token: str):
     try:
-        return await revoke_client_token(refresh_token)
+        async with keycloak_call("logout"):
+            return await revoke_client_token(refresh_token)
     except Exception as e:
         logger.error(f"Error during logout: {str(e)}")
         raise
@@ -0,0 +1,132 @@
+import asyncio
+import itertools
+import random
+from contextlib import asynccontextmanager
+from typing import List, Optional
+from auth_gateway_serverkit.logger import init_logger
+
+logger = init_logger(__name__)
+
+ROUND_ROBIN = "round_robin"
+LEAST_OUTSTANDING = "least_outstanding"
+POWER_OF_TWO = "p2c"
+STRATEGIES = (ROUND_ROBIN, LEAST_OUTSTANDING, POWER_OF_TWO)
+
+
+class Instance:
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.in_flight = 0
+        self.healthy = True
+        self.consecutive_failures = 0
+        self.consecutive_successes = 0
+        self.last_error: Optional[str] = None
+
+    def snapshot(self) -> dict:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "in_flight": self.in_flight,
+            "consecutive_failures": self.consecutive_failures,
+            "last_error": self.last_error,
+        }
+
+
+class ServiceBalancer:
+    """
+    Client-side load balancing across the instances of one upstream service.
+
+    Instances failing `eject_after` consecutive health checks are taken out
+    of rotation until they pass `readmit_after` checks in a row. If every
+    instance is ejected, all of them are used again rather than failing
+    every request.
+    """
+
+    def __init__(self, service: str, urls: List[str], strategy: str, eject_after: int = 2, readmit_after: int = 1):
+        if strategy not in STRATEGIES:
+            logger.warning(f"Unknown balancing strategy '{strategy}' for '{service}', using {ROUND_ROBIN}")
+            strategy = ROUND_ROBIN
+        self.service = service
+        self.strategy = strategy
+        self.eject_after = eject_after
+        self.readmit_after = readmit_after
+        self.instances = [Instance(url) for url in urls]
+        self._counter = itertools.count()
+
+    def _candidates(self) -> List[Instance]:
+        healthy = [instance for instance in self.instances if instance.healthy]
+        return healthy or self.instances
+
+    def pick(self) -> Instance:
+        candidates = self._candidates()
+        if len(candidates) == 1:
+            return candidates[0]
+        if self.strategy == LEAST_OUTSTANDING:
+            fewest = min(instance.in_flight for instance in candidates)
+            tied = [instance for instance in candidates if instance.in_flight == fewest]
+            return tied[next(self._counter) % len(tied)]
+        if self.strategy == POWER_OF_TWO:
+            first, second = random.sample(candidates, 2)
+            return first if first.in_flight <= second.in_flight else second
+        return candidates[next(self._counter) % len(candidates)]
+
+    @asynccontextmanager
+    async def acquire(self):
+        """Pick an instance and count the request against it while it runs."""
+        instance = self.pick()
+        instance.in_flight += 1
+        try:
+            yield instance
+        finally:
+            instance.in_flight -= 1
+
+    def record_check(self, instance: Instance, ok: bool, error: Optional[str] = None):
+        if ok:
+            instance.consecutive_failures = 0
+            instance.consecutive_successes += 1
+            instance.last_error = None
+            if not instance.healthy and instance.consecutive_successes >= self.readmit_after:
+                instance.healthy = True
+                logger.info(f"Upstream instance {instance.url} ({self.service}) back in rotation")
+            return
+        instance.consecutive_successes = 0
+        instance.consecutive_failures += 1
+        instance.last_error = error
+        if instance.healthy and instance.consecutive_failures >= self.eject_after:
+            instance.healthy = False
+            logger.warning(f"Upstream instance {instance.url} ({self.service}) ejected: {error}")
+
+    def snapshot(self) -> dict:
+        return {
+            "strategy": self.strategy,
+            "instances": [instance.snapshot() for instance in self.instances],
+        }
+
+
+async def check_instance(client, balancer: ServiceBalancer, instance: Instance, paths: List[str], timeout: float):
+    """Probe one instance; it is healthy only if every path answers 200."""
+    for path in paths:
+        try:
+            response = await client.get(f"{instance.url}{path}", timeout=timeout)
+            if response.status_code != 200:
+                balancer.record_check(instance, False, f"{path} returned {response.status_code}")
+                return
+        except Exception as e:
+            balancer.record_check(instance, False, f"{path} failed: {type(e).__name__}")
+            return
+    balancer.record_check(instance, True)
+
+
+async def run_health_checks(upstreams, services: List[str], paths: List[str], interval: float, timeout: float):
+    """Periodically probe every instance of every service."""
+    while True:
+        checks = []
+        for service in services:
+            balancer = upstreams.balancer(service)
+            client = upstreams.get(service)
+            checks.extend(check_instance(client, balancer, instance, paths, timeout) for instance in balancer.instances)
+        try:
+            await asyncio.gather(*checks)
+        except Exception as e:
+            logger.error(f"Health check round failed: {e}")
+        await asyncio.sleep(interval)
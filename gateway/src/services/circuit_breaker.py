@@ -0,0 +1,192 @@
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Optional
+from auth_gateway_serverkit.logger import init_logger
+
+logger = init_logger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class UpstreamUnavailable(Exception):
+    """Raised instead of calling an upstream that is shedding load or whose breaker is open."""
+
+    def __init__(self, service: str, reason: str, retry_after: int):
+        super().__init__(f"Upstream '{service}' unavailable: {reason}")
+        self.service = service
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class UpstreamCall:
+    """Outcome of one guarded call; callers mark upstream-side failures (e.g. 5xx)."""
+
+    def __init__(self):
+        self.failed = False
+
+
+class UpstreamGuard:
+    """
+    Circuit breaker and in-flight limit for one upstream.
+
+    The breaker looks at the last `window` calls. Once at least `min_calls`
+    are recorded it opens when the error rate reaches `error_rate` or the
+    p95 latency exceeds `p95_ms`. After `open_seconds` it lets
+    `half_open_calls` probes through: a successful probe closes it, a
+    failed one opens it again. Only probes decide the half-open state;
+    calls admitted before the circuit opened are ignored when they finish.
+    Calls beyond `max_in_flight` are rejected immediately instead of
+    queueing.
+    """
+
+    def __init__(
+        self,
+        service: str,
+        max_in_flight: int,
+        window: int,
+        min_calls: int,
+        error_rate: float,
+        p95_ms: float,
+        open_seconds: float,
+        half_open_calls: int,
+    ):
+        self.service = service
+        self.max_in_flight = max_in_flight
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.p95_ms = p95_ms
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self.state = CLOSED
+        self.in_flight = 0
+        self.rejected = 0
+        self.opened_count = 0
+        self._outcomes: deque = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probes = 0
+        # incremented on every switch to half-open, so a probe's outcome is only counted in its own cycle
+        self._cycle = 0
+
+    def _retry_after(self) -> int:
+        return max(math.ceil(self._opened_at + self.open_seconds - time.monotonic()), 1)
+
+    def _acquire(self) -> Optional[int]:
+        """
+        Admit one call or raise UpstreamUnavailable.
+        Returns the half-open cycle when the call is admitted as a probe, None otherwise.
+        """
+        if self.state == OPEN:
+            if time.monotonic() - self._opened_at < self.open_seconds:
+                self.rejected += 1
+                raise UpstreamUnavailable(self.service, "circuit open", self._retry_after())
+            self.state = HALF_OPEN
+            self._probes = 0
+            self._cycle += 1
+            logger.info(f"Circuit for '{self.service}' half-open, probing")
+        if self.max_in_flight > 0 and self.in_flight >= self.max_in_flight:
+            self.rejected += 1
+            raise UpstreamUnavailable(self.service, "too many requests in flight", 1)
+        probe = None
+        if self.state == HALF_OPEN:
+            if self._probes >= self.half_open_calls:
+                self.rejected += 1
+                raise UpstreamUnavailable(self.service, "circuit half-open", 1)
+            self._probes += 1
+            probe = self._cycle
+        self.in_flight += 1
+        return probe
+
+    def _open(self, reason: str):
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self.opened_count += 1
+        logger.warning(f"Circuit for '{self.service}' opened: {reason}")
+
+    def _is_current_probe(self, probe: Optional[int]) -> bool:
+        return probe is not None and self.state == HALF_OPEN and probe == self._cycle
+
+    def _record(self, failed: bool, latency_ms: float, probe: Optional[int] = None):
+        if self._is_current_probe(probe):
+            if failed:
+                self._open("probe failed")
+            else:
+                self.state = CLOSED
+                self._outcomes.clear()
+                logger.info(f"Circuit for '{self.service}' closed")
+            return
+        # calls admitted before the circuit opened (or probes of an earlier cycle) say nothing about now
+        if self.state != CLOSED:
+            return
+
+        self._outcomes.append((failed, latency_ms))
+        if len(self._outcomes) < self.min_calls:
+            return
+        errors = sum(1 for outcome_failed, _ in self._outcomes if outcome_failed)
+        rate = errors / len(self._outcomes)
+        if rate >= self.error_rate:
+            self._open(f"error rate {rate:.0%}")
+            return
+        if self.p95_ms > 0:
+            p95 = self._p95()
+            if p95 > self.p95_ms:
+                self._open(f"p95 latency {p95:.0f}ms")
+
+    def _p95(self) -> float:
+        latencies = sorted(latency for _, latency in self._outcomes)
+        return latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)] if latencies else 0.0
+
+    @asynccontextmanager
+    async def call(self):
+        """
+        Guard one upstream call. Raises UpstreamUnavailable without calling the
+        upstream when shedding. Exceptions and `call.failed` count as failures;
+        cancellations (client went away) are not recorded.
+        """
+        probe = self._acquire()
+        started = time.monotonic()
+        outcome = UpstreamCall()
+        recorded = False
+        try:
+            yield outcome
+        except Exception:
+            outcome.failed = True
+            raise
+        except BaseException:
+            recorded = True
+            if self._is_current_probe(probe):
+                self._probes = max(self._probes - 1, 0)
+            raise
+        finally:
+            self.in_flight -= 1
+            if not recorded:
+                self._record(outcome.failed, (time.monotonic() - started) * 1000, probe)
+
+    def snapshot(self) -> dict:
+        errors = sum(1 for failed, _ in self._outcomes if failed)
+        return {
+            "state": self.state,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "error_rate": round(errors / len(self._outcomes), 4) if self._outcomes else 0.0,
+            "p95_ms": round(self._p95(), 1),
+            "rejected": self.rejected,
+            "opened": self.opened_count,
+            "retry_after": self._retry_after() if self.state == OPEN else None,
+        }
+
+
+def build_guard(service: str, config: dict) -> UpstreamGuard:
+    return UpstreamGuard(
+        service,
+        max_in_flight=int(config["max_in_flight"]),
+        window=int(config["breaker_window"]),
+        min_calls=int(config["breaker_min_calls"]),
+        error_rate=float(config["breaker_error_rate"]),
+        p95_ms=float(config["breaker_p95_ms"]),
+        open_seconds=float(config["breaker_open_seconds"]),
+        half_open_calls=int(config["breaker_half_open_calls"]),
+    )
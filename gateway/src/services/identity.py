@@ -0,0 +1,41 @@
+import json
+from typing import Any, Dict
+from core.config import settings
+from shared.cache import TTLCache
+from shared.identity import encode_identity
+from shared.metrics import register_cache
+
+IDENTITY_HEADER = "X-Identity"
+
+# signed envelopes are reused while at least half of their lifetime is left
+_envelopes = TTLCache(max_size=settings.USER_CACHE_MAX_SIZE, ttl=settings.IDENTITY_TTL / 2)
+register_cache("identities", _envelopes.stats)
+
+
+def identity_headers(user: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Headers identifying the calling user to an upstream: a signed envelope
+    with the user id and role ids, or the legacy JSON X-User header when no
+    signing key is configured.
+    """
+    key = settings.identity_signing_key
+    if not key:
+        return {"X-User": json.dumps(user)}
+    cache_key = (user.get("id"), tuple(user.get("roles") or ()))
+    envelope = _envelopes.get(cache_key)
+    if envelope is None:
+        envelope = encode_identity(key, settings.IDENTITY_TTL, user_id=cache_key[0], role_ids=list(cache_key[1]))
+        _envelopes.set(cache_key, envelope)
+    return {IDENTITY_HEADER: envelope}
+
+
+def system_identity_headers() -> Dict[str, str]:
+    """Headers for the gateway's own upstream calls (e.g. user lookups), made on no user's behalf."""
+    key = settings.identity_signing_key
+    if not key:
+        return {}
+    envelope = _envelopes.get("system")
+    if envelope is None:
+        envelope = encode_identity(key, settings.IDENTITY_TTL, system=True)
+        _envelopes.set("system", envelope)
+    return {IDENTITY_HEADER: envelope}
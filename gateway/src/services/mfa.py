@@ -1,4 +1,7 @@
 import httpx
+from typing import Optional, Tuple
+from shared.keycloak import keycloak_call
+from services.admin_token import admin_tokens
 from auth_gateway_serverkit.logger import init_logger
 from auth_gateway_serverkit.keycloak.config import settings as kc_settings
 
@@ -7,11 +10,18 @@ logger = init_logger(__name__)
 _mfa_client = httpx.AsyncClient(timeout=20)
 
 
+async def _admin_request(method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+    """Call the Keycloak admin API with the shared admin token (renewed once on 401)."""
+    async with keycloak_call("admin"):
+        return await admin_tokens.request(_mfa_client, method, url, **kwargs)
+
+
 async def validate_password(username: str, password: str) -> bool:
     """Validate password via the custom MFA auth endpoint."""
     url = f"{kc_settings.SERVER_URL}/realms/{kc_settings.REALM}/mfa/auth/validate"
     try:
-        response = await _mfa_client.post(url, json={"username": username, "password": password})
+        async with keycloak_call("mfa_validate"):
+            response = await _mfa_client.post(url, json={"username": username, "password": password})
         if response.status_code == 200:
             return response.json().get("valid", False)
         return False
@@ -20,45 +30,40 @@ async def validate_password(username: str, password: str) -> bool:
         return False
 
 
-async def get_keycloak_uid_by_username(admin_token: str, username: str) -> str | None:
-    """Look up a user's Keycloak UID by username via admin API."""
-    url = f"{kc_settings.SERVER_URL}/admin/realms/{kc_settings.REALM}/users?username={username}&exact=true"
-    headers = {"Authorization": f"Bearer {admin_token}"}
-    try:
-        response = await _mfa_client.get(url, headers=headers)
-        if response.status_code == 200:
-            users = response.json()
-            if users:
-                return users[0]["id"]
-        return None
-    except Exception as e:
-        logger.error(f"Error looking up user: {e}")
-        return None
+async def _find_user_by_username(username: str) -> Optional[dict]:
+    """Search a user by exact username via admin API (the result includes requiredActions)."""
+    url = f"{kc_settings.SERVER_URL}/admin/realms/{kc_settings.REALM}/users"
+    response = await _admin_request("GET", url, params={"username": username, "exact": "true"})
+    if response is not None and response.status_code == 200:
+        users = response.json()
+        if users:
+            return users[0]
+    return None
 
 
-async def get_user_required_actions(admin_token: str, keycloak_uid: str) -> list:
-    """Get a user's required actions from Keycloak."""
-    url = f"{kc_settings.SERVER_URL}/admin/realms/{kc_settings.REALM}/users/{keycloak_uid}"
-    headers = {"Authorization": f"Bearer {admin_token}"}
+async def get_user_required_actions(username: str) -> Optional[Tuple[str, list]]:
+    """
+    Resolve a user's Keycloak UID and current required actions in one admin call:
+    the exact-username search returns both.
+    Returns None if the user does not exist.
+    """
     try:
-        response = await _mfa_client.get(url, headers=headers)
-        if response.status_code == 200:
-            return response.json().get("requiredActions", [])
-        return []
+        user = await _find_user_by_username(username)
+        if not user:
+            return None
+        return user["id"], user.get("requiredActions", [])
     except Exception as e:
-        logger.error(f"Error getting required actions: {e}")
-        return []
+        logger.error(f"Error looking up user: {e}")
+        return None
 
 
-async def remove_required_action(admin_token: str, keycloak_uid: str, action: str) -> bool:
-    """Remove a required action from a user in Keycloak."""
+async def remove_required_action(keycloak_uid: str, action: str, current_actions: list) -> bool:
+    """Remove a required action from a user, given the actions already read for them."""
     url = f"{kc_settings.SERVER_URL}/admin/realms/{kc_settings.REALM}/users/{keycloak_uid}"
-    headers = {"Authorization": f"Bearer {admin_token}", "Content-Type": "application/json"}
     try:
-        current_actions = await get_user_required_actions(admin_token, keycloak_uid)
         updated_actions = [a for a in current_actions if a != action]
-        response = await _mfa_client.put(url, headers=headers, json={"requiredActions": updated_actions})
-        return response.status_code == 204
+        response = await _admin_request("PUT", url, json={"requiredActions": updated_actions})
+        return response is not None and response.status_code == 204
     except Exception as e:
         logger.error(f"Error removing required action: {e}")
         return False
@@ -68,7 +73,8 @@ async def enroll_mfa(keycloak_uid: str) -> dict | None:
     """Enroll a user in MFA via the custom Keycloak endpoint."""
     url = f"{kc_settings.SERVER_URL}/realms/{kc_settings.REALM}/mfa/totp/enroll"
     try:
-        response = await _mfa_client.post(url, json={"userId": keycloak_uid})
+        async with keycloak_call("mfa_enroll"):
+            response = await _mfa_client.post(url, json={"userId": keycloak_uid})
         if response.status_code == 200:
             return response.json()
         logger.error(f"MFA enrollment failed: {response.text}")
@@ -82,7 +88,8 @@ async def verify_mfa_otp(keycloak_uid: str, otp: str) -> bool:
     """Verify an OTP code via the custom Keycloak endpoint."""
     url = f"{kc_settings.SERVER_URL}/realms/{kc_settings.REALM}/mfa/totp/verify"
     try:
-        response = await _mfa_client.post(url, json={"userId": keycloak_uid, "otp": otp})
+        async with keycloak_call("mfa_verify"):
+            response = await _mfa_client.post(url, json={"userId": keycloak_uid, "otp": otp})
         if response.status_code == 200:
             return response.json().get("verified", False)
         return False
@@ -1,16 +1,49 @@
 import datetime
 import httpx
-import json
+import time
+from contextlib import AsyncExitStack
 from fastapi import Request, status
-import auth_gateway_serverkit.http_client as http
-from typing import Union, Dict, Any
+from typing import Union, Dict, Any, Tuple
 from core.config import settings
+from services.user_cache import take_invalidation, user_cache
+from services.user_batcher import user_batcher
+from services.user_events import user_events
+from services.upstream import upstreams, observe_upstream, upstream_span
+from services.circuit_breaker import UpstreamUnavailable
+from services.response_cache import response_cache, build_cache_key
+from services.identity import identity_headers, system_identity_headers
+from starlette.background import BackgroundTask
 from starlette.datastructures import UploadFile as StarletteUploadFile
+from starlette.responses import Response, StreamingResponse
+from shared.http import FastJSONResponse, loads
+from shared.tracing import inject
 from auth_gateway_serverkit.request_handler import parse_request
 from auth_gateway_serverkit.logger import init_logger
 
 logger = init_logger(__name__)
 
+# Request headers passed through to upstreams in streaming mode
+STREAM_REQUEST_HEADERS = {"content-type", "content-length", "content-encoding", "accept", "accept-encoding"}
+# Upstream response headers kept when an unwrapped response is forwarded as-is
+PASSTHROUGH_RESPONSE_HEADERS = {
+    "content-type", "cache-control", "etag", "last-modified", "retry-after", "location", "content-language",
+}
+# Asks the upstream for responses in their final client shape; echoed back when it complied
+ENVELOPE_HEADER = "X-Gateway-Envelope"
+UNWRAPPED = "unwrapped"
+# Hop-by-hop headers never copied from an upstream response
+HOP_BY_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailer", "transfer-encoding", "upgrade",
+}
+
+
+def transport_error_status(error: httpx.TransportError) -> Tuple[int, str]:
+    """503 when the upstream could not be reached, 502 when it failed after the connection was made."""
+    if isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)):
+        return status.HTTP_503_SERVICE_UNAVAILABLE, "Service unavailable"
+    return status.HTTP_502_BAD_GATEWAY, "Bad gateway"
+
 
 async def process_request(
         service: Union[str, None] = None,
@@ -19,6 +52,8 @@ async def process_request(
         path: Union[str, None] = None
 ):
     request_data, content_type = await parse_request(request)
+    if request.method in ("GET", "DELETE"):
+        request_data = {**request.query_params, **request_data}
     user = request.state.user
 
     if service not in settings.SERVICE_MAP:
@@ -28,7 +63,7 @@ async def process_request(
         }
 
     path_segment = f"/{path}" if path else ""
-    url = f"{settings.SERVICE_MAP[service]}/{action}{path_segment}"
+    upstream_path = f"/{action}{path_segment}"
 
     if await check_unauthorized_access(request_data, user.get("id"), path_segment[1:]):
         return {
@@ -36,35 +71,150 @@ async def process_request(
             "status_code": status.HTTP_403_FORBIDDEN
         }
 
-    logger.info(f"Forwarding request to: {url}")
-    return await forward_request_and_process_response(
-        url,
-        request.method,
-        content_type,
-        request_data,
-        user
+    def forward(passthrough: bool = False):
+        return forward_request_and_process_response(
+            service,
+            upstream_path,
+            request.method,
+            content_type,
+            request_data,
+            user,
+            passthrough
+        )
+
+    cache_policy = settings.get_response_cache_policy(service, action) if request.method == "GET" else None
+    if cache_policy:
+        ttl, stale = cache_policy
+        cache_key = build_cache_key(service, action, path, request_data, user)
+        return await response_cache.fetch(cache_key, [service, f"{service}/{action}"], ttl, stale, forward)
+    return await forward(passthrough=True)
+
+
+async def stream_request(
+        service: str,
+        action: str,
+        request: Request,
+        path: Union[str, None] = None
+):
+    """
+    Proxy a request without buffering it: the incoming body is streamed to the
+    upstream and the upstream body is streamed back with its status and headers.
+    The upstream's in-flight guard and balancer slot are held until that body
+    has been relayed; transport errors answer 503 (unreachable) or 502.
+    Only the path and query string are available for the access check: the
+    body is never inspected, which is why STREAMING_ROUTES only takes explicit
+    routes that carry no user id in their body.
+    """
+    user = request.state.user
+
+    if service not in settings.SERVICE_MAP:
+        return FastJSONResponse(content={"message": "Service not found"}, status_code=status.HTTP_404_NOT_FOUND)
+
+    path_segment = f"/{path}" if path else ""
+
+    if await check_unauthorized_access(dict(request.query_params), user.get("id"), path_segment[1:]):
+        return FastJSONResponse(content={"message": "Access denied"}, status_code=status.HTTP_403_FORBIDDEN)
+
+    headers = {key: value for key, value in request.headers.items() if key in STREAM_REQUEST_HEADERS}
+    headers.update(identity_headers(user))
+
+    client = upstreams.get(service)
+    started = time.perf_counter()
+    outcome = "error"
+    # holds the guard and balancer slot until the body has been relayed
+    stack = AsyncExitStack()
+    with upstream_span(service, request.method, f"/{action}") as span:
+        try:
+            try:
+                call, base_url = await stack.enter_async_context(upstreams.call(service))
+                url = f"{base_url}/{action}{path_segment}"
+                logger.info(f"Streaming request to: {url}")
+                inject(headers)
+                upstream_request = client.build_request(
+                    request.method,
+                    url,
+                    params=request.query_params,
+                    headers=headers,
+                    content=request.stream() if request.method in ("POST", "PUT") else None,
+                )
+                upstream_response = await client.send(upstream_request, stream=True)
+                call.failed = upstream_response.status_code >= 500
+                outcome = str(upstream_response.status_code)
+            except BaseException as e:
+                await stack.__aexit__(type(e), e, e.__traceback__)
+                raise
+        except UpstreamUnavailable as e:
+            outcome = "unavailable"
+            logger.warning(str(e))
+            return FastJSONResponse(
+                content={"message": "Service unavailable"},
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": str(e.retry_after)},
+            )
+        except httpx.TransportError as e:
+            logger.error(f"Error streaming {request.method} request to {service}/{action}: {e!r}")
+            status_code, message = transport_error_status(e)
+            return FastJSONResponse(content={"message": message}, status_code=status_code)
+        finally:
+            observe_upstream(service, f"/{action}", outcome, started)
+            span.set_attribute("http.status_code", outcome)
+
+    async def close():
+        await upstream_response.aclose()
+        await stack.aclose()
+
+    async def relay():
+        try:
+            async for chunk in upstream_response.aiter_raw():
+                yield chunk
+        except httpx.TransportError as e:
+            logger.error(f"Upstream body of {service}/{action} interrupted: {e!r}")
+            call.failed = True
+            raise
+        finally:
+            await close()
+
+    # the background task covers responses whose body is never iterated
+    response = StreamingResponse(
+        relay(),
+        status_code=upstream_response.status_code,
+        background=BackgroundTask(close),
     )
+    # raw header list keeps repeated headers such as Set-Cookie intact
+    response.raw_headers = [
+        (key, value) for key, value in upstream_response.headers.raw
+        if key.decode("latin-1").lower() not in HOP_BY_HOP_HEADERS
+    ]
+    return response
 
 
 async def forward_request_and_process_response(
-        url: str,
+        service: str,
+        upstream_path: str,
         method: str,
         content_type: str,
         request_data: Dict[str, Any],
-        user: Dict[str, Any]
-) -> Dict[str, Any]:
+        user: Dict[str, Any],
+        passthrough: bool = False
+) -> Union[Dict[str, Any], Response]:
+    """
+    Forward a parsed request to the upstream and return its response envelope.
+
+    With passthrough, the upstream is asked for its response in final client
+    shape; when it complies, the body bytes, status code and whitelisted
+    headers are returned as a Response without being parsed.
+    """
     try:
         start_time = datetime.datetime.now()
         method = method.upper()
-        response = None
-        headers = {"X-User": json.dumps(user)}
+        headers = identity_headers(user)
+        if passthrough:
+            headers[ENVELOPE_HEADER] = UNWRAPPED
 
         if method in ["POST", "PUT"]:
             if content_type == "json":
-                response = await http.post(url, json=request_data, headers=headers,
-                                           timeout=150) if method == "POST" else \
-                    await http.put(url, json=request_data, headers=headers, timeout=150)
-            elif content_type == "multipart":
+                request_kwargs = {"json": request_data}
+            else:
                 files = {
                     key: (file.filename, file.file, file.content_type)
                     for key, file in request_data.items()
@@ -75,23 +225,33 @@ async def forward_request_and_process_response(
                     for key, value in request_data.items()
                     if not isinstance(value, StarletteUploadFile)
                 }
-                response = await http.post(url, data=data, files=files, headers=headers,
-                                           timeout=150) if method == "POST" else \
-                    await http.put(url, data=data, files=files, timeout=150)
-            else:
-                response = await http.post(url, data=request_data, headers=headers,
-                                           timeout=150) if method == "POST" else \
-                    await http.put(url, data=request_data, headers=headers, timeout=150)
-        elif method == "GET":
-            response = await http.get(url, params=request_data, headers=headers, timeout=150)
-        elif method == "DELETE":
-            response = await http.delete(url, params=request_data, headers=headers, timeout=150)
+                request_kwargs = {"data": data, "files": files or None}
+        elif method in ["GET", "DELETE"]:
+            request_kwargs = {"params": request_data}
         else:
             return {
                 "message": "Method not supported",
                 "status_code": status.HTTP_405_METHOD_NOT_ALLOWED
             }
 
+        logger.info(f"Forwarding request to: {service}{upstream_path}")
+        upstream_response = await upstreams.request(service, method, upstream_path, headers=headers, **request_kwargs)
+        if passthrough and upstream_response.headers.get(ENVELOPE_HEADER) == UNWRAPPED:
+            logger.info(
+                f"Time taken: {datetime.datetime.now() - start_time}. "
+                f"Response status: {upstream_response.status_code}"
+            )
+            return Response(
+                content=upstream_response.content,
+                status_code=upstream_response.status_code,
+                headers={
+                    key: value for key, value in upstream_response.headers.items()
+                    if key in PASSTHROUGH_RESPONSE_HEADERS
+                },
+            )
+        upstream_response.raise_for_status()
+        response = loads(upstream_response.content)
+
         end_time = datetime.datetime.now()
         logger.info(
             f"Time taken: {end_time - start_time}. "
@@ -99,14 +259,28 @@ async def forward_request_and_process_response(
         )
         return response
 
+    except UpstreamUnavailable as e:
+        logger.warning(str(e))
+        return {
+            "message": "Service unavailable",
+            "status_code": status.HTTP_503_SERVICE_UNAVAILABLE,
+            "retry_after": e.retry_after
+        }
     except httpx.HTTPStatusError as e:
-        logger.error(f"HTTP error: {e.response.status_code} - {e.response.text} - URL: {url}")
+        logger.error(f"HTTP error: {e.response.status_code} - {e.response.text} - URL: {e.request.url}")
         return {
             "message": f"HTTP error: {e.response.status_code}",
             "status_code": e.response.status_code
         }
+    except httpx.TransportError as e:
+        logger.error(f"Error forwarding {method} request to {service}{upstream_path}: {e!r}")
+        status_code, message = transport_error_status(e)
+        return {
+            "message": message,
+            "status_code": status_code
+        }
     except Exception as e:
-        logger.error(f"Error forwarding {method} request to {url}: {str(e)}")
+        logger.error(f"Error forwarding {method} request to {service}{upstream_path}: {str(e)}")
         return {
             "message": "Internal Server Error",
             "status_code": status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -114,9 +288,34 @@ async def forward_request_and_process_response(
 
 
 async def get_by_keycloak_uid(uid):
+    """
+    Resolve a user by Keycloak UID, served from the user cache when possible.
+    Concurrent misses for different users are batched into one IAM call.
+
+    A user's first load after an invalidation is read from IAM's primary: a
+    secondary could still return the document as it was before the change.
+    While the user change feed is connected, users are cached for its longer
+    TTL and every load reads the primary.
+    """
+    ttl = user_events.user_ttl()
+
+    async def load():
+        primary = take_invalidation(uid) or ttl is not None
+        if settings.USER_BATCH_WINDOW_MS > 0:
+            return await user_batcher.load(str(uid), primary)
+        return await _fetch_by_keycloak_uid(uid, primary)
+
+    return await user_cache.get_or_load(str(uid), load, ttl)
+
+
+async def _fetch_by_keycloak_uid(uid, primary: bool = False):
     try:
-        url = f"{settings.SERVICE_MAP.get('user')}/get_by_keycloak_uid/{uid}"
-        response = await http.get(url)
+        upstream_response = await upstreams.request(
+            "user", "GET", f"/get_by_keycloak_uid/{uid}", params={"primary": "true"} if primary else None,
+            headers=system_identity_headers()
+        )
+        upstream_response.raise_for_status()
+        response = loads(upstream_response.content)
         if "data" in response:
             return response["data"]
         return None
@@ -131,8 +330,10 @@ async def check_unauthorized_access(request_data, user_id, path_segment):
         if not system_admin_id:
             logger.error("Failed to get system admin ID, denying access")
             return True
+        user_ids = request_data.get("user_ids")
         if (request_data.get("id") == system_admin_id or path_segment == system_admin_id or
-                request_data.get("user_id") == system_admin_id):
+                request_data.get("user_id") == system_admin_id or
+                (isinstance(user_ids, list) and system_admin_id in user_ids)):
             if user_id != system_admin_id:
                 return True
         return False
@@ -0,0 +1,144 @@
+import math
+import time
+from typing import Optional, Tuple
+from core.config import settings
+from shared.cache import TTLCache
+from auth_gateway_serverkit.logger import init_logger
+
+logger = init_logger(__name__)
+
+
+class MemoryRateLimitStore:
+    """
+    Per-process counters: for each key, the current fixed window and the
+    count of the previous one. Bounded by LRU eviction so a flood of
+    random usernames cannot grow memory without limit.
+    """
+
+    def __init__(self, max_keys: int):
+        self._counters = TTLCache(max_size=max_keys)
+
+    async def increment(self, key: str, window: int) -> Tuple[int, int, float]:
+        now = time.time()
+        window_id = int(now // window)
+        entry = self._counters.get(key)
+        if entry is None or entry[0] < window_id - 1:
+            previous, current = 0, 0
+        elif entry[0] == window_id - 1:
+            previous, current = entry[2], 0
+        else:
+            previous, current = entry[1], entry[2]
+        current += 1
+        self._counters.set(key, (window_id, previous, current), ttl=2 * window)
+        return previous, current, now - window_id * window
+
+    async def reset(self, key: str, window: int):
+        self._counters.delete(key)
+
+
+class RedisRateLimitStore:
+    """Counters kept in Redis so every gateway worker (and instance) shares them."""
+
+    def __init__(self, url: str, prefix: str = "gateway:ratelimit:"):
+        import redis.asyncio as redis
+        self._redis = redis.from_url(url)
+        self._prefix = prefix
+
+    async def increment(self, key: str, window: int) -> Tuple[int, int, float]:
+        now = time.time()
+        window_id = int(now // window)
+        current_key = f"{self._prefix}{key}:{window_id}"
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.incr(current_key)
+            pipe.expire(current_key, 2 * window)
+            pipe.get(f"{self._prefix}{key}:{window_id - 1}")
+            current, _, previous = await pipe.execute()
+        return int(previous or 0), int(current), now - window_id * window
+
+    async def reset(self, key: str, window: int):
+        window_id = int(time.time() // window)
+        await self._redis.delete(*(f"{self._prefix}{key}:{wid}" for wid in (window_id, window_id - 1)))
+
+    async def close(self):
+        await self._redis.aclose()
+
+
+def build_store():
+    """Redis store when GATEWAY_RATE_LIMIT_STORE_URL is set, in-process otherwise."""
+    if settings.RATE_LIMIT_STORE_URL:
+        try:
+            return RedisRateLimitStore(settings.RATE_LIMIT_STORE_URL)
+        except ImportError:
+            logger.warning("GATEWAY_RATE_LIMIT_STORE_URL is set but the 'redis' package is not installed, "
+                           "using per-process rate limit counters")
+    return MemoryRateLimitStore(max_keys=settings.RATE_LIMIT_MAX_KEYS)
+
+
+class SlidingWindowLimiter:
+    """
+    Sliding-window-counter limiter: the request rate over the last `window`
+    seconds is estimated from the current and previous fixed windows,
+    weighted by how far into the current window we are. O(1) per hit.
+    """
+
+    def __init__(self, store, window: int):
+        self.store = store
+        self.window = window
+        self.rejected = 0
+
+    async def hit(self, key: str, limit: int) -> Optional[int]:
+        """
+        Count one attempt for key.
+        Returns None when allowed, or the Retry-After seconds when over the limit.
+        """
+        if limit <= 0:
+            return None
+        try:
+            previous, current, elapsed = await self.store.increment(key, self.window)
+        except Exception as e:
+            # Fail open: an unavailable counter store must not block logins
+            logger.error(f"Rate limit store error: {e}")
+            return None
+        estimate = previous * (1 - elapsed / self.window) + current
+        if estimate <= limit:
+            return None
+        self.rejected += 1
+        return max(math.ceil(self.window - elapsed), 1)
+
+    async def reset(self, key: str):
+        try:
+            await self.store.reset(key, self.window)
+        except Exception as e:
+            logger.error(f"Rate limit store error: {e}")
+
+    async def close(self):
+        close = getattr(self.store, "close", None)
+        if close:
+            await close()
+
+    def stats(self) -> dict:
+        return {"store": type(self.store).__name__, "window": self.window, "rejected": self.rejected}
+
+
+def client_ip(request) -> str:
+    """Client address, taken from X-Forwarded-For only when the gateway sits behind a trusted proxy."""
+    if settings.TRUST_FORWARDED_FOR:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+login_limiter = SlidingWindowLimiter(build_store(), window=settings.LOGIN_RATE_LIMIT_WINDOW)
+
+
+async def check_login_rate(username: str, ip: str) -> Optional[int]:
+    """
+    Count a login attempt against the per-IP and per-username limits.
+    Returns the Retry-After seconds if either limit is exceeded.
+    """
+    retry_ip = await login_limiter.hit(f"ip:{ip}", settings.LOGIN_RATE_LIMIT_PER_IP)
+    retry_user = await login_limiter.hit(f"user:{username.lower()}", settings.LOGIN_RATE_LIMIT_PER_USERNAME)
+    if retry_ip or retry_user:
+        return max(retry_ip or 0, retry_user or 0)
+    return None
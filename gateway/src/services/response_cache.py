@@ -0,0 +1,136 @@
+import asyncio
+import hashlib
+import json
+import time
+from fastapi import status
+from typing import Any, Awaitable, Callable, Dict, List, Set
+from core.config import settings
+from shared.cache import TTLCache
+from shared.metrics import register_cache
+from auth_gateway_serverkit.logger import init_logger
+
+logger = init_logger(__name__)
+
+
+def build_cache_key(service: str, action: str, path: str, params: dict, user: Dict[str, Any]) -> str:
+    """Key a GET response by route, sorted query params and the caller's identity."""
+    raw = json.dumps(
+        [
+            service,
+            action,
+            path or "",
+            sorted((str(k), str(v)) for k, v in params.items()),
+            user.get("id"),
+            sorted(user.get("roles") or []),
+        ],
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class ResponseCache:
+    """
+    Cache of proxied GET responses with stale-while-revalidate.
+
+    Entries are fresh for `ttl` seconds. For a further `stale` seconds the
+    cached response is still served while a single background refresh runs.
+    Every entry carries tags (service and service/action) so upstream
+    mutations can purge related entries.
+    """
+
+    def __init__(self, max_size: int):
+        self._entries = TTLCache(max_size=max_size)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._refreshing: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _is_cacheable(response: Dict[str, Any]) -> bool:
+        return response.get("status_code") == status.HTTP_200_OK
+
+    def _store(self, key: str, tags: List[str], ttl: float, stale: float, response: Dict[str, Any]):
+        if self._is_cacheable(response):
+            self._entries.set(key, (time.monotonic() + ttl, tags, response), ttl=ttl + stale)
+
+    async def _load(self, key, tags, ttl, stale, loader) -> Dict[str, Any]:
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            response = await loader()
+            self._store(key, tags, ttl, stale, response)
+            future.set_result(response)
+            return response
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _refresh(self, key, tags, ttl, stale, loader):
+        try:
+            await self._load(key, tags, ttl, stale, loader)
+        except Exception as e:
+            logger.error(f"Background refresh failed: {e}")
+        finally:
+            self._refreshing.discard(key)
+
+    async def fetch(
+        self,
+        key: str,
+        tags: List[str],
+        ttl: float,
+        stale: float,
+        loader: Callable[[], Awaitable[Dict[str, Any]]],
+    ) -> Dict[str, Any]:
+        """Return a cached response (fresh or stale) or load it from the upstream."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            fresh_until, _, response = entry
+            if time.monotonic() < fresh_until:
+                self.hits += 1
+            else:
+                self.stale_hits += 1
+                if key not in self._refreshing:
+                    self._refreshing.add(key)
+                    task = asyncio.create_task(self._refresh(key, tags, ttl, stale, loader))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+            # callers pop status_code, so never hand out the cached dict itself
+            return dict(response)
+
+        self.misses += 1
+        return dict(await self._load(key, tags, ttl, stale, loader))
+
+    def purge_tags(self, tags: List[str]) -> int:
+        """Remove every entry carrying any of the given tags."""
+        wanted = set(tags)
+        removed = 0
+        for key, (_, entry_tags, _) in self._entries.items():
+            if wanted.intersection(entry_tags):
+                self._entries.delete(key)
+                removed += 1
+        if removed:
+            logger.info(f"Response cache purged {removed} entries for tags {sorted(wanted)}")
+        return removed
+
+    def stats(self) -> dict:
+        total = self.hits + self.stale_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self._entries.max_size,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.hits + self.stale_hits) / total, 4) if total else 0.0,
+        }
+
+
+response_cache = ResponseCache(max_size=settings.RESPONSE_CACHE_MAX_SIZE)
+register_cache("responses", response_cache.stats)
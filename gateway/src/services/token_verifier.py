@@ -0,0 +1,140 @@
+import asyncio
+import hashlib
+import time
+import httpx
+import jwt
+from fastapi import HTTPException, status
+from typing import Dict
+from core.config import settings
+from shared.cache import TTLCache
+from shared.keycloak import keycloak_call
+from shared.metrics import register_cache
+from auth_gateway_serverkit.middleware.config import settings as auth_settings
+from auth_gateway_serverkit.middleware.schemas import UserPayload
+from auth_gateway_serverkit.logger import init_logger
+
+logger = init_logger(__name__)
+
+_jwks_client = httpx.AsyncClient(timeout=10)
+
+
+def token_hash(token: str) -> str:
+    """Stable cache key for a raw access token."""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class TokenVerifier:
+    """
+    Verify Keycloak access tokens in-process against the realm JWKS.
+
+    Signing keys are fetched once and refreshed only when a token arrives
+    with an unknown `kid` (rate limited). Verified payloads are cached by
+    token hash until the token expires.
+    """
+
+    def __init__(self):
+        self.issuer = f"{auth_settings.SERVER_URL}/realms/{auth_settings.REALM}"
+        self.audience = auth_settings.CLIENT_ID
+        self.jwks_url = f"{self.issuer}/protocol/openid-connect/certs"
+        self._keys: Dict[str, jwt.PyJWK] = {}
+        self._last_refresh = 0.0
+        self._refresh_lock = asyncio.Lock()
+        self.payload_cache = TTLCache(max_size=settings.TOKEN_CACHE_MAX_SIZE, ttl=settings.TOKEN_CACHE_MAX_TTL)
+
+    async def refresh_keys(self, force: bool = False) -> bool:
+        """
+        Reload the realm JWKS. Concurrent callers share one fetch, and
+        non-forced refreshes are skipped within the minimum interval.
+        """
+        async with self._refresh_lock:
+            if not force and time.monotonic() - self._last_refresh < settings.JWKS_MIN_REFRESH_INTERVAL:
+                return False
+            self._last_refresh = time.monotonic()
+            try:
+                async with keycloak_call("jwks"):
+                    response = await _jwks_client.get(self.jwks_url)
+                response.raise_for_status()
+                keys = [k for k in response.json().get("keys", []) if k.get("use", "sig") == "sig"]
+                jwk_set = jwt.PyJWKSet(keys)
+                self._keys = {key.key_id: key for key in jwk_set.keys if key.key_id}
+                logger.info(f"Loaded {len(self._keys)} signing keys from JWKS")
+                return True
+            except Exception as e:
+                logger.error(f"Error refreshing JWKS: {e}")
+                return False
+
+    async def _get_signing_key(self, token: str) -> jwt.PyJWK:
+        kid = jwt.get_unverified_header(token).get("kid")
+        key = self._keys.get(kid)
+        if key is None:
+            await self.refresh_keys()
+            key = self._keys.get(kid)
+        if key is None:
+            raise jwt.InvalidTokenError("Unknown signing key")
+        return key
+
+    async def get_payload(self, token: str) -> dict:
+        """
+        Return the verified payload of an access token.
+
+        :param token: User's access token.
+        :return: Decoded token payload.
+        :raises jwt.InvalidTokenError: If the token fails verification.
+        """
+        cache_key = token_hash(token)
+        payload = self.payload_cache.get(cache_key)
+        if payload is not None:
+            return payload
+
+        key = await self._get_signing_key(token)
+        payload = jwt.decode(
+            token,
+            key=key.key,
+            algorithms=["RS256"],
+            audience=self.audience,
+            issuer=self.issuer,
+            leeway=0,
+            options={"require": ["exp", "iss", "sub"]},
+        )
+        ttl = min(payload["exp"] - time.time(), settings.TOKEN_CACHE_MAX_TTL)
+        if ttl > 0:
+            self.payload_cache.set(cache_key, payload, ttl=ttl)
+        return payload
+
+
+token_verifier = TokenVerifier()
+register_cache("token_payloads", token_verifier.payload_cache.stats)
+
+
+async def get_payload(token: str) -> dict:
+    """Verify a token locally, mapping failures to 401 responses."""
+    try:
+        return await token_verifier.get_payload(token)
+    except jwt.ExpiredSignatureError:
+        detail = "Token has expired"
+    except jwt.InvalidIssuerError:
+        detail = "Invalid token issuer"
+    except jwt.InvalidAudienceError as e:
+        detail = f"Invalid audience: {str(e)}"
+    except jwt.InvalidTokenError as e:
+        detail = f"Invalid token: {str(e)}"
+    raise HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"}
+    )
+
+
+async def get_user_info(token: str) -> UserPayload:
+    """
+    Get user information from a locally verified token.
+
+    :param token: User's access token.
+    :return: User's information.
+    """
+    payload = await get_payload(token)
+    return UserPayload(
+        id=payload.get("sub"),
+        realm_roles=payload.get("realm_access", {}).get("roles", []),
+    )
+
@@ -0,0 +1,182 @@
+import asyncio
+import time
+import httpx
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+from core.config import settings
+from services.circuit_breaker import UpstreamGuard, UpstreamUnavailable, build_guard
+from services.balancer import ServiceBalancer, run_health_checks
+from shared.metrics import UPSTREAM_LATENCY, registry
+from shared.tracing import KIND_CLIENT, inject, tracer
+from auth_gateway_serverkit.logger import init_logger
+
+logger = init_logger(__name__)
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def action_of(path: str) -> str:
+    """The action of an upstream path is its first segment."""
+    return path.lstrip("/").split("/", 1)[0].split("?", 1)[0]
+
+
+def observe_upstream(service: str, path: str, outcome: str, started: float):
+    """Record one upstream call in the upstream latency histogram."""
+    UPSTREAM_LATENCY.observe(time.perf_counter() - started, service=service, action=action_of(path), status=outcome)
+
+
+def upstream_span(service: str, method: str, path: str):
+    """Client span for a call to an upstream service; the traceparent sent upstream points at it."""
+    return tracer.start_span(
+        f"{method} {service}/{action_of(path)}",
+        KIND_CLIENT,
+        attributes={"upstream.service": service, "http.method": method},
+    )
+
+
+def build_client(service: str) -> httpx.AsyncClient:
+    """Create a long-lived pooled client for one SERVICE_MAP entry."""
+    config = settings.get_upstream_config(service)
+    http2 = bool(config["http2"])
+    if http2 and not _http2_available():
+        logger.warning(f"HTTP/2 requested for '{service}' but the 'h2' package is not installed, using HTTP/1.1")
+        http2 = False
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(
+            config["read_timeout"],
+            connect=config["connect_timeout"],
+        ),
+        limits=httpx.Limits(
+            max_connections=config["max_connections"],
+            max_keepalive_connections=config["max_keepalive"],
+            keepalive_expiry=config["keepalive_expiry"],
+        ),
+        http2=http2,
+    )
+
+
+class UpstreamClients:
+    """
+    One shared connection pool per upstream service, owned by the app lifespan,
+    plus the circuit breaker / in-flight guard and the instance balancer for
+    that service.
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._guards: Dict[str, UpstreamGuard] = {}
+        self._balancers: Dict[str, ServiceBalancer] = {}
+        self._health_task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        for service in settings.SERVICE_MAP:
+            self.get(service)
+        logger.info(f"Upstream clients ready: {', '.join(self._clients)}")
+        if settings.HEALTH_CHECK_INTERVAL > 0:
+            self._health_task = asyncio.create_task(run_health_checks(
+                self,
+                list(settings.SERVICE_MAP),
+                settings.HEALTH_CHECK_PATHS,
+                settings.HEALTH_CHECK_INTERVAL,
+                settings.HEALTH_CHECK_TIMEOUT,
+            ))
+
+    def get(self, service: str) -> httpx.AsyncClient:
+        client = self._clients.get(service)
+        if client is None or client.is_closed:
+            client = build_client(service)
+            self._clients[service] = client
+        return client
+
+    def guard(self, service: str) -> UpstreamGuard:
+        guard = self._guards.get(service)
+        if guard is None:
+            guard = build_guard(service, settings.get_upstream_config(service))
+            self._guards[service] = guard
+        return guard
+
+    def balancer(self, service: str) -> ServiceBalancer:
+        balancer = self._balancers.get(service)
+        if balancer is None:
+            balancer = ServiceBalancer(
+                service,
+                settings.get_instances(service),
+                settings.get_upstream_config(service)["lb_strategy"],
+                eject_after=settings.EJECT_AFTER_FAILURES,
+                readmit_after=settings.READMIT_AFTER_SUCCESSES,
+            )
+            self._balancers[service] = balancer
+        return balancer
+
+    @asynccontextmanager
+    async def call(self, service: str):
+        """
+        Guard one call to a service and pick the instance serving it.
+        Yields (call, base_url); raises UpstreamUnavailable when shedding.
+        """
+        async with self.guard(service).call() as call, self.balancer(service).acquire() as instance:
+            yield call, instance.url
+
+    async def request(self, service: str, method: str, path: str, **kwargs) -> httpx.Response:
+        """
+        Send a request to `path` on one instance of service; 5xx responses count as failures.
+        The request carries the traceparent of its client span.
+        """
+        started = time.perf_counter()
+        outcome = "error"
+        with upstream_span(service, method, path) as span:
+            try:
+                async with self.call(service) as (call, base_url):
+                    span.set_attribute("upstream.instance", base_url)
+                    kwargs["headers"] = inject(dict(kwargs.get("headers") or {}))
+                    response = await self.get(service).request(method, f"{base_url}{path}", **kwargs)
+                    call.failed = response.status_code >= 500
+                    outcome = str(response.status_code)
+                return response
+            except UpstreamUnavailable:
+                outcome = "unavailable"
+                raise
+            finally:
+                observe_upstream(service, path, outcome, started)
+                span.set_attribute("http.status_code", outcome)
+                if not outcome.isdigit() or int(outcome) >= 500:
+                    span.set_error(f"upstream {outcome}")
+
+    def health(self) -> dict:
+        return {
+            service: {**self.guard(service).snapshot(), **self.balancer(service).snapshot()}
+            for service in settings.SERVICE_MAP
+        }
+
+    async def close(self):
+        if self._health_task:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
+        for service, client in self._clients.items():
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.error(f"Error closing upstream client '{service}': {e}")
+        self._clients.clear()
+
+
+upstreams = UpstreamClients()
+
+registry.callback(
+    "upstream_in_flight", "Calls currently in flight to an upstream service.", "gauge", ("service",),
+    lambda: (({"service": service}, upstreams.guard(service).snapshot()["in_flight"]) for service in settings.SERVICE_MAP),
+)
+registry.callback(
+    "upstream_circuit_open", "1 while the upstream circuit breaker is not closed.", "gauge", ("service",),
+    lambda: (({"service": service}, int(upstreams.guard(service).snapshot()["state"] != "closed")) for service in settings.SERVICE_MAP),
+)
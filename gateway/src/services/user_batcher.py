@@ -0,0 +1,91 @@
+import asyncio
+from typing import Any, Dict, Optional
+from core.config import settings
+from services.upstream import upstreams
+from services.identity import system_identity_headers
+from shared.http import loads
+from auth_gateway_serverkit.logger import init_logger
+
+logger = init_logger(__name__)
+
+
+class UserLookupBatcher:
+    """
+    Coalesces Keycloak UID lookups arriving within a short window into a
+    single IAM `get_many` call.
+
+    The first lookup opens a window of `window_ms`; every lookup queued
+    before it closes (or until `max_batch` UIDs are pending) is resolved
+    by the same upstream request. The batch is read from IAM's primary if
+    any of its lookups asks for it.
+    """
+
+    def __init__(self, window_ms: float, max_batch: int):
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._primary = False
+        self._tasks = set()
+        self.batches = 0
+        self.lookups = 0
+
+    async def load(self, keycloak_uid: str, primary: bool = False) -> Optional[Dict[str, Any]]:
+        """Queue a lookup and wait for the batch carrying it; primary=True reads it from IAM's primary."""
+        self.lookups += 1
+        self._primary = self._primary or primary
+        future = self._pending.get(keycloak_uid)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._pending[keycloak_uid] = future
+            if len(self._pending) >= self.max_batch:
+                self._flush()
+            elif self._flush_handle is None:
+                self._flush_handle = asyncio.get_running_loop().call_later(self.window, self._flush)
+        return await asyncio.shield(future)
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, {}
+        primary, self._primary = self._primary, False
+        if batch:
+            task = asyncio.create_task(self._resolve(batch, primary))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _resolve(self, batch: Dict[str, asyncio.Future], primary: bool):
+        self.batches += 1
+        users = await self._fetch_many(list(batch), primary)
+        for keycloak_uid, future in batch.items():
+            if not future.done():
+                future.set_result(users.get(keycloak_uid))
+
+    @staticmethod
+    async def _fetch_many(keycloak_uids, primary: bool = False) -> Dict[str, Any]:
+        body = {"keycloak_uids": keycloak_uids}
+        if primary:
+            body["primary"] = True
+        try:
+            upstream_response = await upstreams.request(
+                "user", "POST", "/get_many", json=body, headers=system_identity_headers()
+            )
+            upstream_response.raise_for_status()
+            return (loads(upstream_response.content).get("data") or {}).get("users") or {}
+        except Exception as e:
+            logger.error(f"Batch user lookup error: {e}")
+            return {}
+
+    def stats(self) -> dict:
+        return {
+            "lookups": self.lookups,
+            "batches": self.batches,
+            "pending": len(self._pending),
+        }
+
+
+user_batcher = UserLookupBatcher(
+    window_ms=settings.USER_BATCH_WINDOW_MS,
+    max_batch=settings.USER_BATCH_MAX_SIZE,
+)
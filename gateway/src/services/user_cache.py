@@ -0,0 +1,26 @@
+from core.config import settings
+from shared.cache import TTLCache
+from shared.metrics import register_cache
+from auth_gateway_serverkit.logger import init_logger
+
+logger = init_logger(__name__)
+
+user_cache = TTLCache(max_size=settings.USER_CACHE_MAX_SIZE, ttl=settings.USER_CACHE_TTL)
+register_cache("users", user_cache.stats)
+
+# users invalidated since their last load: that next load reads IAM's primary
+_invalidated = TTLCache(max_size=settings.USER_CACHE_MAX_SIZE, ttl=settings.USER_CACHE_TTL)
+
+
+def invalidate_user(keycloak_uid: str) -> bool:
+    """Drop a cached user so the next request reloads it from IAM's primary."""
+    _invalidated.set(str(keycloak_uid), True)
+    removed = user_cache.delete(str(keycloak_uid))
+    if removed:
+        logger.info(f"User cache invalidated: {keycloak_uid}")
+    return removed
+
+
+def take_invalidation(keycloak_uid: str) -> bool:
+    """True, once, when the user was invalidated since it was last loaded."""
+    return _invalidated.delete(str(keycloak_uid))
@@ -0,0 +1,188 @@
+"""
+Subscriber of IAM's user change feed (GET /internal/user_events, server-sent events).
+
+Every user change drops that user from the user cache and purges cached
+user responses, so while the feed is connected cached users can be kept
+for USER_CACHE_FEED_TTL instead of the short USER_CACHE_TTL. A role refresh
+purges cached role responses.
+
+IAM's /internal invalidation calls reach a single worker, while every
+worker follows the feed: it is what keeps several workers' caches in step.
+"""
+
+import asyncio
+import time
+from typing import Optional
+import httpx
+from core.config import settings
+from services.upstream import upstreams
+from services.identity import system_identity_headers
+from services.user_cache import invalidate_user, user_cache
+from services.response_cache import response_cache
+from shared.http import loads
+from auth_gateway_serverkit.logger import init_logger
+
+logger = init_logger(__name__)
+
+# response cache tags holding user data (service/action of cached GET routes)
+USER_RESPONSE_TAGS = ["user/get", "user/list"]
+ROLE_RESPONSE_TAGS = ["user/roles"]
+_MAX_RETRY_SECONDS = 60
+
+
+class FeedUnavailable(Exception):
+    pass
+
+
+class UserEventSubscriber:
+    """
+    Follows the feed of one IAM instance, reconnecting with backoff.
+
+    Reconnects send the id of the last event seen (Last-Event-ID) so IAM
+    replays what was missed, or answers with a reset when it cannot. When
+    nothing can be resumed, or the feed stays down longer than the regular
+    user cache TTL, the user caches are flushed instead.
+    """
+
+    def __init__(self, retry_seconds: float, read_timeout: float, feed_ttl: float):
+        self.retry_seconds = retry_seconds
+        self.read_timeout = read_timeout
+        self.feed_ttl = feed_ttl
+        self.connected = False
+        self.last_event_id: Optional[str] = None
+        self.events = 0
+        self.resets = 0
+        self._has_connected = False
+        self._disconnected_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def user_ttl(self) -> Optional[float]:
+        """TTL of a user cached now: the feed TTL while connected, else the cache default."""
+        return self.feed_ttl if self.connected else None
+
+    def apply(self, event: dict):
+        """Invalidate what a feed event makes stale."""
+        self.events += 1
+        op = event.get("op")
+        if op == "reset":
+            self.reset()
+            return
+        if op == "insert":
+            response_cache.purge_tags(["user/list"])
+            return
+        if op == "roles":
+            response_cache.purge_tags(ROLE_RESPONSE_TAGS)
+            return
+        if event.get("keycloak_uid"):
+            invalidate_user(event["keycloak_uid"])
+        elif event.get("id"):
+            # deletes carry no Keycloak UID unless IAM reads pre-images: find the user by id
+            for keycloak_uid, user in user_cache.items():
+                if isinstance(user, dict) and user.get("id") == event["id"]:
+                    invalidate_user(keycloak_uid)
+        response_cache.purge_tags(USER_RESPONSE_TAGS)
+
+    def reset(self):
+        """Drop every cached user and user response, for when changes may have been missed."""
+        self.resets += 1
+        user_cache.clear()
+        response_cache.purge_tags(USER_RESPONSE_TAGS)
+        logger.info("User caches flushed (user change feed reset)")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.connected = False
+
+    async def _run(self):
+        delay = self.retry_seconds
+        outage_logged = False
+        while True:
+            try:
+                await self._follow()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if self.connected or not outage_logged:
+                    if settings.WORKERS > 1:
+                        logger.warning(f"User change feed unavailable, IAM invalidations reach a single worker: {e}")
+                    else:
+                        logger.warning(f"User change feed unavailable: {e}")
+                    outage_logged = True
+            if self.connected:
+                delay = self.retry_seconds
+            self._on_disconnected()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, _MAX_RETRY_SECONDS)
+
+    async def _follow(self):
+        headers = system_identity_headers()
+        if self.last_event_id:
+            headers["Last-Event-ID"] = self.last_event_id
+        base_url = upstreams.balancer("user").pick().url
+        timeout = httpx.Timeout(settings.UPSTREAM_CONNECT_TIMEOUT, read=self.read_timeout)
+        async with upstreams.get("user").stream(
+            "GET", f"{base_url}/internal/user_events", headers=headers, timeout=timeout
+        ) as response:
+            if response.status_code != 200:
+                raise FeedUnavailable(f"IAM answered {response.status_code}")
+            self._on_connected()
+
+            event_id, data = None, []
+            async for line in response.aiter_lines():
+                if line:
+                    field, _, value = line.partition(":")
+                    if field == "id":
+                        event_id = value.strip()
+                    elif field == "data":
+                        data.append(value.strip())
+                    # "event" is always "user"; lines starting with ":" are keepalives
+                    continue
+                if data:
+                    self.apply(loads("\n".join(data)))
+                if event_id:
+                    self.last_event_id = event_id
+                event_id, data = None, []
+
+    def _on_connected(self):
+        # without a position to resume from, IAM cannot replay what changed while disconnected
+        if self._has_connected and not self.last_event_id:
+            self.reset()
+        self._has_connected = True
+        self._disconnected_at = None
+        self.connected = True
+        logger.info("User change feed connected")
+
+    def _on_disconnected(self):
+        self.connected = False
+        now = time.monotonic()
+        if self._disconnected_at is None:
+            self._disconnected_at = now
+        elif self._has_connected and now - self._disconnected_at > settings.USER_CACHE_TTL:
+            # users cached with the feed TTL would otherwise outlive the regular TTL unseen
+            self.reset()
+            self._has_connected = False
+
+    def stats(self) -> dict:
+        return {
+            "connected": self.connected,
+            "last_event_id": self.last_event_id,
+            "events": self.events,
+            "resets": self.resets,
+        }
+
+
+user_events = UserEventSubscriber(
+    retry_seconds=settings.USER_EVENTS_RETRY_SECONDS,
+    read_timeout=settings.USER_EVENTS_READ_TIMEOUT,
+    feed_ttl=settings.USER_CACHE_FEED_TTL,
+)
@@ -0,0 +1,109 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from core.config import settings
+from api.routes import gateway, internal
+from services import balancer
+from services.balancer import LEAST_OUTSTANDING, POWER_OF_TWO, ROUND_ROBIN, ServiceBalancer
+
+URLS = ["http://iam-1:8081", "http://iam-2:8081", "http://iam-3:8081"]
+
+
+def picks(lb: ServiceBalancer, count: int) -> list:
+    return [lb.pick().url for _ in range(count)]
+
+
+def test_round_robin_cycles_through_instances():
+    lb = ServiceBalancer("user", URLS, ROUND_ROBIN)
+    assert picks(lb, 6) == URLS + URLS
+
+
+def test_unknown_strategy_falls_back_to_round_robin():
+    assert ServiceBalancer("user", URLS, "random").strategy == ROUND_ROBIN
+
+
+def test_least_outstanding_prefers_idle_instances():
+    lb = ServiceBalancer("user", URLS, LEAST_OUTSTANDING)
+    lb.instances[0].in_flight = 2
+    lb.instances[1].in_flight = 1
+    lb.instances[2].in_flight = 1
+    # ties are broken in turn
+    assert set(picks(lb, 2)) == {URLS[1], URLS[2]}
+    lb.instances[0].in_flight = 0
+    assert picks(lb, 3) == [URLS[0]] * 3
+
+
+def test_power_of_two_picks_the_less_loaded_sample(monkeypatch):
+    lb = ServiceBalancer("user", URLS, POWER_OF_TWO)
+    lb.instances[0].in_flight = 5
+    lb.instances[2].in_flight = 1
+    monkeypatch.setattr(balancer.random, "sample", lambda candidates, k: [candidates[0], candidates[2]])
+    assert lb.pick().url == URLS[2]
+    lb.instances[2].in_flight = 5
+    # equal load keeps the first sample
+    assert lb.pick().url == URLS[0]
+
+
+async def test_acquire_counts_in_flight():
+    lb = ServiceBalancer("user", URLS[:1], ROUND_ROBIN)
+    async with lb.acquire() as instance:
+        assert instance.in_flight == 1
+    assert instance.in_flight == 0
+
+
+def test_instance_ejected_after_consecutive_failures():
+    lb = ServiceBalancer("user", URLS[:2], ROUND_ROBIN, eject_after=2)
+    failing = lb.instances[0]
+    lb.record_check(failing, False, "/readyz returned 503")
+    assert failing.healthy
+    lb.record_check(failing, True)
+    lb.record_check(failing, False, "/readyz returned 503")
+    assert failing.healthy
+    lb.record_check(failing, False, "/readyz returned 503")
+    assert not failing.healthy
+    assert failing.last_error == "/readyz returned 503"
+    assert picks(lb, 3) == [URLS[1]] * 3
+
+
+def test_instance_readmitted_after_consecutive_passes():
+    lb = ServiceBalancer("user", URLS[:2], ROUND_ROBIN, eject_after=1, readmit_after=2)
+    instance = lb.instances[0]
+    lb.record_check(instance, False, "down")
+    lb.record_check(instance, True)
+    assert not instance.healthy
+    lb.record_check(instance, False, "down")
+    lb.record_check(instance, True)
+    assert not instance.healthy
+    lb.record_check(instance, True)
+    assert instance.healthy
+    assert instance.last_error is None
+
+
+def test_all_ejected_uses_every_instance():
+    lb = ServiceBalancer("user", URLS[:2], ROUND_ROBIN, eject_after=1)
+    for instance in lb.instances:
+        lb.record_check(instance, False, "down")
+    assert sorted(picks(lb, 2)) == URLS[:2]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(settings, "INTERNAL_API_KEY", "internal-key")
+    app = FastAPI()
+    app.include_router(gateway.router)
+    app.include_router(internal.router)
+    return TestClient(app)
+
+
+def test_public_health_hides_upstream_details(client):
+    response = client.get("/health")
+    assert response.status_code == 200
+    assert response.json() == {"status": "ok"}
+
+
+def test_upstream_details_need_the_internal_key(client, monkeypatch):
+    monkeypatch.setattr(internal.upstreams, "health", lambda: {"user": {"state": "closed"}})
+    assert client.get("/internal/upstreams").status_code == 403
+    response = client.get("/internal/upstreams", headers={"X-Internal-Key": "internal-key"})
+    assert response.status_code == 200
+    assert response.json() == {"user": {"state": "closed"}}
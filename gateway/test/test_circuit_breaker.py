@@ -0,0 +1,147 @@
+import asyncio
+import types
+import pytest
+from services import circuit_breaker
+from services.circuit_breaker import CLOSED, HALF_OPEN, OPEN, UpstreamGuard, UpstreamUnavailable
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = {"t": 100.0}
+    monkeypatch.setattr(circuit_breaker, "time", types.SimpleNamespace(monotonic=lambda: now["t"]))
+    return now
+
+
+def make_guard(**overrides) -> UpstreamGuard:
+    config = dict(
+        max_in_flight=0, window=10, min_calls=4, error_rate=0.5, p95_ms=0, open_seconds=30, half_open_calls=1,
+    )
+    config.update(overrides)
+    return UpstreamGuard("user", **config)
+
+
+async def run(guard, failed=False, duration=0.0, clock=None):
+    async with guard.call() as call:
+        if clock is not None:
+            clock["t"] += duration
+        call.failed = failed
+
+
+async def open_guard(guard, clock):
+    for _ in range(4):
+        await run(guard, failed=True)
+    assert guard.state == OPEN
+    clock["t"] += 31
+
+
+async def test_opens_on_error_rate(clock):
+    guard = make_guard()
+    for failed in (False, True, False):
+        await run(guard, failed=failed)
+    assert guard.state == CLOSED
+    await run(guard, failed=True)
+    assert guard.state == OPEN
+    with pytest.raises(UpstreamUnavailable) as e:
+        await run(guard)
+    assert e.value.retry_after == 30
+    assert guard.rejected == 1
+
+
+async def test_exceptions_count_as_failures(clock):
+    guard = make_guard(min_calls=2)
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            async with guard.call():
+                raise RuntimeError("upstream down")
+    assert guard.state == OPEN
+
+
+async def test_opens_on_p95_latency(clock):
+    guard = make_guard(p95_ms=500)
+    for duration in (0.1, 0.1, 0.1):
+        await run(guard, duration=duration, clock=clock)
+    assert guard.state == CLOSED
+    await run(guard, duration=2.0, clock=clock)
+    assert guard.state == OPEN
+
+
+async def test_half_open_probe_success_closes(clock):
+    guard = make_guard()
+    await open_guard(guard, clock)
+    await run(guard)
+    assert guard.state == CLOSED
+    assert guard.snapshot()["error_rate"] == 0.0
+
+
+async def test_half_open_probe_failure_reopens(clock):
+    guard = make_guard()
+    await open_guard(guard, clock)
+    await run(guard, failed=True)
+    assert guard.state == OPEN
+    assert guard.opened_count == 2
+
+
+async def test_half_open_admits_limited_probes(clock):
+    guard = make_guard()
+    await open_guard(guard, clock)
+    async with guard.call():
+        assert guard.state == HALF_OPEN
+        with pytest.raises(UpstreamUnavailable, match="half-open"):
+            await run(guard)
+    assert guard.state == CLOSED
+
+
+async def test_call_started_before_opening_does_not_resolve_half_open(clock):
+    guard = make_guard()
+    slow = guard.call()
+    slow_call = await slow.__aenter__()
+    await open_guard(guard, clock)
+
+    # the probe is admitted, then the slow pre-open call succeeds: still half-open
+    probe = guard.call()
+    await probe.__aenter__()
+    assert guard.state == HALF_OPEN
+    slow_call.failed = False
+    await slow.__aexit__(None, None, None)
+    assert guard.state == HALF_OPEN
+
+    await probe.__aexit__(None, None, None)
+    assert guard.state == CLOSED
+
+
+async def test_in_flight_rejection_does_not_use_a_probe(clock):
+    guard = make_guard()
+    busy = guard.call()
+    await busy.__aenter__()
+    await open_guard(guard, clock)
+    guard.max_in_flight = 1
+
+    with pytest.raises(UpstreamUnavailable, match="in flight"):
+        await run(guard)
+    await busy.__aexit__(None, None, None)
+    assert guard.state == HALF_OPEN
+
+    # the probe slot is still free
+    await run(guard)
+    assert guard.state == CLOSED
+
+
+async def test_cancelled_probe_frees_its_slot(clock):
+    guard = make_guard()
+    await open_guard(guard, clock)
+    with pytest.raises(asyncio.CancelledError):
+        async with guard.call():
+            raise asyncio.CancelledError()
+    assert guard.state == HALF_OPEN
+    assert guard.in_flight == 0
+    await run(guard)
+    assert guard.state == CLOSED
+
+
+async def test_cancellations_are_not_recorded(clock):
+    guard = make_guard(min_calls=1)
+    with pytest.raises(asyncio.CancelledError):
+        async with guard.call():
+            raise asyncio.CancelledError()
+    assert guard.state == CLOSED
+    assert guard.snapshot()["error_rate"] == 0.0
@@ -0,0 +1,20 @@
+import pytest
+from core.config import Settings
+
+
+def test_streaming_routes_are_matched_exactly():
+    settings = Settings(GATEWAY_STREAMING_ROUTES=["user/bulk_create"])
+    assert settings.is_streaming_route("user", "bulk_create")
+    assert not settings.is_streaming_route("user", "update")
+
+
+def test_streaming_route_wildcards_are_rejected():
+    with pytest.raises(ValueError, match="explicit service/action"):
+        Settings(GATEWAY_STREAMING_ROUTES=["user/*"])
+
+
+def test_several_workers_need_the_user_change_feed():
+    with pytest.raises(ValueError, match="GATEWAY_USER_EVENTS_ENABLED"):
+        Settings(GATEWAY_WORKERS=2, GATEWAY_USER_EVENTS_ENABLED=False)
+    assert Settings(GATEWAY_WORKERS=2).USER_EVENTS_ENABLED
+    assert not Settings(GATEWAY_WORKERS=1, GATEWAY_USER_EVENTS_ENABLED=False).USER_EVENTS_ENABLED
@@ -0,0 +1,54 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from core.config import settings
+from api.routes import internal
+from services.user_cache import user_cache
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(settings, "INTERNAL_API_KEY", "internal-key")
+    app = FastAPI()
+    app.include_router(internal.router)
+    user_cache.clear()
+    yield TestClient(app)
+    user_cache.clear()
+
+
+def test_invalidate_drops_cached_user(client):
+    user_cache.set("uid-1", {"id": "1"})
+    response = client.post(
+        "/internal/users/invalidate", json={"keycloak_uid": "uid-1"}, headers={"X-Internal-Key": "internal-key"}
+    )
+    assert response.status_code == 200
+    assert response.json() == {"invalidated": True}
+    assert user_cache.get("uid-1") is None
+
+
+@pytest.mark.parametrize("headers", [{}, {"X-Internal-Key": "wrong-key"}, {"X-Internal-Key": ""}])
+def test_invalidate_rejects_missing_or_wrong_key(client, headers):
+    user_cache.set("uid-1", {"id": "1"})
+    response = client.post("/internal/users/invalidate", json={"keycloak_uid": "uid-1"}, headers=headers)
+    assert response.status_code == 403
+    assert user_cache.get("uid-1") == {"id": "1"}
+
+
+def test_invalidate_denied_without_configured_key(client, monkeypatch):
+    monkeypatch.setattr(settings, "INTERNAL_API_KEY", None)
+    response = client.post(
+        "/internal/users/invalidate", json={"keycloak_uid": "uid-1"}, headers={"X-Internal-Key": "internal-key"}
+    )
+    assert response.status_code == 403
+
+
+def test_roles_event_purges_only_role_responses(monkeypatch):
+    from services import user_events
+
+    purged = []
+    monkeypatch.setattr(user_events.response_cache, "purge_tags", purged.extend)
+    user_cache.set("uid-1", {"id": "1"})
+    user_events.user_events.apply({"op": "roles"})
+    assert purged == ["user/roles"]
+    assert user_cache.get("uid-1") == {"id": "1"}
+    user_cache.clear()
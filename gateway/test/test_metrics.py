@@ -0,0 +1,25 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from core.config import settings
+from api.routes import gateway
+
+
+def make_client() -> TestClient:
+    app = FastAPI()
+    app.include_router(gateway.router)
+    return TestClient(app)
+
+
+def test_metrics_disabled_without_token(monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", None)
+    assert make_client().get("/metrics").status_code == 404
+
+
+def test_metrics_require_the_token(monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "scrape-token")
+    client = make_client()
+    assert client.get("/metrics").status_code == 403
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 403
+    response = client.get("/metrics", headers={"Authorization": "Bearer scrape-token"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
@@ -0,0 +1,129 @@
+import types
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from core.config import settings
+from services import rate_limit
+from services.rate_limit import MemoryRateLimitStore, SlidingWindowLimiter, client_ip
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = {"t": 1000.0}
+    monkeypatch.setattr(rate_limit, "time", types.SimpleNamespace(time=lambda: now["t"]))
+    return now
+
+
+def make_request(host="10.0.0.1", forwarded=None):
+    headers = {"x-forwarded-for": forwarded} if forwarded else {}
+    return types.SimpleNamespace(headers=headers, client=types.SimpleNamespace(host=host))
+
+
+async def test_limit_within_one_window(clock):
+    limiter = SlidingWindowLimiter(MemoryRateLimitStore(max_keys=100), window=60)
+    for _ in range(3):
+        assert await limiter.hit("user:a", 3) is None
+    # 40s into the window (1000 = 16 * 60 + 40): retry once it ends
+    assert await limiter.hit("user:a", 3) == 20
+    assert limiter.rejected == 1
+
+
+async def test_previous_window_is_weighted_by_overlap(clock):
+    limiter = SlidingWindowLimiter(MemoryRateLimitStore(max_keys=100), window=60)
+    clock["t"] = 960.0
+    for _ in range(4):
+        await limiter.hit("user:a", 10)
+    # 15s into the next window: 4 * 0.75 + 1 = 4 attempts estimated
+    clock["t"] = 1035.0
+    assert await limiter.hit("user:a", 4) is None
+    # 4 * 0.75 + 2 = 5 > 4
+    assert await limiter.hit("user:a", 4) == 45
+    # two windows later nothing is carried over
+    clock["t"] = 1140.0
+    assert await limiter.hit("user:a", 1) is None
+
+
+async def test_zero_limit_disables(clock):
+    limiter = SlidingWindowLimiter(MemoryRateLimitStore(max_keys=100), window=60)
+    for _ in range(5):
+        assert await limiter.hit("ip:x", 0) is None
+
+
+async def test_memory_store_evicts_least_recently_used_keys(clock):
+    store = MemoryRateLimitStore(max_keys=2)
+    await store.increment("a", 60)
+    await store.increment("b", 60)
+    await store.increment("a", 60)
+    await store.increment("c", 60)
+    assert await store.increment("a", 60) == (0, 3, 40.0)
+    # "b" was evicted, so its count starts over
+    assert await store.increment("b", 60) == (0, 1, 40.0)
+
+
+async def test_reset_clears_counts(clock):
+    limiter = SlidingWindowLimiter(MemoryRateLimitStore(max_keys=100), window=60)
+    for _ in range(2):
+        await limiter.hit("user:a", 2)
+    await limiter.reset("user:a")
+    assert await limiter.hit("user:a", 2) is None
+
+
+async def test_store_errors_fail_open():
+    class BrokenStore:
+        async def increment(self, key, window):
+            raise ConnectionError("store down")
+
+        async def reset(self, key, window):
+            raise ConnectionError("store down")
+
+    limiter = SlidingWindowLimiter(BrokenStore(), window=60)
+    assert await limiter.hit("user:a", 1) is None
+    await limiter.reset("user:a")
+    assert limiter.rejected == 0
+
+
+def test_client_ip_ignores_forwarded_for_by_default(monkeypatch):
+    monkeypatch.setattr(settings, "TRUST_FORWARDED_FOR", False)
+    assert client_ip(make_request(forwarded="1.2.3.4")) == "10.0.0.1"
+
+
+def test_client_ip_uses_first_forwarded_for_when_trusted(monkeypatch):
+    monkeypatch.setattr(settings, "TRUST_FORWARDED_FOR", True)
+    assert client_ip(make_request(forwarded="1.2.3.4, 10.0.0.2")) == "1.2.3.4"
+    assert client_ip(make_request()) == "10.0.0.1"
+    assert client_ip(types.SimpleNamespace(headers={}, client=None)) == "unknown"
+
+
+def test_successful_login_resets_username_count(monkeypatch):
+    from api.routes import gateway
+
+    class KeycloakResponse:
+        status_code = 200
+
+        def json(self):
+            return {"access_token": "token", "expires_in": 300, "refresh_expires_in": 1800, "refresh_token": "r"}
+
+    async def handle_login(request):
+        return KeycloakResponse()
+
+    async def get_user_info(token):
+        return types.SimpleNamespace(id="uid-1")
+
+    async def get_by_keycloak_uid(keycloak_uid):
+        return {"id": "1", "keycloak_uid": keycloak_uid}
+
+    limiter = SlidingWindowLimiter(MemoryRateLimitStore(max_keys=100), window=60)
+    monkeypatch.setattr(gateway, "login_limiter", limiter)
+    monkeypatch.setattr(rate_limit, "login_limiter", limiter)
+    monkeypatch.setattr(gateway, "handle_login", handle_login)
+    monkeypatch.setattr(gateway, "get_user_info", get_user_info)
+    monkeypatch.setattr(gateway, "get_by_keycloak_uid", get_by_keycloak_uid)
+    monkeypatch.setattr(settings, "LOGIN_RATE_LIMIT_PER_USERNAME", 2)
+    monkeypatch.setattr(settings, "LOGIN_RATE_LIMIT_PER_IP", 0)
+
+    app = FastAPI()
+    app.include_router(gateway.router)
+    client = TestClient(app)
+    for _ in range(5):
+        response = client.post("/api/login", json={"username": "Alice", "password": "secret"})
+        assert response.status_code == 200
@@ -0,0 +1,113 @@
+import asyncio
+import types
+import pytest
+from shared.cache import ttl_cache
+from services import response_cache as response_cache_module
+from services.response_cache import ResponseCache, build_cache_key
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = {"t": 1000.0}
+    fake = types.SimpleNamespace(time=lambda: now["t"], monotonic=lambda: now["t"])
+    monkeypatch.setattr(response_cache_module, "time", fake)
+    monkeypatch.setattr(ttl_cache, "time", fake)
+    return now
+
+
+def counting_loader(calls: list, release: asyncio.Event = None):
+    async def loader():
+        calls.append(1)
+        if release is not None:
+            await release.wait()
+        return {"status_code": 200, "data": {"version": len(calls)}}
+    return loader
+
+
+async def test_stale_entry_is_served_during_one_background_refresh(clock):
+    cache = ResponseCache(max_size=10)
+    calls = []
+    release = asyncio.Event()
+    loader = counting_loader(calls, release)
+    release.set()
+    assert (await cache.fetch("k", ["user"], 10, 30, loader))["data"] == {"version": 1}
+
+    clock["t"] += 5
+    assert (await cache.fetch("k", ["user"], 10, 30, loader))["data"] == {"version": 1}
+    assert calls == [1]
+
+    # stale window: every caller gets the cached response, only one refresh runs
+    clock["t"] += 10
+    release.clear()
+    results = await asyncio.gather(*(cache.fetch("k", ["user"], 10, 30, loader) for _ in range(5)))
+    assert all(result["data"] == {"version": 1} for result in results)
+    assert len(calls) == 2
+    assert cache.stale_hits == 5
+
+    release.set()
+    await asyncio.gather(*cache._tasks)
+    assert (await cache.fetch("k", ["user"], 10, 30, loader))["data"] == {"version": 2}
+    assert cache.hits == 2
+
+
+async def test_entry_past_the_stale_window_is_reloaded(clock):
+    cache = ResponseCache(max_size=10)
+    calls = []
+    loader = counting_loader(calls)
+    await cache.fetch("k", ["user"], 10, 30, loader)
+    clock["t"] += 41
+    assert (await cache.fetch("k", ["user"], 10, 30, loader))["data"] == {"version": 2}
+    assert cache.misses == 2
+
+
+async def test_error_responses_are_not_cached(clock):
+    cache = ResponseCache(max_size=10)
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        return {"status_code": 503, "message": "Service unavailable"}
+
+    await cache.fetch("k", ["user"], 10, 30, loader)
+    await cache.fetch("k", ["user"], 10, 30, loader)
+    assert len(calls) == 2
+
+
+async def test_callers_get_copies(clock):
+    cache = ResponseCache(max_size=10)
+    loader = counting_loader([])
+    (await cache.fetch("k", ["user"], 10, 30, loader)).pop("status_code")
+    assert (await cache.fetch("k", ["user"], 10, 30, loader))["status_code"] == 200
+
+
+async def test_purge_removes_only_tagged_entries(clock):
+    cache = ResponseCache(max_size=10)
+    loader = counting_loader([])
+    await cache.fetch("roles", ["user", "user/roles"], 10, 30, loader)
+    await cache.fetch("get", ["user", "user/get"], 10, 30, loader)
+    await cache.fetch("other", ["billing", "billing/list"], 10, 30, loader)
+
+    assert cache.purge_tags(["user/roles", "unknown"]) == 1
+    assert cache._entries.get("roles") is None
+    assert cache._entries.get("get") is not None
+    assert cache.purge_tags(["user"]) == 1
+    assert cache._entries.get("other") is not None
+
+
+def test_cache_key_depends_on_caller_identity():
+    base = ("user", "roles", None, {"page": "1"})
+    user = {"id": "u1", "roles": ["r-user"]}
+    assert build_cache_key(*base, user) == build_cache_key(*base, {"id": "u1", "roles": ["r-user"]})
+    assert build_cache_key(*base, user) != build_cache_key(*base, {"id": "u1", "roles": ["r-user", "r-admin"]})
+    assert build_cache_key(*base, user) != build_cache_key(*base, {"id": "u2", "roles": ["r-user"]})
+    # role order does not matter
+    assert build_cache_key(*base, {"id": "u1", "roles": ["a", "b"]}) == build_cache_key(*base, {"id": "u1", "roles": ["b", "a"]})
+
+
+def test_cache_key_depends_on_route_and_params():
+    user = {"id": "u1", "roles": []}
+    key = build_cache_key("user", "list", None, {"a": "1", "b": "2"}, user)
+    assert key == build_cache_key("user", "list", None, {"b": "2", "a": "1"}, user)
+    assert key != build_cache_key("user", "list", None, {"a": "1"}, user)
+    assert key != build_cache_key("user", "get", None, {"a": "1", "b": "2"}, user)
+    assert key != build_cache_key("user", "list", "x", {"a": "1", "b": "2"}, user)
@@ -0,0 +1,76 @@
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from core.config import settings
+from services import proxy
+from services.upstream import UpstreamClients
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Streaming proxy in front of a mock 'user' service; `handler` answers its requests."""
+    clients = UpstreamClients()
+    state = {"handler": None}
+    clients._clients["user"] = httpx.AsyncClient(transport=httpx.MockTransport(lambda r: state["handler"](r)))
+    monkeypatch.setattr(proxy, "upstreams", clients)
+    monkeypatch.setattr(settings, "SERVICE_MAP", {"user": "http://iam:8081"})
+    monkeypatch.setattr(type(settings), "SYSTEM_ADMIN_ID", "admin-id")
+
+    app = FastAPI()
+
+    @app.api_route("/api/{service}/{action}", methods=["GET", "POST"])
+    async def handle(request: Request, service: str, action: str):
+        request.state.user = {"id": "u1", "roles": []}
+        return await proxy.stream_request(service, action, request)
+
+    state["client"] = TestClient(app)
+    state["guard"] = clients.guard("user")
+    state["balancer"] = clients.balancer("user")
+    return state
+
+
+def test_slot_is_held_until_the_body_is_relayed(upstream):
+    in_flight = []
+
+    async def body():
+        for chunk in (b"a" * 10, b"b" * 10):
+            in_flight.append((upstream["guard"].in_flight, upstream["balancer"].instances[0].in_flight))
+            yield chunk
+
+    upstream["handler"] = lambda request: httpx.Response(200, content=body())
+    response = upstream["client"].get("/api/user/export")
+    assert response.status_code == 200
+    assert response.content == b"a" * 10 + b"b" * 10
+    assert in_flight == [(1, 1), (1, 1)]
+    assert upstream["guard"].in_flight == 0
+    assert upstream["balancer"].instances[0].in_flight == 0
+
+
+@pytest.mark.parametrize("error, status_code", [
+    (httpx.ConnectError("refused"), 503),
+    (httpx.ConnectTimeout("timed out"), 503),
+    (httpx.ReadTimeout("timed out"), 502),
+    (httpx.RemoteProtocolError("disconnected"), 502),
+])
+def test_transport_errors_map_to_gateway_statuses(upstream, error, status_code):
+    def handler(request):
+        raise error
+
+    upstream["handler"] = handler
+    response = upstream["client"].get("/api/user/export")
+    assert response.status_code == status_code
+    assert upstream["guard"].in_flight == 0
+    assert upstream["guard"].snapshot()["error_rate"] == 1.0
+
+
+def test_interrupted_body_counts_as_a_failure(upstream):
+    async def body():
+        yield b"partial"
+        raise httpx.ReadError("connection reset")
+
+    upstream["handler"] = lambda request: httpx.Response(200, content=body())
+    with pytest.raises(httpx.ReadError):
+        upstream["client"].get("/api/user/export")
+    assert upstream["guard"].in_flight == 0
+    assert upstream["guard"].snapshot()["error_rate"] == 1.0
@@ -0,0 +1,103 @@
+import asyncio
+from shared.cache import TTLCache
+
+
+async def test_concurrent_misses_share_one_load():
+    cache = TTLCache(max_size=10, ttl=60)
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"id": "1"}
+
+    results = await asyncio.gather(*(cache.get_or_load("uid", loader) for _ in range(20)))
+    assert calls == 1
+    assert all(r == {"id": "1"} for r in results)
+
+
+async def test_none_results_are_not_cached():
+    cache = TTLCache(max_size=10, ttl=60)
+
+    async def loader():
+        return None
+
+    assert await cache.get_or_load("uid", loader) is None
+    assert len(cache) == 0
+
+
+def test_lru_eviction_and_expiry():
+    cache = TTLCache(max_size=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    cache.set("d", 4, ttl=0)
+    assert cache.get("d") is None
+
+
+async def test_load_invalidated_while_running_is_not_stored():
+    cache = TTLCache(max_size=10, ttl=60)
+    release = asyncio.Event()
+
+    async def stale_loader():
+        await release.wait()
+        return {"id": "1", "email": "old@example.com"}
+
+    load = asyncio.create_task(cache.get_or_load("uid", stale_loader))
+    await asyncio.sleep(0)
+    cache.delete("uid")
+
+    # a lookup after the invalidation does not join the stale load
+    fresh = await cache.get_or_load("uid", lambda: asyncio.sleep(0, {"id": "1", "email": "new@example.com"}))
+    assert fresh["email"] == "new@example.com"
+
+    release.set()
+    assert (await load)["email"] == "old@example.com"
+    assert cache.get("uid")["email"] == "new@example.com"
+
+
+async def test_clear_invalidates_running_loads():
+    cache = TTLCache(max_size=10, ttl=60)
+    release = asyncio.Event()
+
+    async def loader():
+        await release.wait()
+        return {"id": "1"}
+
+    load = asyncio.create_task(cache.get_or_load("uid", loader))
+    await asyncio.sleep(0)
+    cache.clear()
+    release.set()
+    assert await load == {"id": "1"}
+    assert cache.get("uid") is None
+
+
+async def test_first_load_after_invalidation_reads_the_primary(monkeypatch):
+    from core.config import settings
+    from services import proxy, user_cache
+
+    cache = TTLCache(max_size=10, ttl=60)
+    monkeypatch.setattr(user_cache, "user_cache", cache)
+    monkeypatch.setattr(user_cache, "_invalidated", TTLCache(max_size=10, ttl=60))
+    monkeypatch.setattr(proxy, "user_cache", cache)
+    monkeypatch.setattr(proxy.user_events, "user_ttl", lambda: None)
+    monkeypatch.setattr(settings, "USER_BATCH_WINDOW_MS", 0)
+    reads = []
+
+    async def fetch(uid, primary=False):
+        reads.append(primary)
+        return {"id": "1", "keycloak_uid": uid}
+
+    monkeypatch.setattr(proxy, "_fetch_by_keycloak_uid", fetch)
+
+    await proxy.get_by_keycloak_uid("uid")
+    user_cache.invalidate_user("uid")
+    await proxy.get_by_keycloak_uid("uid")
+    await proxy.get_by_keycloak_uid("uid")
+    cache.delete("uid")
+    await proxy.get_by_keycloak_uid("uid")
+    assert reads == [False, True, False]
@@ -1,7 +1,8 @@
 from fastapi import FastAPI
-from .routes import user, health
+from .routes import user, health, events
 
 
 def init_routes(app: FastAPI):
     app.include_router(health.router, tags=["health"])
     app.include_router(user.router, tags=["user"])
+    app.include_router(events.router, tags=["events"])
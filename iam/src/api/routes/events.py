@@ -0,0 +1,47 @@
+import asyncio
+from fastapi import APIRouter, Depends, Header, status
+from fastapi.responses import StreamingResponse
+from typing import Any, Dict, Union
+from core.config import settings
+from shared.http import FastJSONResponse, dumps
+from utils.identity import get_request_user
+from utils.user_events import user_change_feed
+
+router = APIRouter(prefix="/internal")
+
+
+async def _event_stream(queue: asyncio.Queue):
+    """Server-sent events from a feed subscription, with keepalive comments while idle."""
+    try:
+        yield b": connected\n\n"
+        while True:
+            try:
+                event_id, event = await asyncio.wait_for(queue.get(), settings.USER_EVENTS_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+            head = f"id: {event_id}\n".encode() if event_id else b""
+            yield head + b"event: user\ndata: " + dumps(event) + b"\n\n"
+    finally:
+        user_change_feed.unsubscribe(queue)
+
+
+@router.get("/user_events")
+async def user_events(
+        user: Dict[str, Any] = Depends(get_request_user),
+        last_event_id: Union[str, None] = Header(default=None)
+):
+    # only the gateway's own calls (made on no user's behalf) may subscribe
+    if user:
+        return FastJSONResponse(content={"message": "Access denied"}, status_code=status.HTTP_403_FORBIDDEN)
+    if not user_change_feed.available:
+        return FastJSONResponse(
+            content={"message": "User change feed unavailable"},
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+    queue = user_change_feed.subscribe(last_event_id)
+    return StreamingResponse(
+        _event_stream(queue),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
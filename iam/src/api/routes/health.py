@@ -1,7 +1,12 @@
 import httpx
-from fastapi import APIRouter, status
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Header, status
+from shared.http import FastJSONResponse
+from typing import Union
 from core.config import settings
+from utils.admin_token import admin_tokens
+from utils.mongo_pool import pool_monitor
+from utils.user_events import user_change_feed
+from shared.metrics import metrics_response
 from auth_gateway_serverkit.keycloak.config import settings as kc_settings
 
 router = APIRouter()
@@ -11,7 +16,12 @@ _health_client = httpx.AsyncClient(timeout=5)
 
 @router.get("/health")
 async def health():
-    return JSONResponse(content={"status": "ok"}, status_code=status.HTTP_200_OK)
+    return FastJSONResponse(content={"status": "ok"}, status_code=status.HTTP_200_OK)
+
+
+@router.get("/metrics")
+async def metrics(authorization: Union[str, None] = Header(default=None)):
+    return metrics_response(authorization, settings.METRICS_TOKEN)
 
 
 @router.get("/readyz")
@@ -34,7 +44,13 @@ async def readyz():
         checks["keycloak"] = False
 
     all_healthy = all(checks.values())
-    return JSONResponse(
-        content={"status": "ready" if all_healthy else "not_ready", "checks": checks},
+    return FastJSONResponse(
+        content={
+            "status": "ready" if all_healthy else "not_ready",
+            "checks": checks,
+            "admin_token": admin_tokens.stats(),
+            "mongo_pool": pool_monitor.stats(),
+            "user_events": user_change_feed.stats(),
+        },
         status_code=status.HTTP_200_OK if all_healthy else status.HTTP_503_SERVICE_UNAVAILABLE,
     )
@@ -1,16 +1,27 @@
-from fastapi import APIRouter, Depends
-from typing import Tuple, List, Any, Dict
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
+from typing import Tuple, List, Any, Dict, Optional
 from core.config import settings
-from domains.users.schemas import CreateUser, UpdateUser, DeleteUser, GetUser, GetUserByKeycloakUid
-from auth_gateway_serverkit.request_handler import parse_request_body_to_model, response, get_request_user
+from domains.users.schemas import CreateUser, UpdateUser, DeleteUser, GetUser, GetUserByKeycloakUid, GetManyUsers, ListUsers
+from auth_gateway_serverkit.request_handler import parse_request_body_to_model, response
 from auth_gateway_serverkit.logger import init_logger
+from shared.tracing import tracer
 from domains.users.services import manager
+from utils.bulk_import import parse_bulk_rows, ndjson_line
+from utils.identity import get_request_user
+from utils.envelope import envelope, negotiate_envelope
 
-router = APIRouter()
+# every route requires a verified caller identity, shared with the handlers' own get_request_user
+router = APIRouter(dependencies=[Depends(get_request_user), Depends(negotiate_envelope)])
 
 logger = init_logger(__name__)
 
 
+def _split_fields(fields: str = None) -> Optional[List[str]]:
+    """The comma-separated `fields` query parameter as a list (None when absent)."""
+    return [field.strip() for field in fields.split(",") if field.strip()] if fields else None
+
+
 async def handle_request(
     data_errors: Tuple[Any, List[str]],
     action: callable,
@@ -19,14 +30,15 @@ async def handle_request(
     try:
         data, errors = data_errors
         if errors:
-            return response(validation_errors=errors)
-        if user:
-            res = await action(data, user)
-        else:
-            res = await action(data)
-        return response(res=res)
+            return envelope(response(validation_errors=errors))
+        with tracer.start_span(f"iam.{action.__name__}"):
+            if user:
+                res = await action(data, user)
+            else:
+                res = await action(data)
+        return envelope(response(res=res))
     except Exception as e:
-        return response(error=str(e))
+        return envelope(response(error=str(e)))
 
 
 @router.post("/create")
@@ -34,6 +46,20 @@ async def create_user(data_errors: Tuple[CreateUser, List[str]] = Depends(parse_
     return await handle_request(data_errors, manager.create_user)
 
 
+@router.post("/bulk_create")
+async def bulk_create_users(request: Request):
+    try:
+        rows = parse_bulk_rows(await request.body(), request.headers.get("content-type", ""))
+    except Exception as e:
+        return envelope(response(validation_errors=[f"Invalid import body: {str(e)}"]))
+
+    async def results():
+        async for result in manager.bulk_create_users(rows):
+            yield ndjson_line(result)
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+
 @router.put("/update")
 async def update_user(
         data_errors: Tuple[UpdateUser, List[str]] = Depends(parse_request_body_to_model(UpdateUser)),
@@ -49,14 +75,35 @@ async def delete_user(user_id: str):
 
 @router.get("/get")
 @router.get("/get/{user_id}")
-async def get_user(user_id: str = None, user: Dict[str, Any] = Depends(get_request_user)):
-    data_errors = (GetUser(user_id=user_id), [])
+async def get_user(user_id: str = None, fields: str = None, user: Dict[str, Any] = Depends(get_request_user)):
+    data_errors = (GetUser(user_id=user_id, fields=_split_fields(fields)), [])
     return await handle_request(data_errors, manager.get_user, user)
 
 
+@router.post("/get_many")
+async def get_many_users(
+        data_errors: Tuple[GetManyUsers, List[str]] = Depends(parse_request_body_to_model(GetManyUsers)),
+        user: Dict[str, Any] = Depends(get_request_user)
+):
+    return await handle_request(data_errors, manager.get_many_users, user)
+
+
+@router.get("/list")
+async def list_users(
+        limit: int = None,
+        cursor: str = None,
+        fields: str = None,
+        role: str = None,
+        name_prefix: str = None,
+        user: Dict[str, Any] = Depends(get_request_user)
+):
+    data_errors = (ListUsers(limit=limit, cursor=cursor, fields=_split_fields(fields), role=role, name_prefix=name_prefix), [])
+    return await handle_request(data_errors, manager.list_users, user)
+
+
 @router.get("/get_by_keycloak_uid/{keycloak_uid}")
-async def get_user_by_keycloak_uid(keycloak_uid: str):
-    data_errors = (GetUserByKeycloakUid(keycloak_uid=keycloak_uid), [])
+async def get_user_by_keycloak_uid(keycloak_uid: str, fields: str = None, primary: bool = False):
+    data_errors = (GetUserByKeycloakUid(keycloak_uid=keycloak_uid, fields=_split_fields(fields), primary=primary), [])
     return await handle_request(data_errors, manager.get_user_by_keycloak_uid)
 
 
@@ -69,7 +116,15 @@ async def get_system_admin_id():
 async def get_roles(user: Dict[str, Any] = Depends(get_request_user)):
     try:
         roles = await manager.get_roles(user)
-        return response(res=roles)
+        return envelope(response(res=roles))
     except Exception as e:
-        return response(error=str(e))
+        return envelope(response(error=str(e)))
+
 
+@router.post("/roles/refresh")
+async def refresh_roles(user: Dict[str, Any] = Depends(get_request_user)):
+    try:
+        res = await manager.refresh_roles(user)
+        return envelope(response(res=res))
+    except Exception as e:
+        return envelope(response(error=str(e)))
@@ -3,6 +3,8 @@ from auth_gateway_serverkit.logger import init_logger
 from pydantic import Field
 from typing import ClassVar, Optional
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.read_concern import ReadConcern
+from pymongo.read_preferences import ReadPreference, make_read_preference, read_pref_mode_from_name
 from beanie import init_beanie
 from dotenv import load_dotenv
 import sys
@@ -16,6 +18,24 @@ class Settings(BaseSettings):
     # Database settings
     MONGO_CONNECTION_STRING: str
     DB_NAME: str
+    MONGO_MAX_POOL_SIZE: int = 100
+    MONGO_MIN_POOL_SIZE: int = 0
+    MONGO_MAX_IDLE_TIME_MS: Optional[int] = 300000
+    MONGO_WAIT_QUEUE_TIMEOUT_MS: Optional[int] = 2000  # max wait for a free pool connection
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = 2000
+    MONGO_CONNECT_TIMEOUT_MS: int = 2000
+    MONGO_SOCKET_TIMEOUT_MS: Optional[int] = None  # unset: operations are bounded by the per-operation timeouts below
+    MONGO_COMPRESSORS: list = []  # e.g. ["zstd", "snappy", "zlib"]; zstd and snappy need their Python packages
+    # Read preference and read concern of lookup-only queries (user gets, lists, counts).
+    # Reads inside a write flow always go to the primary (see db.mongo.user.read_your_writes).
+    MONGO_LOOKUP_READ_PREFERENCE: str = "secondaryPreferred"
+    MONGO_LOOKUP_READ_CONCERN: str = "local"
+    # Skip secondaries lagging further behind the primary (ignored for "primary"; minimum 90)
+    MONGO_LOOKUP_MAX_STALENESS_SECONDS: Optional[int] = 90
+    # Per-operation time limits (pymongo.timeout) of the data access functions, by kind
+    MONGO_LOOKUP_TIMEOUT_MS: int = 2000
+    MONGO_WRITE_TIMEOUT_MS: int = 5000
+    MONGO_BULK_TIMEOUT_MS: int = 60000
 
     # App settings
     PORT: int = Field(alias="IAM_PORT")
@@ -35,7 +55,7 @@ class Settings(BaseSettings):
     SYSTEM_ADMIN_PASSWORD: str
 
     # Keycloak settings (KEYCLOAK_CONFIG_VERSION in code; bump to force full Keycloak authz sync)
-    KEYCLOAK_CONFIG_VERSION: str = "0.0.1"
+    KEYCLOAK_CONFIG_VERSION: str = "0.0.4"
     SERVER_URL: str
     REALM: str
     CLIENT_ID: str
@@ -44,6 +64,45 @@ class Settings(BaseSettings):
     TOKEN_URL: str
     KC_BOOTSTRAP_ADMIN_USERNAME: str
     KC_BOOTSTRAP_ADMIN_PASSWORD: str
+    ADMIN_TOKEN_REFRESH_FRACTION: float = 0.75  # renew the cached Keycloak admin token at this fraction of its lifetime
+    ROLE_REFRESH_INTERVAL: int = 300  # seconds between background realm role reloads (0 disables)
+
+    # User listing (keyset pagination)
+    USERS_PAGE_DEFAULT_LIMIT: int = 50
+    USERS_PAGE_MAX_LIMIT: int = 200
+
+    # Batch user lookup
+    GET_MANY_MAX_IDS: int = 500
+
+    # Bulk user import
+    BULK_MAX_ROWS: int = 100000
+    BULK_KEYCLOAK_CONCURRENCY: int = 10
+    BULK_INSERT_CHUNK_SIZE: int = 500
+
+    # When set, GET /metrics requires 'Authorization: Bearer <token>'
+    METRICS_TOKEN: Optional[str] = None
+
+    # Tracing (exporter: "none", "file" or "otlp"); traces started by the gateway keep its sampling decision
+    TRACING_EXPORTER: str = "none"
+    TRACING_SAMPLE_RATIO: float = 0.01
+    TRACING_FILE_PATH: str = "iam-traces.jsonl"
+    TRACING_OTLP_ENDPOINT: Optional[str] = None
+
+    # User change feed: change stream on users served to gateways at /internal/user_events (needs a replica set)
+    USER_EVENTS_ENABLED: bool = True
+    USER_EVENTS_CHECKPOINT_INTERVAL: float = 5.0  # seconds between resume token saves
+    USER_EVENTS_BUFFER_SIZE: int = 1000  # recent events replayed to subscribers reconnecting with Last-Event-ID
+    USER_EVENTS_QUEUE_SIZE: int = 1000  # per subscriber; one falling further behind is sent a reset
+    USER_EVENTS_HEARTBEAT_SECONDS: float = 15.0
+    # Keycloak UIDs on delete events; needs changeStreamPreAndPostImages on the users collection (MongoDB 6.0+)
+    USER_EVENTS_PRE_IMAGES: bool = False
+
+    # Gateway settings (used to push cache invalidations)
+    GATEWAY_URL: Optional[str] = None
+    INTERNAL_API_KEY: Optional[str] = None
+    # HMAC key verifying the gateway's X-Identity envelope (defaults to INTERNAL_API_KEY)
+    IDENTITY_SIGNING_KEY: Optional[str] = None
+    IDENTITY_CACHE_MAX_SIZE: int = 10000
 
     # Static class vars (shared across instances)
     SYSTEM_ADMIN_ID: ClassVar[Optional[str]] = None
@@ -64,16 +123,41 @@ class Settings(BaseSettings):
         from domains.users.models import User
         from domains.service_versions.models import ServiceVersion
         
-        type(self)._motor_client = AsyncIOMotorClient(
-            self.MONGO_CONNECTION_STRING,
-            serverSelectionTimeoutMS=2000,
-            connectTimeoutMS=2000,
-            socketTimeoutMS=2000,
-        )
+        from utils.mongo_pool import pool_monitor
+
+        pool_monitor.max_pool_size = self.MONGO_MAX_POOL_SIZE
+        type(self)._motor_client = AsyncIOMotorClient(self.MONGO_CONNECTION_STRING, **self.mongo_client_options(pool_monitor))
         database = type(self)._motor_client[self.DB_NAME]
         
         await init_beanie(database=database, document_models=[User, ServiceVersion])
 
+    def mongo_client_options(self, *event_listeners) -> dict:
+        """Pool, timeout and compression options of the Motor client."""
+        options = {
+            "maxPoolSize": self.MONGO_MAX_POOL_SIZE,
+            "minPoolSize": self.MONGO_MIN_POOL_SIZE,
+            "maxIdleTimeMS": self.MONGO_MAX_IDLE_TIME_MS,
+            "waitQueueTimeoutMS": self.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+            "serverSelectionTimeoutMS": self.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            "connectTimeoutMS": self.MONGO_CONNECT_TIMEOUT_MS,
+            "socketTimeoutMS": self.MONGO_SOCKET_TIMEOUT_MS,
+            "event_listeners": list(event_listeners),
+        }
+        if self.MONGO_COMPRESSORS:
+            options["compressors"] = ",".join(self.MONGO_COMPRESSORS)
+        return options
+
+    def lookup_read_options(self) -> dict:
+        """with_options() arguments for lookup-only queries."""
+        mode = read_pref_mode_from_name(self.MONGO_LOOKUP_READ_PREFERENCE)
+        max_staleness = -1
+        if mode != ReadPreference.PRIMARY.mode and self.MONGO_LOOKUP_MAX_STALENESS_SECONDS:
+            max_staleness = self.MONGO_LOOKUP_MAX_STALENESS_SECONDS
+        return {
+            "read_preference": make_read_preference(mode, None, max_staleness),
+            "read_concern": ReadConcern(self.MONGO_LOOKUP_READ_CONCERN),
+        }
+
     def get_motor_client(self) -> Optional[AsyncIOMotorClient]:
         """Get the existing async MongoDB client instance."""
         return type(self)._motor_client
@@ -83,6 +167,10 @@ class Settings(BaseSettings):
         """Return True if the app is running in local/dev mode."""
         return self.ENVIRONMENT == "local"
 
+    @property
+    def identity_signing_key(self) -> Optional[str]:
+        return self.IDENTITY_SIGNING_KEY or self.INTERNAL_API_KEY
+
     @property
     def SYSTEM_ADMIN_ROLE_ID(self) -> Optional[str]:
         return self._system_admin_role_id
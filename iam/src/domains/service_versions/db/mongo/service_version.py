@@ -2,9 +2,11 @@
 
 from domains.service_versions.models import ServiceVersion
 from datetime import datetime, timezone
+from typing import Optional
 
 DEFAULT_VERSION = "0.0.0"
 KEYCLOAK_KEY = "keycloak"
+USER_EVENTS_KEY = "user_events"
 
 
 async def get_version(key: str = KEYCLOAK_KEY) -> str:
@@ -40,3 +42,37 @@ async def set_version(key: str, version: str) -> ServiceVersion:
         return doc
     doc = ServiceVersion(service=key, version=version)
     return await doc.insert()
+
+
+async def get_resume_token(key: str = USER_EVENTS_KEY) -> Optional[dict]:
+    """
+    Get the saved change stream resume token for a service key.
+
+    Args:
+        key: Service identifier (e.g. user_events)
+
+    Returns:
+        Resume token, or None if the stream has never been checkpointed
+    """
+    doc = await ServiceVersion.get_motor_collection().find_one({"service": key}, {"resume_token": 1})
+    return doc.get("resume_token") if doc else None
+
+
+async def set_resume_token(key: str, resume_token: Optional[dict]):
+    """
+    Save (or clear, with None) the change stream resume token for a service key
+    in one upsert, as it is called every few seconds while changes stream in.
+
+    Args:
+        key: Service identifier (e.g. user_events)
+        resume_token: Resume token of the last processed change
+    """
+    now = datetime.now(timezone.utc)
+    await ServiceVersion.get_motor_collection().update_one(
+        {"service": key},
+        {
+            "$set": {"resume_token": resume_token, "updated_at": now},
+            "$setOnInsert": {"version": DEFAULT_VERSION, "created_at": now},
+        },
+        upsert=True,
+    )
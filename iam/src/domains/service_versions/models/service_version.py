@@ -1,5 +1,6 @@
 from pydantic import Field
 from datetime import datetime, timezone
+from typing import Optional
 from beanie import Document
 from pymongo import IndexModel, ASCENDING
 
@@ -7,6 +8,7 @@ from pymongo import IndexModel, ASCENDING
 class ServiceVersion(Document):
     service: str = Field(..., description="Service identifier (e.g. keycloak)")
     version: str = Field(default="0.0.0", description="Current config version")
+    resume_token: Optional[dict] = Field(default=None, description="Last processed change stream position (change feed keys)")
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc), description="Creation timestamp")
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc), description="Last update timestamp")
 
@@ -5,10 +5,70 @@ decoupling the service layer from MongoDB-specific implementations.
 """
 
 from domains.users.models import User
-from typing import Optional, Union, List
-from bson import ObjectId
+import re
+import pymongo
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Optional, Union, List, Set, Tuple
+from bson import Binary, ObjectId
+from pymongo import DESCENDING
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 from datetime import datetime, timezone
 from uuid import UUID
+from core.config import settings
+from shared.metrics import MONGO_LATENCY, timed
+from shared.tracing import KIND_CLIENT, traced
+
+_timed = timed(MONGO_LATENCY, name_label="operation", collection="users")
+
+# causally consistent session of the current write flow, if any (see read_your_writes)
+_flow_session: ContextVar = ContextVar("users_flow_session", default=None)
+
+
+def _instrumented(kind: str):
+    """
+    Time (mongo_operation_duration_seconds) and trace a data access function,
+    bounding all its MongoDB calls by the MONGO_<KIND>_TIMEOUT_MS setting of
+    its kind ("lookup", "write" or "bulk").
+    """
+    timeout_setting = f"MONGO_{kind.upper()}_TIMEOUT_MS"
+
+    def decorator(func):
+        @wraps(func)
+        async def with_timeout(*args, **kwargs):
+            with pymongo.timeout(getattr(settings, timeout_setting) / 1000):
+                return await func(*args, **kwargs)
+
+        span = traced(f"mongo.users.{func.__name__}", KIND_CLIENT, **{"db.system": "mongodb", "db.collection": "users"})
+        return span(_timed(with_timeout))
+    return decorator
+
+
+class DuplicateUserError(Exception):
+    """
+    A write hit a unique index. field is "user_name" or "email" and value
+    the taken username or email; both are None when neither is identified.
+    """
+
+    def __init__(self, field: Optional[str], value: Optional[str] = None):
+        super().__init__(f"Duplicate user {field or 'identity'}")
+        self.field = field
+        self.value = value
+
+
+async def _duplicate_user_error(
+    error: DuplicateKeyError,
+    user_name: str,
+    email: str,
+    exclude_user_id: Optional[ObjectId] = None
+) -> DuplicateUserError:
+    """Name the field behind a duplicate key error: from the error's key pattern, else with one query."""
+    key_pattern = (error.details or {}).get("keyPattern") or {}
+    field = next((field for field in ("user_name", "email") if field in key_pattern), None)
+    if field is None:
+        field = await find_taken_identity(user_name, email, exclude_user_id)
+    return DuplicateUserError(field, {"user_name": user_name.lower(), "email": email}.get(field))
 
 
 def _to_uuid(value: Union[str, UUID]) -> UUID:
@@ -16,6 +76,53 @@ def _to_uuid(value: Union[str, UUID]) -> UUID:
     return UUID(value) if isinstance(value, str) else value
 
 
+@asynccontextmanager
+async def read_your_writes():
+    """
+    Scope of a write flow (read-modify-write, or a read right after a write).
+
+    Every users operation inside it runs in one causally consistent session
+    and lookups read from the primary instead of the lookup read preference,
+    so each read sees the flow's earlier writes. Nested scopes join the
+    outer session. Also usable as a decorator of async functions.
+    """
+    if _flow_session.get() is not None:
+        yield
+        return
+    client = User.get_motor_collection().database.client
+    async with await client.start_session(causal_consistency=True) as session:
+        token = _flow_session.set(session)
+        try:
+            yield
+        finally:
+            _flow_session.reset(token)
+
+
+def _session():
+    return _flow_session.get()
+
+
+def _lookup_collection(primary: bool = False):
+    """
+    The users collection for lookup-only queries: the configured lookup read
+    preference and read concern, or the primary inside read_your_writes()
+    and when primary is set.
+    """
+    if primary or _session() is not None:
+        return User.get_motor_collection()
+    return User.get_motor_collection().with_options(**settings.lookup_read_options())
+
+
+def _to_binary(value: Union[str, UUID]) -> Binary:
+    """UUID as stored by Beanie (binary subtype 4), for queries on the raw collection."""
+    return Binary.from_uuid(_to_uuid(value))
+
+
+def _to_user(doc: Optional[dict]) -> Optional[User]:
+    return User.model_validate(doc) if doc is not None else None
+
+
+@_instrumented("lookup")
 async def find_by_user_id(user_id: Union[ObjectId, str]) -> Optional[User]:
     """
     Find a user by user ID.
@@ -26,9 +133,12 @@ async def find_by_user_id(user_id: Union[ObjectId, str]) -> Optional[User]:
     Returns:
         User object if found, None otherwise
     """
-    return await User.find_one({"_id": ObjectId(user_id) if isinstance(user_id, str) else user_id})
+    return _to_user(await _lookup_collection().find_one(
+        {"_id": ObjectId(user_id) if isinstance(user_id, str) else user_id}, session=_session()
+    ))
 
 
+@_instrumented("lookup")
 async def find_by_username(username: str) -> Optional[User]:
     """
     Find a user by username.
@@ -39,9 +149,10 @@ async def find_by_username(username: str) -> Optional[User]:
     Returns:
         User object if found, None otherwise
     """
-    return await User.find_one({"user_name": username.lower()})
+    return await User.find_one({"user_name": username.lower()}, session=_session())
 
 
+@_instrumented("lookup")
 async def find_by_email(email: str) -> Optional[User]:
     """
     Find a user by email.
@@ -52,9 +163,10 @@ async def find_by_email(email: str) -> Optional[User]:
     Returns:
         User object if found, None otherwise
     """
-    return await User.find_one({"email": email})
+    return await User.find_one({"email": email}, session=_session())
 
 
+@_instrumented("lookup")
 async def find_by_keycloak_uid(keycloak_uid: Union[str, UUID]) -> Optional[User]:
     """
     Find a user by Keycloak UID.
@@ -65,10 +177,101 @@ async def find_by_keycloak_uid(keycloak_uid: Union[str, UUID]) -> Optional[User]
     Returns:
         User object if found, None otherwise
     """
-    return await User.find_one({"keycloak_uid": _to_uuid(keycloak_uid)})
+    return _to_user(await _lookup_collection().find_one(
+        {"keycloak_uid": _to_binary(keycloak_uid)}, session=_session()
+    ))
 
 
-async def create_user(
+def _projection(fields: Optional[List[str]]) -> Optional[dict]:
+    """Projection of the given document fields ("id" is _id, always returned); None for whole documents."""
+    if not fields:
+        return None
+    return {field: 1 for field in fields if field != "id"} or {"_id": 1}
+
+
+def _to_doc(doc: Optional[dict]) -> Optional[dict]:
+    """Raw user document as a dict, with keycloak_uid decoded to UUID and no model validation."""
+    if doc is not None and isinstance(doc.get("keycloak_uid"), Binary):
+        doc["keycloak_uid"] = doc["keycloak_uid"].as_uuid()
+    return doc
+
+
+@_instrumented("lookup")
+async def find_doc_by_user_id(user_id: Union[ObjectId, str], fields: Optional[List[str]] = None) -> Optional[dict]:
+    """
+    Find a user's raw document by user ID, fetching only the given fields.
+    Cheaper than find_by_user_id for read-only paths: no User hydration.
+
+    Args:
+        user_id: User ID to search for
+        fields: Document fields to return (all when omitted)
+
+    Returns:
+        Raw user document if found, None otherwise
+    """
+    return _to_doc(await _lookup_collection().find_one(
+        {"_id": ObjectId(user_id) if isinstance(user_id, str) else user_id}, _projection(fields), session=_session()
+    ))
+
+
+@_instrumented("lookup")
+async def find_doc_by_keycloak_uid(
+    keycloak_uid: Union[str, UUID],
+    fields: Optional[List[str]] = None,
+    primary: bool = False
+) -> Optional[dict]:
+    """
+    Find a user's raw document by Keycloak UID, fetching only the given fields.
+    Cheaper than find_by_keycloak_uid for read-only paths: no User hydration.
+
+    Args:
+        keycloak_uid: Keycloak UID to search for (string or UUID)
+        fields: Document fields to return (all when omitted)
+        primary: Read from the primary instead of the lookup read preference
+
+    Returns:
+        Raw user document if found, None otherwise
+    """
+    return _to_doc(await _lookup_collection(primary).find_one(
+        {"keycloak_uid": _to_binary(keycloak_uid)}, _projection(fields), session=_session()
+    ))
+
+
+@_instrumented("lookup")
+async def find_many_user_docs(
+    user_ids: Optional[List[ObjectId]] = None,
+    keycloak_uids: Optional[List[UUID]] = None,
+    fields: Optional[List[str]] = None,
+    primary: bool = False
+) -> List[dict]:
+    """
+    Find users' raw documents by user IDs and/or Keycloak UIDs in a single query.
+
+    Args:
+        user_ids: User IDs to match
+        keycloak_uids: Keycloak UIDs to match
+        fields: Document fields to return (all when omitted; keycloak_uid is
+                always included so results can be matched to the request)
+        primary: Read from the primary instead of the lookup read preference
+
+    Returns:
+        List of matching raw user documents (unordered)
+    """
+    conditions = []
+    if user_ids:
+        conditions.append({"_id": {"$in": user_ids}})
+    if keycloak_uids:
+        conditions.append({"keycloak_uid": {"$in": [_to_binary(uid) for uid in keycloak_uids]}})
+    if not conditions:
+        return []
+    query = conditions[0] if len(conditions) == 1 else {"$or": conditions}
+    projection = _projection(fields)
+    if projection is not None:
+        projection["keycloak_uid"] = 1
+    return [_to_doc(doc) async for doc in _lookup_collection(primary).find(query, projection, session=_session())]
+
+
+def build_user(
     user_name: str,
     first_name: str,
     last_name: str,
@@ -77,7 +280,7 @@ async def create_user(
     keycloak_uid: Union[str, UUID]
 ) -> User:
     """
-    Create a new user document.
+    Build a new (not yet inserted) user document.
 
     Args:
         user_name: Username (will be converted to lowercase)
@@ -88,9 +291,9 @@ async def create_user(
         keycloak_uid: Keycloak user ID (string or UUID)
 
     Returns:
-        Created User object
+        User object
     """
-    user = User(
+    return User(
         keycloak_uid=_to_uuid(keycloak_uid),
         user_name=user_name.lower(),
         first_name=first_name,
@@ -100,9 +303,88 @@ async def create_user(
         created_at=datetime.now(timezone.utc),
         updated_at=datetime.now(timezone.utc),
     )
-    return await user.insert()
 
 
+@_instrumented("write")
+async def create_user(
+    user_name: str,
+    first_name: str,
+    last_name: str,
+    roles: List[str],
+    email: str,
+    keycloak_uid: Union[str, UUID]
+) -> User:
+    """
+    Create a new user document.
+
+    Args:
+        user_name: Username (will be converted to lowercase)
+        first_name: First name
+        last_name: Last name
+        roles: List[str]
+        email: Email address
+        keycloak_uid: Keycloak user ID (string or UUID)
+
+    Returns:
+        Created User object
+
+    Raises:
+        DuplicateUserError: The username, email or Keycloak UID is already taken
+    """
+    user = build_user(user_name, first_name, last_name, roles, email, keycloak_uid)
+    try:
+        return await user.insert(session=_session())
+    except DuplicateKeyError as e:
+        raise await _duplicate_user_error(e, user.user_name, user.email)
+
+
+@_instrumented("bulk")
+async def insert_many_users(users: List[User]) -> List[int]:
+    """
+    Insert user documents in one unordered bulk write.
+    Documents get their IDs assigned before the write.
+
+    Args:
+        users: User objects built with build_user
+
+    Returns:
+        Indexes (into users) of documents that failed to insert
+    """
+    if not users:
+        return []
+    for user in users:
+        if user.id is None:
+            user.id = ObjectId()
+    try:
+        await User.insert_many(users, ordered=False, session=_session())
+        return []
+    except BulkWriteError as e:
+        return sorted({error["index"] for error in e.details.get("writeErrors", [])})
+
+
+@_instrumented("bulk")
+async def find_saved_user_ids(user_ids: List[ObjectId], batch_size: int = 1000) -> Set[ObjectId]:
+    """
+    Find which of the given user IDs have a document, reading from the primary.
+    Tells written documents from unwritten ones after a failed insert_many_users.
+
+    Args:
+        user_ids: IDs assigned by insert_many_users
+        batch_size: Max values per $in list
+
+    Returns:
+        The IDs that exist
+    """
+    saved: Set[ObjectId] = set()
+    collection = User.get_motor_collection()
+    for i in range(0, len(user_ids), batch_size):
+        query = {"_id": {"$in": user_ids[i:i + batch_size]}}
+        async for doc in collection.find(query, {"_id": 1}, session=_session()):
+            saved.add(doc["_id"])
+    return saved
+
+
+@_instrumented("write")
 async def update_user(user: User, **kwargs) -> User:
     """
     Update an existing user document.
@@ -113,23 +395,31 @@ async def update_user(user: User, **kwargs) -> User:
 
     Returns:
         Updated User object
+
+    Raises:
+        DuplicateUserError: The new username or email is already taken
     """
     # Handle username conversion to lowercase
     if 'user_name' in kwargs:
         kwargs['user_name'] = kwargs['user_name'].lower()
     
-    # Update fields
-    for field, value in kwargs.items():
-        if value is not None and hasattr(user, field):
-            setattr(user, field, value)
-    
-    # Update timestamp
-    user.updated_at = datetime.now(timezone.utc)
-    
-    await user.save()
+    changes = {field: value for field, value in kwargs.items() if value is not None and hasattr(user, field)}
+    changes["updated_at"] = datetime.now(timezone.utc)
+
+    # A plain $set rather than user.save(): Beanie reports a duplicate key on save as a revision conflict
+    try:
+        await User.get_motor_collection().update_one({"_id": user.id}, {"$set": changes}, session=_session())
+    except DuplicateKeyError as e:
+        raise await _duplicate_user_error(
+            e, changes.get("user_name", user.user_name), changes.get("email", user.email), exclude_user_id=user.id
+        )
+
+    for field, value in changes.items():
+        setattr(user, field, value)
     return user
 
 
+@_instrumented("write")
 async def delete_user(user_id: Union[ObjectId, str]) -> bool:
     """
     Delete a user by user ID.
@@ -144,52 +434,74 @@ async def delete_user(user_id: Union[ObjectId, str]) -> bool:
     if not user:
         return False
     
-    await user.delete()
+    await user.delete(session=_session())
     return True
 
 
-async def check_username_exists(username: str, exclude_user_id: Optional[Union[ObjectId, str]] = None) -> bool:
+@_instrumented("lookup")
+async def find_taken_identity(
+    user_name: str,
+    email: str,
+    exclude_user_id: Optional[Union[ObjectId, str]] = None
+) -> Optional[str]:
     """
-    Check if a username already exists (excluding a specific user ID).
+    Check a username and an email against other users in one query.
+    Only meant for choosing an error message: uniqueness itself is
+    enforced by the unique indexes on write.
 
     Args:
-        username: Username to check
+        user_name: Username to check (compared lowercase)
+        email: Email to check
         exclude_user_id: User ID to exclude from the check (for updates)
 
     Returns:
-        True if username exists, False otherwise
+        "user_name" or "email" (the username wins when both are taken), None if neither is
     """
-    query = {"user_name": username.lower()}
-    
+    query = {"$or": [{"user_name": user_name.lower()}, {"email": email}]}
     if exclude_user_id:
-        exclude_id = ObjectId(exclude_user_id) if isinstance(exclude_user_id, str) else exclude_user_id
-        query["_id"] = {"$ne": exclude_id}
-    
-    user = await User.find_one(query)
-    return user is not None
-
-
-async def check_email_exists(email: str, exclude_user_id: Optional[Union[ObjectId, str]] = None) -> bool:
+        query["_id"] = {"$ne": ObjectId(exclude_user_id) if isinstance(exclude_user_id, str) else exclude_user_id}
+
+    taken = None
+    async for doc in User.get_motor_collection().find(query, {"user_name": 1, "email": 1}, session=_session()):
+        if doc.get("user_name") == user_name.lower():
+            return "user_name"
+        taken = "email"
+    return taken
+
+
+@_instrumented("bulk")
+async def find_existing_identities(
+    usernames: List[str],
+    emails: List[str],
+    batch_size: int = 1000
+) -> Tuple[Set[str], Set[str]]:
     """
-    Check if an email already exists (excluding a specific user ID).
+    Find which usernames and emails are already taken, using batched $in queries.
 
     Args:
-        email: Email to check
-        exclude_user_id: User ID to exclude from the check (for updates)
+        usernames: Usernames to check (compared lowercase)
+        emails: Emails to check
+        batch_size: Max values per $in list
 
     Returns:
-        True if email exists, False otherwise
+        Tuple of (existing usernames, existing emails)
     """
-    query = {"email": email}
-    
-    if exclude_user_id:
-        exclude_id = ObjectId(exclude_user_id) if isinstance(exclude_user_id, str) else exclude_user_id
-        query["_id"] = {"$ne": exclude_id}
-    
-    user = await User.find_one(query)
-    return user is not None
-
-
+    usernames = [username.lower() for username in usernames]
+    existing_usernames: Set[str] = set()
+    existing_emails: Set[str] = set()
+    collection = User.get_motor_collection()
+    for i in range(0, max(len(usernames), len(emails)), batch_size):
+        query = {"$or": [
+            {"user_name": {"$in": usernames[i:i + batch_size]}},
+            {"email": {"$in": emails[i:i + batch_size]}},
+        ]}
+        async for doc in collection.find(query, {"user_name": 1, "email": 1, "_id": 0}, session=_session()):
+            existing_usernames.add(doc.get("user_name"))
+            existing_emails.add(doc.get("email"))
+    return existing_usernames, existing_emails
+
+
+@_instrumented("lookup")
 async def get_all_users(limit: Optional[int] = None, skip: Optional[int] = None) -> List[User]:
     """
     Get all users with optional pagination.
@@ -201,17 +513,56 @@ async def get_all_users(limit: Optional[int] = None, skip: Optional[int] = None)
     Returns:
         List of User objects
     """
-    query = User.find()
-    
-    if skip:
-        query = query.skip(skip)
-    
-    if limit:
-        query = query.limit(limit)
-    
-    return await query.to_list()
+    cursor = _lookup_collection().find({}, skip=skip or 0, limit=limit or 0, session=_session())
+    return [_to_user(doc) async for doc in cursor]
+
+
+@_instrumented("lookup")
+async def list_users_page(
+    limit: int,
+    after: Optional[Tuple[datetime, ObjectId]] = None,
+    role_id: Optional[str] = None,
+    name_prefix: Optional[str] = None,
+    fields: Optional[List[str]] = None
+) -> List[dict]:
+    """
+    Get one page of users, newest first, using keyset pagination on
+    (created_at, _id) instead of skip, so deep pages cost the same as the first.
 
+    Args:
+        limit: Maximum number of users to return
+        after: (created_at, _id) of the last user on the previous page
+        role_id: Only users having this role ID
+        name_prefix: Only users whose username starts with this prefix
+        fields: Document fields to return (created_at and _id are always included)
 
+    Returns:
+        List of raw user documents
+    """
+    conditions = []
+    if after:
+        created_at, last_id = after
+        conditions.append({"$or": [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": last_id}},
+        ]})
+    if role_id:
+        conditions.append({"roles": role_id})
+    if name_prefix:
+        conditions.append({"user_name": {"$regex": f"^{re.escape(name_prefix.lower())}"}})
+
+    query = {"$and": conditions} if conditions else {}
+    projection = None
+    if fields:
+        projection = {field: 1 for field in fields}
+        projection["created_at"] = 1
+
+    cursor = _lookup_collection().find(query, projection, session=_session())
+    cursor = cursor.sort([("created_at", DESCENDING), ("_id", DESCENDING)]).limit(limit)
+    return await cursor.to_list(length=limit)
+
+
+@_instrumented("lookup")
 async def get_users_by_roles(role_ids: List[str]) -> List[User]:
     """
     Get users that have any of the specified roles.
@@ -222,9 +573,10 @@ async def get_users_by_roles(role_ids: List[str]) -> List[User]:
     Returns:
         List of User objects
     """
-    return await User.find({"roles": {"$in": role_ids}}).to_list()
+    return [_to_user(doc) async for doc in _lookup_collection().find({"roles": {"$in": role_ids}}, session=_session())]
 
 
+@_instrumented("lookup")
 async def count_users() -> int:
     """
     Get the total count of users.
@@ -232,9 +584,10 @@ async def count_users() -> int:
     Returns:
         Number of users in the collection
     """
-    return await User.count()
+    return await _lookup_collection().count_documents({}, session=_session())
 
 
+@_instrumented("lookup")
 async def user_exists(user_id: Union[ObjectId, str]) -> bool:
     """
     Check if a user exists by user ID.
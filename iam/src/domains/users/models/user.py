@@ -23,4 +23,6 @@ class User(Document):
             IndexModel([("email", ASCENDING)], unique=True, name="idx_email"),
             IndexModel([("keycloak_uid", ASCENDING)], unique=True, sparse=True, name="idx_keycloak_uid"),
             IndexModel([("created_at", DESCENDING)], name="idx_created_at"),
+            # Keyset pagination order for user listing: newest first, _id breaks ties
+            IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)], name="idx_created_at_id"),
         ]
@@ -1,3 +1,4 @@
-from .user import AllowedRoles, CreateUser, UpdateUser, DeleteUser, GetUser, GetUserByKeycloakUid
+from .user import AllowedRoles, CreateUser, UpdateUser, DeleteUser, GetUser, GetUserByKeycloakUid, GetManyUsers, ListUsers
 
-__all__ = ["AllowedRoles", "CreateUser", "UpdateUser", "DeleteUser", "GetUser", "GetUserByKeycloakUid"]
+__all__ = ["AllowedRoles", "CreateUser", "UpdateUser", "DeleteUser", "GetUser", "GetUserByKeycloakUid", "GetManyUsers",
+           "ListUsers"]
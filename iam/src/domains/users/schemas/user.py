@@ -41,6 +41,7 @@ class DeleteUser(BaseModel):
 
 class GetUser(BaseModel):
     user_id: Optional[str] = None
+    fields: Optional[List[str]] = None
 
     class Config:
         extra = 'forbid'
@@ -48,6 +49,29 @@ class GetUser(BaseModel):
 
 class GetUserByKeycloakUid(BaseModel):
     keycloak_uid: str
+    fields: Optional[List[str]] = None
+    primary: bool = False
+
+    class Config:
+        extra = 'forbid'
+
+
+class GetManyUsers(BaseModel):
+    user_ids: Optional[List[str]] = None
+    keycloak_uids: Optional[List[str]] = None
+    fields: Optional[List[str]] = None
+    primary: bool = False
+
+    class Config:
+        extra = 'forbid'
+
+
+class ListUsers(BaseModel):
+    limit: Optional[int] = None
+    cursor: Optional[str] = None
+    fields: Optional[List[str]] = None
+    role: Optional[str] = None
+    name_prefix: Optional[str] = None
 
     class Config:
         extra = 'forbid'
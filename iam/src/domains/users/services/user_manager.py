@@ -1,22 +1,57 @@
+import asyncio
+from pydantic import ValidationError
+from bson import ObjectId
+from datetime import datetime
+from uuid import UUID
+from typing import Any, AsyncIterator, List, Optional, Tuple
 from auth_gateway_serverkit.logger import init_logger
 from auth_gateway_serverkit.password import generate_password
-from auth_gateway_serverkit.keycloak.user import (
-    add_user_to_keycloak, update_user_in_keycloak, delete_user_from_keycloak
-)
-from auth_gateway_serverkit.keycloak.role import get_all_roles, get_role_by_name
 
 from core.config import settings
 from domains.users.db.mongo.user import (
-    find_by_username, find_by_user_id, find_by_keycloak_uid, 
-    create_user, update_user, delete_user, check_username_exists,
-    check_email_exists, user_exists
+    find_by_username, find_by_user_id, find_doc_by_user_id, find_doc_by_keycloak_uid,
+    create_user, update_user, delete_user, find_taken_identity,
+    DuplicateUserError, user_exists, build_user, insert_many_users,
+    find_existing_identities, find_saved_user_ids, list_users_page, find_many_user_docs, read_your_writes
+)
+from domains.users.schemas import AllowedRoles, CreateUser
+from utils.keycloak import (
+    add_user_to_keycloak, update_user_in_keycloak, delete_user_from_keycloak, get_role_by_name
 )
-from domains.users.schemas import AllowedRoles
-from utils.roles import is_valid_roles
+from utils.roles import is_valid_roles, role_registry
 from utils.validation import is_valid_names
 from utils.admin import is_admins
+from utils.gateway import invalidate_gateway_user, purge_gateway_cache
+from utils.user_events import ROLES_CHANGED, user_change_feed
 from utils.exception_handler import exception_handler
+from utils.pagination import encode_cursor, decode_cursor
+
+
+USER_FIELDS = ("id", "user_name", "first_name", "last_name", "email", "roles", "created_at", "updated_at")
+
+
+def _check_fields(fields: Optional[List[str]]):
+    invalid = [field for field in fields or [] if field not in USER_FIELDS]
+    if invalid:
+        raise Exception(f"Invalid fields: {', '.join(invalid)}")
+
+
+def _taken_message(field: str, value: str) -> str:
+    if field == "user_name":
+        return f"Username '{value}' already exists"
+    return f"Email '{value}' already exists"
+
 
+def _format_user_doc(doc: dict, fields: Optional[List[str]] = None) -> dict:
+    user = {}
+    for field in fields or USER_FIELDS:
+        value = doc.get("_id" if field == "id" else field)
+        if field == "id":
+            value = str(value)
+        elif isinstance(value, datetime):
+            value = value.isoformat()
+        user[field] = value
+    return user
 
 
 class UserManager:
@@ -24,6 +59,7 @@ class UserManager:
         self.logger = init_logger(__name__)
 
     @exception_handler("error creating system admin")
+    @read_your_writes()
     async def create_system_admin(self) -> bool:
         # Check if system admin already exists
         user = await find_by_username(settings.SYSTEM_ADMIN_USER_NAME)
@@ -71,6 +107,7 @@ class UserManager:
         return True
 
     @exception_handler("error creating user")
+    @read_your_writes()
     async def create_user(self, data) -> dict:
         """
         Create a new user in the database and in Keycloak.
@@ -92,33 +129,29 @@ class UserManager:
         if not valid_names:
             raise Exception(", ".join(errors))
 
-        # Check if username or email already exists
-        if await check_username_exists(user_name):
-            raise Exception(f"Username '{user_name}' already exists")
-        
-        if await check_email_exists(email):
-            raise Exception(f"Email '{email}' already exists")
-
         role_names = [role.value if isinstance(role, AllowedRoles) else role for role in roles]
-        realm_roles = await get_all_roles()
-
-        if not is_valid_roles(role_names, realm_roles.get('roles', [])):
+        if not is_valid_roles(role_names):
             raise Exception("Invalid roles provided")
-        roles = [role.value if isinstance(role, AllowedRoles) else role for role in roles]
-        role_ids = [role['id'] for role in realm_roles.get('roles', []) if role['name'] in role_names]
+        roles = role_names
+        role_ids = role_registry.ids_of(role_names)
 
         password = generate_password()
         required_actions = ["CONFIGURE_TOTP"] if getattr(data, "enable_mfa", False) else []
         response = await add_user_to_keycloak(user_name, first_name, last_name, email, password, roles, required_actions=required_actions)
 
         if response.get('status') != 'success':
+            # Keycloak rejects a taken username or email too; name it like the database would
+            taken = await find_taken_identity(user_name, email)
+            if taken:
+                raise Exception(_taken_message(taken, user_name if taken == "user_name" else email))
             raise Exception(f"Error creating user in Keycloak: {response.get('message')}")
 
         keycloak_uid = response.get('keycloakUserId')
         if not keycloak_uid:
             raise Exception("Failed to get Keycloak user ID")
 
-        # If Keycloak creation succeeds but database fails, we need to clean up Keycloak
+        # If Keycloak creation succeeds but database fails, we need to clean up Keycloak.
+        # Uniqueness is enforced here, by the unique indexes, not by a check before the write.
         try:
             user = await create_user(
                 user_name=user_name,
@@ -133,12 +166,167 @@ class UserManager:
             rollback_response = await delete_user_from_keycloak(keycloak_uid)
             if rollback_response.get('status') != 'success':
                 self.logger.error(f"Failed to rollback Keycloak user {keycloak_uid}: {rollback_response.get('message')}")
+            if isinstance(e, DuplicateUserError) and e.field:
+                raise Exception(_taken_message(e.field, e.value))
             raise e
 
         self.logger.info(f"User created: {user.id}")
         return {"status": "success", "user_id": str(user.id), "message": "User created successfully"}
 
+    async def bulk_create_users(self, rows: List[Tuple[int, Any]]) -> AsyncIterator[dict]:
+        """
+        Create many users, yielding one result per row as soon as it is known.
+
+        All rows are validated up front (schema, names, cached roles, duplicates
+        inside the batch, and existing usernames/emails via batched $in queries).
+        Valid rows are then created in Keycloak with bounded concurrency and
+        written to MongoDB with insert_many in chunks. Rows whose database write
+        fails are rolled back from Keycloak individually; when the insert errors
+        as a whole (e.g. a timeout), the documents it did write are looked up
+        and kept.
+
+        Args:
+            rows: (row number, record) pairs from utils.bulk_import.parse_bulk_rows
+
+        Yields:
+            dict: Per-row results, then a final summary
+        """
+        if len(rows) > settings.BULK_MAX_ROWS:
+            yield {"status": "failed", "message": f"Too many rows: {len(rows)} (max {settings.BULK_MAX_ROWS})"}
+            return
+
+        created_count = 0
+        failed_count = 0
+        valid_rows = []
+        seen_usernames, seen_emails = set(), set()
+
+        for row_number, record in rows:
+            error = None
+            try:
+                if isinstance(record, Exception):
+                    raise record
+                if not isinstance(record, dict):
+                    raise ValueError("Row must be an object")
+                data = CreateUser(**record)
+                user_name = data.user_name.lower()
+                role_names = [role.value if isinstance(role, AllowedRoles) else role for role in data.roles]
+                valid_names, errors = is_valid_names(user_name, data.first_name, data.last_name)
+                if not valid_names:
+                    error = ", ".join(errors)
+                elif not is_valid_roles(role_names):
+                    error = "Invalid roles provided"
+                elif user_name in seen_usernames:
+                    error = f"Duplicate username '{user_name}' in import"
+                elif data.email in seen_emails:
+                    error = f"Duplicate email '{data.email}' in import"
+            except ValidationError as e:
+                error = ", ".join(
+                    f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg'].replace('Value error,', '')}"
+                    for err in e.errors()
+                )
+            except Exception as e:
+                error = str(e)
+
+            if error:
+                failed_count += 1
+                yield {"row": row_number, "status": "failed", "message": error}
+                continue
+            seen_usernames.add(user_name)
+            seen_emails.add(data.email)
+            valid_rows.append((row_number, data, user_name, role_names))
+
+        existing_usernames, existing_emails = await find_existing_identities(
+            [row[2] for row in valid_rows], [row[1].email for row in valid_rows]
+        )
+        pending = []
+        for row_number, data, user_name, role_names in valid_rows:
+            if user_name in existing_usernames:
+                failed_count += 1
+                yield {"row": row_number, "status": "failed", "message": f"Username '{user_name}' already exists"}
+            elif data.email in existing_emails:
+                failed_count += 1
+                yield {"row": row_number, "status": "failed", "message": f"Email '{data.email}' already exists"}
+            else:
+                pending.append((row_number, data, user_name, role_names))
+
+        semaphore = asyncio.Semaphore(settings.BULK_KEYCLOAK_CONCURRENCY)
+
+        async def create_in_keycloak(data, user_name, role_names):
+            async with semaphore:
+                required_actions = ["CONFIGURE_TOTP"] if data.enable_mfa else []
+                response = await add_user_to_keycloak(
+                    user_name, data.first_name, data.last_name, data.email,
+                    generate_password(), role_names, required_actions=required_actions
+                )
+            if response.get('status') != 'success':
+                raise Exception(f"Error creating user in Keycloak: {response.get('message')}")
+            if not response.get('keycloakUserId'):
+                raise Exception("Failed to get Keycloak user ID")
+            return response['keycloakUserId']
+
+        async def rollback_keycloak(keycloak_uid):
+            async with semaphore:
+                rollback_response = await delete_user_from_keycloak(keycloak_uid)
+            if rollback_response.get('status') != 'success':
+                self.logger.error(f"Failed to rollback Keycloak user {keycloak_uid}: {rollback_response.get('message')}")
+
+        chunk_size = max(settings.BULK_INSERT_CHUNK_SIZE, 1)
+        for start in range(0, len(pending), chunk_size):
+            chunk = pending[start:start + chunk_size]
+            keycloak_results = await asyncio.gather(
+                *(create_in_keycloak(data, user_name, role_names) for _, data, user_name, role_names in chunk),
+                return_exceptions=True
+            )
+
+            created = []
+            for (row_number, data, user_name, role_names), result in zip(chunk, keycloak_results):
+                if isinstance(result, Exception):
+                    failed_count += 1
+                    yield {"row": row_number, "status": "failed", "message": str(result)}
+                    continue
+                user = build_user(
+                    user_name=user_name,
+                    first_name=data.first_name,
+                    last_name=data.last_name,
+                    roles=role_registry.ids_of(role_names),
+                    email=data.email,
+                    keycloak_uid=result,
+                )
+                created.append((row_number, result, user))
+
+            users = [user for _, _, user in created]
+            try:
+                failed_indexes = set(await insert_many_users(users))
+            except Exception as e:
+                # e.g. MONGO_BULK_TIMEOUT_MS: some documents may have been written before it
+                self.logger.error(f"Bulk insert failed: {e}")
+                failed_indexes = await self._unsaved_indexes(users)
+
+            if failed_indexes:
+                await asyncio.gather(*(rollback_keycloak(created[i][1]) for i in failed_indexes))
+
+            for index, (row_number, _, user) in enumerate(created):
+                if index in failed_indexes:
+                    failed_count += 1
+                    yield {"row": row_number, "status": "failed", "message": "Failed to save user to database"}
+                else:
+                    created_count += 1
+                    yield {"row": row_number, "status": "success", "user_id": str(user.id)}
+
+        self.logger.info(f"Bulk import finished: {created_count} created, {failed_count} failed")
+        yield {"summary": {"total": len(rows), "created": created_count, "failed": failed_count}}
+
+    async def _unsaved_indexes(self, users: list) -> set:
+        """Indexes of the users whose documents were not written, after insert_many_users raised."""
+        try:
+            saved = await find_saved_user_ids([user.id for user in users])
+        except Exception as e:
+            self.logger.error(f"Could not check which users were saved, treating all as failed: {e}")
+            saved = set()
+        return {index for index, user in enumerate(users) if user.id not in saved}
+
     @exception_handler("error updating user")
+    @read_your_writes()
     async def update_user(self, data, request_user=None) -> dict:
         """
         Update an existing user in the database and in Keycloak.
@@ -169,21 +357,16 @@ class UserManager:
 
         if roles:
             role_names = [role.value if isinstance(role, AllowedRoles) else role for role in roles]
-            realm_roles = await get_all_roles()
-            if not is_valid_roles(role_names, realm_roles.get('roles', [])):
+            if not is_valid_roles(role_names):
                 raise Exception("Invalid roles provided")
 
-            roles = [role.value if isinstance(role, AllowedRoles) else role for role in roles]
-            role_ids = [role['id'] for role in realm_roles.get('roles', []) if role['name'] in role_names]
+            roles = role_names
+            role_ids = role_registry.ids_of(role_names)
 
         user = await find_by_user_id(user_id)
         if not user:
             raise Exception(f"User not found with ID: {user_id}")
 
-        if user_name and user_name != user.user_name:
-            if await check_username_exists(user_name, exclude_user_id=user_id):
-                raise Exception(f"Username '{user_name}' already exists")
-
         valid_names, errors = is_valid_names(user_name, data.first_name, data.last_name)
         if not valid_names:
             raise Exception(", ".join(errors))
@@ -206,8 +389,14 @@ class UserManager:
         if roles:
             update_fields["roles"] = role_ids
 
-        # Update user in database
-        updated_user = await update_user(user, **update_fields)
+        # Update user in database (the unique indexes reject a taken username or email)
+        try:
+            updated_user = await update_user(user, **update_fields)
+        except DuplicateUserError as e:
+            if not e.field:
+                raise
+            raise Exception(_taken_message(e.field, e.value))
+        await invalidate_gateway_user(updated_user.keycloak_uid)
 
         # Update in Keycloak if needed        if any(field in data.dict() 
         if any(field in data.model_dump() for field in ["user_name", "first_name", "last_name", "email", "roles"]):
@@ -230,6 +419,7 @@ class UserManager:
         }
 
     @exception_handler("error deleting user")
+    @read_your_writes()
     async def delete_user(self, data) -> dict:
         """
         Delete a user from the database and from Keycloak.
@@ -253,7 +443,9 @@ class UserManager:
         success = await delete_user(user_id)
         if not success:
             raise Exception(f"Failed to delete user from database: {user_id}")
-        
+
+        await invalidate_gateway_user(user.keycloak_uid)
+
         self.logger.info(f"User deleted: {user_id}")
         return {"status": "success", "message": "User deleted successfully"}
 
@@ -282,21 +474,108 @@ class UserManager:
             user_id = request_user.get("id")
         else:
             user_id = data.user_id
-        
-        user = await find_by_user_id(user_id)
-        if not user:
+        _check_fields(data.fields)
+
+        doc = await find_doc_by_user_id(user_id, data.fields)
+        if not doc:
             raise Exception(f"User not found with ID: {user_id}")
 
-        user_data = {
-            "id": str(user.id),
-            "user_name": user.user_name,
-            "first_name": user.first_name,
-            "last_name": user.last_name,
-            "roles": user.roles,
-            "email": user.email,
-            "created_at": user.created_at.isoformat() if user.created_at else None,
-        }
-        return {"status": "success", "data": user_data}
+        return {"status": "success", "data": _format_user_doc(doc, data.fields)}
+
+    @exception_handler("error getting users")
+    async def get_many_users(self, data, request_user=None) -> dict:
+        """
+        Retrieve several users by user ID and/or Keycloak UID with one query.
+
+        Args:
+            data: An object containing user_ids and/or keycloak_uids, and primary
+                  to read from the primary (the gateway does so after a user change).
+            request_user (optional): The user object making the request. As with
+                                     get_user, non-admins may only read themselves.
+                                     Internal gateway lookups send no request user.
+
+        Returns:
+            dict: A dictionary containing the status and data holding a map of
+                  each requested ID / Keycloak UID to its user (users) and the
+                  identifiers not found (not_found).
+        """
+        user_ids = list(dict.fromkeys(data.user_ids or []))
+        keycloak_uids = list(dict.fromkeys(data.keycloak_uids or []))
+        if not user_ids and not keycloak_uids:
+            raise Exception("user_ids or keycloak_uids is required")
+        if len(user_ids) + len(keycloak_uids) > settings.GET_MANY_MAX_IDS:
+            raise Exception(f"Too many IDs requested (max {settings.GET_MANY_MAX_IDS})")
+
+        is_admin = not request_user or is_admins(request_user.get("roles", []))
+        if not is_admin and any(user_id != request_user.get("id") for user_id in user_ids):
+            raise Exception("Unauthorized access to user data")
+
+        object_ids = {user_id: ObjectId(user_id) for user_id in user_ids if ObjectId.is_valid(user_id)}
+        uuids = {}
+        for keycloak_uid in keycloak_uids:
+            try:
+                uuids[keycloak_uid] = UUID(keycloak_uid)
+            except ValueError:
+                continue
+
+        docs = await find_many_user_docs(list(object_ids.values()), list(uuids.values()), data.fields, data.primary)
+        if not is_admin and any(str(doc["_id"]) != request_user.get("id") for doc in docs):
+            raise Exception("Unauthorized access to user data")
+
+        by_id = {doc["_id"]: doc for doc in docs}
+        by_keycloak_uid = {doc["keycloak_uid"]: doc for doc in docs if doc.get("keycloak_uid")}
+        found = {}
+        for user_id, object_id in object_ids.items():
+            if object_id in by_id:
+                found[user_id] = _format_user_doc(by_id[object_id], data.fields)
+        for keycloak_uid, uuid in uuids.items():
+            if uuid in by_keycloak_uid:
+                found[keycloak_uid] = _format_user_doc(by_keycloak_uid[uuid], data.fields)
+
+        not_found = [key for key in user_ids + keycloak_uids if key not in found]
+        return {"status": "success", "data": {"users": found, "not_found": not_found}}
+
+    @exception_handler("error listing users")
+    async def list_users(self, data, request_user=None) -> dict:
+        """
+        List users newest first, one page at a time. Requires admin role.
+
+        Args:
+            data: An object containing limit, cursor (from the previous page's
+                  next_cursor), fields to return, and role / name_prefix filters.
+            request_user (optional): The user object making the request.
+
+        Returns:
+            dict: A dictionary containing the status and data holding the page
+                  of users and next_cursor (None on the last page).
+        """
+        if request_user and not is_admins(request_user.get("roles", [])):
+            raise Exception("Unauthorized to list users")
+
+        limit = min(data.limit or settings.USERS_PAGE_DEFAULT_LIMIT, settings.USERS_PAGE_MAX_LIMIT)
+        if limit < 1:
+            raise Exception("limit must be a positive integer")
+
+        _check_fields(data.fields)
+        fields = [field for field in data.fields if field != "id"] if data.fields else None
+
+        role_id = None
+        if data.role:
+            role_id = role_registry.id_of(data.role)
+            if not role_id:
+                raise Exception(f"Invalid role: {data.role}")
+
+        after = decode_cursor(data.cursor) if data.cursor else None
+
+        # Fetch one extra document to know whether another page exists
+        docs = await list_users_page(limit + 1, after, role_id, data.name_prefix, fields)
+        has_more = len(docs) > limit
+        docs = docs[:limit]
+
+        next_cursor = encode_cursor(docs[-1]["created_at"], docs[-1]["_id"]) if has_more else None
+        users = [_format_user_doc(doc, data.fields) for doc in docs]
+        # the gateway returns only "data" to clients, so the cursor lives inside it
+        return {"status": "success", "data": {"users": users, "next_cursor": next_cursor}}
 
     @exception_handler("error getting user by keycloak uid")
     async def get_user_by_keycloak_uid(self, data) -> dict:
@@ -304,33 +583,25 @@ class UserManager:
         Retrieve a user's information from the database using their Keycloak UID.
 
         Args:
-            data: An object containing the keycloak_uid of the user.
+            data: An object containing the keycloak_uid of the user, and primary
+                  to read from the primary.
 
         Returns:
             dict: A dictionary containing the status and user data if found.
         """
         keycloak_uid = data.keycloak_uid
-        user = await find_by_keycloak_uid(keycloak_uid)
-        if not user:
+        _check_fields(data.fields)
+        doc = await find_doc_by_keycloak_uid(keycloak_uid, data.fields, data.primary)
+        if not doc:
             raise Exception(f"User not found with Keycloak UID: {keycloak_uid}")
 
-        user_dict = {
-            "id": str(user.id),
-            "user_name": user.user_name,
-            "first_name": user.first_name,
-            "last_name": user.last_name,
-            "roles": user.roles,
-            "email": user.email,
-            "created_at": user.created_at.isoformat() if user.created_at else None,
-            "updated_at": user.updated_at.isoformat() if user.updated_at else None,
-        }
-        # Remove keycloak_uid for security reasons - it's not included in the dict
-        return {"status": "success", "data": user_dict}
+        # keycloak_uid is not included in the response for security reasons
+        return {"status": "success", "data": _format_user_doc(doc, data.fields)}
 
     @exception_handler("error getting roles")
     async def get_roles(self, request_user=None) -> dict:
         """
-        Retrieve all custom (non-default) roles from Keycloak.
+        Retrieve all custom (non-default) realm roles from the role registry.
         The systemAdmin role is only available to the system admin user.
 
         Args:
@@ -339,33 +610,34 @@ class UserManager:
         Returns:
             dict: A dictionary containing the status and list of custom roles.
         """
-        realm_roles = await get_all_roles()
-        if realm_roles.get('status') != 'success':
-            raise Exception("Failed to retrieve roles from Keycloak")
+        if not role_registry.is_loaded:
+            raise Exception("Realm roles are not loaded")
 
-        roles = realm_roles.get('roles', [])
+        # If no request_user, assume it's not the system admin and hide systemAdmin
+        is_system_admin = bool(request_user) and request_user.get("id") == await settings.get_system_admin_id()
+        return {"status": "success", "data": role_registry.custom_roles(include_system_admin=is_system_admin)}
 
-        def is_custom_role(role: dict) -> bool:
-            return not (
-                role["name"].startswith("default-roles-") or
-                role["name"] in {"offline_access", "uma_authorization"} or
-                role.get("description", "").startswith("${role_")
-            )
+    @exception_handler("error refreshing roles")
+    async def refresh_roles(self, request_user=None) -> dict:
+        """
+        Reload the realm roles from Keycloak into the role registry.
 
-        custom_roles = [role for role in roles if is_custom_role(role)]
-        
-        # Filter out systemAdmin role unless the requester is the system admin
-        if request_user:
-            user_id = request_user.get("id")
-            system_admin_id = await settings.get_system_admin_id()
-            
-            if user_id != system_admin_id:
-                custom_roles = [role for role in custom_roles if role["name"] != "systemAdmin"]
-        else:
-            # If no request_user, assume it's not the system admin and filter out systemAdmin
-            custom_roles = [role for role in custom_roles if role["name"] != "systemAdmin"]
+        Args:
+            request_user (optional): The user object making the request. Must be an admin.
+
+        Returns:
+            dict: A dictionary containing the status and number of loaded roles.
+        """
+        if request_user and not is_admins(request_user.get("roles", [])):
+            raise Exception("Unauthorized to refresh roles")
+
+        if not await role_registry.refresh():
+            raise Exception("Failed to retrieve roles from Keycloak")
 
-        return {"status": "success", "data": custom_roles}
+        await purge_gateway_cache(["user/roles"])
+        # reaches every gateway worker following this process, not just the one purged above
+        user_change_feed.publish(*ROLES_CHANGED)
+        return {"status": "success", "message": "Roles refreshed", "count": len(role_registry.custom_roles(True))}
 
 
 manager = UserManager()
@@ -4,10 +4,16 @@ from core.config import settings
 from auth_gateway_serverkit.keycloak.initializer import initialize_keycloak_server
 from auth_gateway_serverkit.logger import init_logger
 from utils.admin import set_admins_role_ids
+from utils.roles import role_registry
+from utils.admin_token import admin_tokens
+from utils.user_events import user_change_feed
 from domains.service_versions.db.mongo.service_version import KEYCLOAK_KEY, get_version, set_version
 from domains.users.services import manager
 from api import init_routes
 from shared.logging import log_startup, log_shutdown
+from shared.http import FastJSONResponse
+from shared.metrics import MetricsMiddleware, HTTP_LATENCY
+from shared.tracing import TracingMiddleware, setup_tracing, shutdown_tracing
 
 SERVICE_NAME = "IAM Service"
 VERSION = "1.0.0"
@@ -19,6 +25,14 @@ logger = init_logger(__name__)
 async def lifespan(app: FastAPI):
     is_set_admins_role_ids = False
     try:
+        setup_tracing(
+            SERVICE_NAME,
+            settings.TRACING_EXPORTER,
+            settings.TRACING_SAMPLE_RATIO,
+            settings.TRACING_FILE_PATH,
+            settings.TRACING_OTLP_ENDPOINT,
+        )
+        admin_tokens.install_for_serverkit()
         await settings.init_db()
         current_keycloak_version = await get_version(KEYCLOAK_KEY)
         expected_keycloak_version = settings.KEYCLOAK_CONFIG_VERSION
@@ -30,6 +44,10 @@ async def lifespan(app: FastAPI):
             raise Exception("Failed to initialize Keycloak server")
         if cleanup_and_build:
             await set_version(KEYCLOAK_KEY, expected_keycloak_version)
+        if not await role_registry.refresh():
+            raise Exception("Failed to load realm roles")
+        role_registry.start_background_refresh(settings.ROLE_REFRESH_INTERVAL)
+        admin_tokens.start_background_refresh()
         is_system_admin_created = await manager.create_system_admin()
         if not is_system_admin_created:
             raise Exception("Failed to create system admin")
@@ -37,6 +55,8 @@ async def lifespan(app: FastAPI):
             is_set_admins_role_ids = await set_admins_role_ids()
         if not is_set_admins_role_ids:
             raise Exception("Failed to set admin role IDs")
+        if settings.USER_EVENTS_ENABLED:
+            user_change_feed.start()
 
         log_startup(
             service_name=SERVICE_NAME,
@@ -48,13 +68,20 @@ async def lifespan(app: FastAPI):
             db_name=settings.DB_NAME
         )
         yield
+        await user_change_feed.stop()
+        await role_registry.stop_background_refresh()
+        await admin_tokens.stop_background_refresh()
+        await shutdown_tracing()
         log_shutdown(SERVICE_NAME)
     except Exception as e:
         logger.error(f"Error during lifespan management: {e}")
         raise e
 
 
-app = FastAPI(title=SERVICE_NAME, lifespan=lifespan)
+app = FastAPI(title=SERVICE_NAME, lifespan=lifespan, default_response_class=FastJSONResponse)
+# the user change feed is one long-lived response per subscriber: neither timed nor traced
+app.add_middleware(MetricsMiddleware, histogram=HTTP_LATENCY, skip_paths=("/metrics", "/internal/user_events"))
+app.add_middleware(TracingMiddleware, skip_paths=("/metrics", "/health", "/readyz", "/internal/user_events"))
 init_routes(app)
 
 
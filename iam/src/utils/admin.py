@@ -31,18 +31,18 @@ async def fetch_system_admin_id() -> str:
 
 async def set_admins_role_ids() -> bool:
     """
-    Set the system admin and admin role IDs in the settings.
+    Set the system admin and admin role IDs in the settings from the role registry.
     """
     try:
-        from auth_gateway_serverkit.keycloak.role import get_all_roles
-        roles = await get_all_roles()
-        if not roles or roles.get("status") != "success":
+        from utils.roles import role_registry
+        if not role_registry.is_loaded and not await role_registry.refresh():
             return False
-        for role in roles["roles"]:
-            if role["name"] == "systemAdmin":
-                settings.set_system_admin_role_id(role["id"])
-            elif role["name"] == "admin":
-                settings.set_admin_role_id(role["id"])
+        system_admin_role_id = role_registry.id_of("systemAdmin")
+        admin_role_id = role_registry.id_of("admin")
+        if system_admin_role_id:
+            settings.set_system_admin_role_id(system_admin_role_id)
+        if admin_role_id:
+            settings.set_admin_role_id(admin_role_id)
         return True
     except Exception as e:
         logger.error(f"Failed to set admin role IDs: {str(e)}")
@@ -0,0 +1,57 @@
+import csv
+import io
+import json
+from typing import Any, Dict, List, Tuple
+
+CSV_CONTENT_TYPES = ("text/csv", "application/csv")
+CSV_LIST_SEPARATOR = ";"
+
+
+def _parse_csv(text: str) -> List[Tuple[int, Any]]:
+    rows = []
+    reader = csv.DictReader(io.StringIO(text))
+    for index, record in enumerate(reader, start=1):
+        row = {key.strip(): (value or "").strip() for key, value in record.items() if key}
+        if "roles" in row:
+            row["roles"] = [role.strip() for role in row["roles"].split(CSV_LIST_SEPARATOR) if role.strip()]
+        if row.get("enable_mfa") == "":
+            row.pop("enable_mfa")
+        rows.append((index, row))
+    return rows
+
+
+def _parse_json_lines(text: str) -> List[Tuple[int, Any]]:
+    rows = []
+    for index, line in enumerate(text.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            rows.append((index, json.loads(line)))
+        except json.JSONDecodeError as e:
+            rows.append((index, ValueError(f"Invalid JSON: {e.msg}")))
+    return rows
+
+
+def parse_bulk_rows(body: bytes, content_type: str) -> List[Tuple[int, Any]]:
+    """
+    Parse a bulk import body into (row number, record) pairs.
+
+    CSV bodies need a header row; `roles` holds role names separated by ";".
+    Any other content type is read as JSON Lines (one object per line).
+    Rows that cannot be decoded carry a ValueError instead of a record.
+
+    Args:
+        body: Raw request body (UTF-8)
+        content_type: Request content type
+
+    Returns:
+        List of (row number, dict or ValueError)
+    """
+    text = body.decode("utf-8-sig")
+    if content_type.split(";")[0].strip().lower() in CSV_CONTENT_TYPES:
+        return _parse_csv(text)
+    return _parse_json_lines(text)
+
+
+def ndjson_line(record: Dict[str, Any]) -> bytes:
+    return (json.dumps(record) + "\n").encode()
@@ -0,0 +1,32 @@
+from contextvars import ContextVar
+from fastapi import Request, status
+from typing import Any
+from shared.http import FastJSONResponse
+
+# Sent by the gateway to take responses in their final client shape, and echoed
+# back when a response is unwrapped, so the gateway can forward the bytes as-is
+ENVELOPE_HEADER = "X-Gateway-Envelope"
+UNWRAPPED = "unwrapped"
+
+_unwrapped: ContextVar[bool] = ContextVar("unwrapped_envelope", default=False)
+
+
+async def negotiate_envelope(request: Request):
+    """Router dependency recording whether the caller asked for unwrapped responses."""
+    _unwrapped.set(request.headers.get(ENVELOPE_HEADER) == UNWRAPPED)
+
+
+def envelope(result: Any):
+    """
+    Return a serverkit response() dict unchanged, or, when the caller asked
+    for it, as the response the gateway would build from it: the `data`
+    (or the rest of the dict) as body and `status_code` as the HTTP status.
+    """
+    if not _unwrapped.get() or not isinstance(result, dict):
+        return result
+    status_code = result.pop("status_code", status.HTTP_400_BAD_REQUEST)
+    return FastJSONResponse(
+        content=result.get("data", result),
+        status_code=status_code,
+        headers={ENVELOPE_HEADER: UNWRAPPED},
+    )
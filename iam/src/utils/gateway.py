@@ -0,0 +1,62 @@
+import asyncio
+import httpx
+from auth_gateway_serverkit.logger import init_logger
+from core.config import settings
+from shared.tracing import inject
+
+logger = init_logger(__name__)
+
+_gateway_client = httpx.AsyncClient(timeout=httpx.Timeout(2, connect=1))
+
+# Gateway response cache tags holding user data (service/action of cached GET routes)
+USER_READ_TAGS = ["user/get", "user/list"]
+
+
+async def _post_internal(path: str, payload: dict) -> bool:
+    """
+    POST to the gateway's /internal API. GATEWAY_URL reaches a single gateway
+    worker: gateways with several workers rely on the user change feed, which
+    every worker follows, and are refused without it (GATEWAY_WORKERS).
+    """
+    if not settings.GATEWAY_URL or not settings.INTERNAL_API_KEY:
+        return False
+    try:
+        response = await _gateway_client.post(
+            f"{settings.GATEWAY_URL}/internal{path}",
+            json=payload,
+            headers=inject({"X-Internal-Key": settings.INTERNAL_API_KEY}),
+        )
+        if response.status_code != 200:
+            logger.warning(f"Gateway call {path} failed: {response.status_code}")
+            return False
+        return True
+    except Exception as e:
+        logger.warning(f"Gateway call {path} error: {e}")
+        return False
+
+
+async def purge_gateway_cache(tags: list[str]) -> bool:
+    """
+    Purge gateway response cache entries carrying any of the given tags.
+    :param tags: Cache tags, e.g. "user" or "user/get"
+    :return: bool
+    """
+    return await _post_internal("/cache/purge", {"tags": tags})
+
+
+async def invalidate_gateway_user(keycloak_uid) -> bool:
+    """
+    Tell the gateway to drop its cached copy of a user and any cached
+    responses containing user data.
+    Failures are logged and never break the calling write; the gateway
+    cache TTLs bound staleness if the notification is lost.
+    :param keycloak_uid: Keycloak UID of the changed user
+    :return: bool
+    """
+    if not keycloak_uid:
+        return False
+    results = await asyncio.gather(
+        _post_internal("/users/invalidate", {"keycloak_uid": str(keycloak_uid)}),
+        purge_gateway_cache(USER_READ_TAGS),
+    )
+    return all(results)
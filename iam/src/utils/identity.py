@@ -0,0 +1,28 @@
+import json
+from fastapi import HTTPException, Request, status
+from typing import Any, Dict
+from core.config import settings
+from shared.identity import IdentityError, IdentityVerifier
+from shared.metrics import register_cache
+
+identity_verifier = IdentityVerifier(settings.identity_signing_key or "", max_size=settings.IDENTITY_CACHE_MAX_SIZE)
+register_cache("identities", identity_verifier.cache.stats)
+
+
+async def get_request_user(request: Request) -> Dict[str, Any]:
+    """
+    Resolve the calling user from the gateway's signed X-Identity header:
+    {"id", "roles"} for a user, {} for the gateway's own calls.
+    Without a signing key configured, the legacy unsigned X-User JSON is read instead.
+    """
+    if not settings.identity_signing_key:
+        str_user = request.headers.get("x-user")
+        return json.loads(str_user) if str_user else {}
+
+    envelope = request.headers.get("x-identity")
+    if not envelope:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing identity")
+    try:
+        return identity_verifier.verify(envelope)
+    except IdentityError as e:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=str(e))
@@ -0,0 +1,20 @@
+"""
+Keycloak admin calls used by IAM, timed and traced (shared.keycloak.instrument_keycloak).
+A call whose first request gets a 401 is retried once with a fresh admin token.
+Import these instead of the auth_gateway_serverkit functions directly.
+"""
+
+from auth_gateway_serverkit.keycloak import user, role
+from shared.keycloak import instrument_keycloak
+from utils.admin_token import admin_tokens
+
+
+def _admin_call(operation: str, func):
+    return instrument_keycloak(operation)(admin_tokens.retry_unauthorized(func))
+
+
+add_user_to_keycloak = _admin_call("admin_create_user", user.add_user_to_keycloak)
+update_user_in_keycloak = _admin_call("admin_update_user", user.update_user_in_keycloak)
+delete_user_from_keycloak = _admin_call("admin_delete_user", user.delete_user_from_keycloak)
+get_role_by_name = _admin_call("admin_get_role", role.get_role_by_name)
+get_all_roles = _admin_call("admin_list_roles", role.get_all_roles)
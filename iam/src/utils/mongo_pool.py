@@ -0,0 +1,107 @@
+import threading
+from pymongo import monitoring
+from shared.metrics import registry
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """
+    Connection pool usage of the Motor client, from pymongo's CMAP events.
+
+    Counters are summed over all servers the client talks to; utilization is
+    that of the busiest server's pool. Events arrive on driver threads,
+    hence the lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # set from settings when the client is built (0 means unbounded)
+        self.max_pool_size = 0
+        self.open = 0
+        self.in_use = 0
+        self.waiting = 0
+        self.checkouts = 0
+        self.checkout_failures: dict[str, int] = {}
+        self.pool_clears = 0
+        self._in_use_by_server: dict = {}
+
+    def _add(self, field: str, delta: int):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + delta)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._add("pool_clears", 1)
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._add("open", 1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._add("open", -1)
+
+    def connection_check_out_started(self, event):
+        self._add("waiting", 1)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.waiting -= 1
+            self.checkout_failures[event.reason] = self.checkout_failures.get(event.reason, 0) + 1
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.waiting -= 1
+            self.in_use += 1
+            self.checkouts += 1
+            self._in_use_by_server[event.address] = self._in_use_by_server.get(event.address, 0) + 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.in_use -= 1
+            self._in_use_by_server[event.address] = self._in_use_by_server.get(event.address, 0) - 1
+
+    def utilization(self) -> float:
+        if not self.max_pool_size:
+            return 0.0
+        return round(max(self._in_use_by_server.values(), default=0) / self.max_pool_size, 4)
+
+    def stats(self) -> dict:
+        return {
+            "max_pool_size": self.max_pool_size,
+            "open": self.open,
+            "in_use": self.in_use,
+            "waiting": self.waiting,
+            "utilization": self.utilization(),
+            "checkouts": self.checkouts,
+            "checkout_failures": dict(self.checkout_failures),
+            "pool_clears": self.pool_clears,
+        }
+
+
+pool_monitor = PoolMonitor()
+
+registry.callback(
+    "mongo_pool_connections", "MongoDB pool connections, open and checked out.", "gauge", ("state",),
+    lambda: (({"state": state}, getattr(pool_monitor, state)) for state in ("open", "in_use")),
+)
+registry.callback(
+    "mongo_pool_wait_queue", "Operations waiting for a MongoDB pool connection.", "gauge", (),
+    lambda: [({}, pool_monitor.waiting)],
+)
+registry.callback(
+    "mongo_pool_utilization", "Checked out connections of the busiest server as a share of maxPoolSize.", "gauge", (),
+    lambda: [({}, pool_monitor.utilization())],
+)
+registry.callback(
+    "mongo_pool_checkout_failures", "Failed MongoDB pool checkouts, by reason.", "counter", ("reason",),
+    lambda: (({"reason": reason}, count) for reason, count in list(pool_monitor.checkout_failures.items())),
+)
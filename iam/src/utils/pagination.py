@@ -0,0 +1,30 @@
+import base64
+import json
+from datetime import datetime
+from bson import ObjectId
+from typing import Tuple
+
+
+def encode_cursor(created_at: datetime, last_id: ObjectId) -> str:
+    """
+    Encode the sort key of the last item on a page as an opaque cursor.
+    :param created_at: created_at of the last item
+    :param last_id: _id of the last item
+    :return: str
+    """
+    raw = json.dumps([created_at.isoformat(), str(last_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    """
+    Decode a cursor produced by encode_cursor.
+    :param cursor: Opaque cursor string
+    :return: (created_at, _id)
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, last_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), ObjectId(last_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
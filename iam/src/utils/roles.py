@@ -1,30 +1,121 @@
+import asyncio
+from datetime import datetime, timezone
+from typing import Optional
 from auth_gateway_serverkit.logger import init_logger
+from utils.keycloak import get_all_roles
 
 logger = init_logger(__name__)
 
+SYSTEM_ADMIN_ROLE = "systemAdmin"
 
-def is_valid_roles(provided_role_names: list[str], keycloak_roles: list[dict]) -> bool:
+
+def is_custom_role(role: dict) -> bool:
+    """Return False for Keycloak's built-in realm roles."""
+    return not (
+        role["name"].startswith("default-roles-") or
+        role["name"] in {"offline_access", "uma_authorization"} or
+        role.get("description", "").startswith("${role_")
+    )
+
+
+class RoleRegistry:
     """
-    Validate that all provided role names exist in the roles returned from Keycloak.
+    In-process copy of the Keycloak realm roles.
+
+    Loaded during lifespan and refreshed periodically in the background, so
+    role validation and name/id mapping on user writes never call Keycloak.
+    """
+
+    def __init__(self):
+        self._by_name: dict[str, dict] = {}
+        self._by_id: dict[str, dict] = {}
+        self._custom_roles: list[dict] = []
+        self._public_custom_roles: list[dict] = []
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.loaded_at: Optional[datetime] = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.loaded_at is not None
+
+    async def refresh(self) -> bool:
+        """
+        Reload all realm roles from Keycloak and swap in the new maps.
+        The previous maps stay in use if Keycloak cannot be reached.
+        """
+        realm_roles = await get_all_roles()
+        if not realm_roles or realm_roles.get("status") != "success":
+            logger.error(f"Failed to refresh realm roles: {realm_roles.get('message') if realm_roles else None}")
+            return False
+
+        roles = [role for role in realm_roles.get("roles", []) if isinstance(role, dict) and "name" in role]
+        custom_roles = [role for role in roles if is_custom_role(role)]
+        self._by_name = {role["name"]: role for role in roles}
+        self._by_id = {role["id"]: role for role in roles}
+        self._custom_roles = custom_roles
+        self._public_custom_roles = [role for role in custom_roles if role["name"] != SYSTEM_ADMIN_ROLE]
+        self.loaded_at = datetime.now(timezone.utc)
+        return True
+
+    def id_of(self, name: str) -> Optional[str]:
+        role = self._by_name.get(name)
+        return role["id"] if role else None
+
+    def name_of(self, role_id: str) -> Optional[str]:
+        role = self._by_id.get(role_id)
+        return role["name"] if role else None
+
+    def ids_of(self, names: list[str]) -> list[str]:
+        """Map role names to role IDs, skipping unknown names."""
+        return [self._by_name[name]["id"] for name in names if name in self._by_name]
+
+    def invalid_names(self, names: list[str]) -> list[str]:
+        return [name for name in names if name not in self._by_name]
+
+    def custom_roles(self, include_system_admin: bool = False) -> list[dict]:
+        """Precomputed non-default realm roles, optionally including systemAdmin."""
+        return list(self._custom_roles if include_system_admin else self._public_custom_roles)
+
+    async def _refresh_periodically(self, interval: int):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Error in periodic role refresh: {e}")
+
+    def start_background_refresh(self, interval: int):
+        if interval > 0 and self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_periodically(interval))
+
+    async def stop_background_refresh(self):
+        if self._refresh_task:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+
+
+role_registry = RoleRegistry()
+
+
+def is_valid_roles(provided_role_names: list[str]) -> bool:
+    """
+    Validate that all provided role names exist in the cached realm roles.
 
     Args:
         provided_role_names (list[str]): Role names received in the request.
-        keycloak_roles (list[dict]): Roles fetched from Keycloak, each expected to have a 'name' field.
 
     Returns:
-        bool: True if all provided roles are valid and role list is well-formed, False otherwise.
+        bool: True if all provided roles are valid, False otherwise.
     """
-    if not isinstance(keycloak_roles, list):
-        logger.error("keycloak_roles is not a list.")
+    if not role_registry.is_loaded:
+        logger.error("Role registry is not loaded. Check lifespan initialization.")
         return False
 
-    if not all(isinstance(role, dict) and 'name' in role for role in keycloak_roles):
-        logger.error("keycloak_roles contains invalid entries.")
-        return False
-
-    valid_role_names = {role['name'] for role in keycloak_roles}
-    invalid = [name for name in provided_role_names if name not in valid_role_names]
-
+    invalid = role_registry.invalid_names(provided_role_names)
     if invalid:
         logger.error(f"Invalid roles requested: {invalid}")
         return False
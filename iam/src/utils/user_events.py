@@ -0,0 +1,237 @@
+"""
+Change feed of the users collection, for cache invalidation.
+
+One MongoDB change stream per IAM process turns every user write into a
+compact event, {"op", "id", "keycloak_uid", "fields"}, and fans it out to
+the subscribers of GET /internal/user_events (the gateways). Its resume
+token is checkpointed in service_versions, so after a restart the stream
+continues where it stopped and replays the changes made meanwhile.
+A role refresh is announced on the same feed (ROLES_CHANGED).
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Optional, Tuple
+from bson import Binary
+from pymongo.errors import OperationFailure
+from auth_gateway_serverkit.logger import init_logger
+from core.config import settings
+from domains.users.models import User
+from domains.service_versions.db.mongo.service_version import USER_EVENTS_KEY, get_resume_token, set_resume_token
+from shared.metrics import registry
+
+logger = init_logger(__name__)
+
+# $changeStream on a standalone server; resume point no longer in the oplog
+_NOT_REPLICA_SET = 40573
+_HISTORY_LOST = (280, 286)
+_MAX_RETRY_SECONDS = 60
+
+# tells a subscriber it may have missed events and must drop everything it cached
+RESET: Tuple[Optional[str], dict] = (None, {"op": "reset"})
+# tells a subscriber the realm roles were reloaded; not replayed on reconnect
+ROLES_CHANGED: Tuple[Optional[str], dict] = (None, {"op": "roles"})
+
+_PIPELINE = [
+    {"$match": {"operationType": {"$in": ["insert", "update", "replace", "delete"]}}},
+    {"$project": {
+        "operationType": 1,
+        "documentKey": 1,
+        "fullDocument.keycloak_uid": 1,
+        "fullDocumentBeforeChange.keycloak_uid": 1,
+        "updateDescription.updatedFields": 1,
+        "updateDescription.removedFields": 1,
+    }},
+]
+
+
+def to_event(change: dict) -> dict:
+    """
+    Compact event of a change: its operation, the user's id and Keycloak UID
+    and, for updates, the top-level fields written (None: the whole document).
+
+    The Keycloak UID of a deleted user is only known with pre-images
+    (USER_EVENTS_PRE_IMAGES); it is None otherwise.
+    """
+    document = change.get("fullDocument") or change.get("fullDocumentBeforeChange") or {}
+    keycloak_uid = document.get("keycloak_uid")
+    if isinstance(keycloak_uid, Binary):
+        keycloak_uid = keycloak_uid.as_uuid()
+
+    fields = None
+    update = change.get("updateDescription")
+    if update:
+        paths = [*(update.get("updatedFields") or {}), *(update.get("removedFields") or [])]
+        fields = sorted({path.split(".")[0] for path in paths})
+
+    return {
+        "op": change["operationType"],
+        "id": str(change["documentKey"]["_id"]),
+        "keycloak_uid": str(keycloak_uid) if keycloak_uid else None,
+        "fields": fields,
+    }
+
+
+class UserChangeFeed:
+    """
+    Background consumer of the users change stream, publishing to in-process subscribers.
+
+    Each subscriber gets a bounded queue of (event id, event) pairs; event ids
+    are the changes' resume tokens. The latest events are kept so a subscriber
+    reconnecting with the id of the last event it saw gets the ones after it;
+    one whose id is unknown, or whose queue overflows, gets RESET instead.
+    Every IAM process runs its own stream over the whole collection, so any
+    instance can serve any subscriber.
+    """
+
+    def __init__(self, buffer_size: int, queue_size: int, checkpoint_interval: float, retry_seconds: float = 5.0):
+        self.queue_size = queue_size
+        self.checkpoint_interval = checkpoint_interval
+        self.retry_seconds = retry_seconds
+        self.supported = True
+        self.running = False
+        self.published = 0
+        self.resets = 0
+        self._recent: deque = deque(maxlen=buffer_size)
+        self._subscribers: set = set()
+        self._task: Optional[asyncio.Task] = None
+        self._token: Optional[dict] = None
+        self._saved_token: Optional[dict] = None
+        self._saved_at = 0.0
+
+    @property
+    def available(self) -> bool:
+        return self._task is not None and self.supported
+
+    def subscribe(self, last_event_id: Optional[str] = None) -> asyncio.Queue:
+        """Queue receiving the events published from now on, after those missed since last_event_id."""
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        if last_event_id:
+            ids = [event_id for event_id, _ in self._recent]
+            if last_event_id in ids:
+                for item in list(self._recent)[ids.index(last_event_id) + 1:]:
+                    self._offer(queue, item)
+            else:
+                self._offer(queue, RESET)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    def _offer(self, queue: asyncio.Queue, item: tuple):
+        try:
+            queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # too far behind to catch up event by event: drop its backlog and have it start over
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(RESET)
+            self.resets += 1
+
+    def publish(self, event_id: Optional[str], event: dict):
+        item = (event_id, event)
+        if event_id:
+            self._recent.append(item)
+            self.published += 1
+        for queue in list(self._subscribers):
+            self._offer(queue, item)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            try:
+                await self._checkpoint(force=True)
+            except Exception as e:
+                logger.error(f"Failed to save the user change feed position: {e}")
+
+    async def _run(self):
+        delay = self.retry_seconds
+        loaded = False
+        while True:
+            try:
+                if not loaded:
+                    self._token = self._saved_token = await get_resume_token(USER_EVENTS_KEY)
+                    loaded = True
+                await self._follow()
+            except OperationFailure as e:
+                if e.code == _NOT_REPLICA_SET:
+                    logger.warning("User change feed disabled: MongoDB change streams need a replica set")
+                    self.supported = False
+                    self.running = False
+                    return
+                if e.code in _HISTORY_LOST and self._token is not None:
+                    logger.warning("User change feed cannot resume (position no longer in the oplog), starting over")
+                    # the next checkpoint replaces the saved token
+                    self._token = None
+                    self._recent.clear()
+                    self.publish(*RESET)
+                    continue
+                logger.error(f"User change feed error: {e}")
+            except Exception as e:
+                logger.error(f"User change feed error: {e}")
+            if self.running:
+                delay = self.retry_seconds
+            self.running = False
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, _MAX_RETRY_SECONDS)
+
+    async def _follow(self):
+        options = {"full_document": "updateLookup", "resume_after": self._token, "max_await_time_ms": 1000}
+        if settings.USER_EVENTS_PRE_IMAGES:
+            options["full_document_before_change"] = "whenAvailable"
+
+        async with User.get_motor_collection().watch(_PIPELINE, **options) as stream:
+            self.running = True
+            while True:
+                change = await stream.try_next()
+                if change is not None:
+                    self.publish(change["_id"]["_data"], to_event(change))
+                # advances on idle batches too, keeping the saved position inside the oplog window
+                self._token = stream.resume_token
+                await self._checkpoint()
+
+    async def _checkpoint(self, force: bool = False):
+        if self._token is None or self._token == self._saved_token:
+            return
+        if not force and time.monotonic() - self._saved_at < self.checkpoint_interval:
+            return
+        await set_resume_token(USER_EVENTS_KEY, self._token)
+        self._saved_token = self._token
+        self._saved_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {
+            "supported": self.supported,
+            "running": self.running,
+            "subscribers": len(self._subscribers),
+            "published": self.published,
+            "resets": self.resets,
+            "buffered": len(self._recent),
+        }
+
+
+user_change_feed = UserChangeFeed(
+    buffer_size=settings.USER_EVENTS_BUFFER_SIZE,
+    queue_size=settings.USER_EVENTS_QUEUE_SIZE,
+    checkpoint_interval=settings.USER_EVENTS_CHECKPOINT_INTERVAL,
+)
+
+registry.callback(
+    "user_events_subscribers", "Subscribers of the user change feed.", "gauge", (),
+    lambda: [({}, user_change_feed.stats()["subscribers"])],
+)
+registry.callback(
+    "user_events_published", "User change events published.", "counter", (),
+    lambda: [({}, user_change_feed.published)],
+)
@@ -0,0 +1,92 @@
+import base64
+import json
+import time
+import httpx
+from auth_gateway_serverkit.keycloak import client, initializer, role, user
+from shared.keycloak import AdminTokenManager
+from shared.keycloak import admin_token as admin_token_module
+
+
+def make_token(name: str) -> str:
+    claims = base64.urlsafe_b64encode(json.dumps({"exp": time.time() + 300, "n": name}).encode()).decode()
+    return f"header.{claims}.signature"
+
+
+def make_manager() -> AdminTokenManager:
+    issued = []
+
+    async def fetch_token():
+        issued.append(make_token(f"t{len(issued) + 1}"))
+        return issued[-1]
+
+    manager = AdminTokenManager(fetch_token=fetch_token)
+    manager.issued = issued
+    return manager
+
+
+def keycloak_helper(manager, statuses):
+    """A serverkit-style helper: returns a status dict, never the response."""
+    seen = []
+
+    def handler(request):
+        seen.append(request.headers["Authorization"])
+        return httpx.Response(statuses[min(len(seen), len(statuses)) - 1])
+
+    async def helper():
+        token = await manager.get_token()
+        transport = httpx.MockTransport(handler)
+        async with admin_token_module._StatusRecordingHttpx().AsyncClient(transport=transport) as http:
+            for _ in statuses:
+                response = await http.get("http://keycloak/admin", headers={"Authorization": f"Bearer {token}"})
+                if response.status_code >= 400:
+                    return {"status": "error"}
+        return {"status": "success"}
+
+    return manager.retry_unauthorized(helper), seen
+
+
+async def test_first_request_unauthorized_is_retried_with_a_new_token():
+    manager = make_manager()
+    helper, seen = keycloak_helper(manager, [401, 204])
+    assert await helper() == {"status": "success"}
+    assert seen == [f"Bearer {manager.issued[0]}", f"Bearer {manager.issued[1]}", f"Bearer {manager.issued[1]}"]
+    assert manager.unauthorized_retries == 1
+
+
+async def test_retried_only_once():
+    manager = make_manager()
+    helper, seen = keycloak_helper(manager, [401])
+    assert await helper() == {"status": "error"}
+    assert len(seen) == 2
+    assert manager.unauthorized_retries == 1
+
+
+async def test_unauthorized_after_a_write_is_not_retried():
+    manager = make_manager()
+    helper, seen = keycloak_helper(manager, [201, 401])
+    assert await helper() == {"status": "error"}
+    assert len(seen) == 2
+    assert manager.unauthorized_retries == 0
+
+
+async def test_other_errors_are_not_retried():
+    manager = make_manager()
+    helper, seen = keycloak_helper(manager, [409])
+    assert await helper() == {"status": "error"}
+    assert len(seen) == 1
+    assert len(manager.issued) == 1
+
+
+def test_install_patches_only_the_importing_modules(monkeypatch):
+    for module in (client, user, role, initializer):
+        monkeypatch.setattr(module, "get_admin_token", module.get_admin_token)
+        if hasattr(module, "httpx"):
+            monkeypatch.setattr(module, "httpx", module.httpx)
+    original = client.get_admin_token
+    manager = make_manager()
+    manager.install_for_serverkit()
+    assert client.get_admin_token is original
+    assert client.httpx is httpx
+    for module in (user, role):
+        assert module.get_admin_token == manager.get_token
+        assert isinstance(module.httpx, admin_token_module._StatusRecordingHttpx)
@@ -0,0 +1,176 @@
+import types
+import pytest
+from bson import ObjectId
+from pymongo.errors import BulkWriteError, ExecutionTimeout
+from domains.users.db.mongo import user as user_db
+from domains.users.services import user_manager
+from domains.users.services.user_manager import manager
+from utils.bulk_import import parse_bulk_rows
+
+
+def test_json_lines_rows_keep_line_numbers():
+    body = b'{"user_name": "alice"}\n\n{"user_name": \n{"user_name": "bob"}\n'
+    rows = parse_bulk_rows(body, "application/x-ndjson")
+    assert [row for row, _ in rows] == [1, 3, 4]
+    assert rows[0][1] == {"user_name": "alice"}
+    assert isinstance(rows[1][1], ValueError)
+    assert str(rows[1][1]).startswith("Invalid JSON")
+    assert rows[2][1] == {"user_name": "bob"}
+
+
+def test_csv_rows_split_roles_and_drop_empty_mfa():
+    body = "﻿user_name,email,roles,enable_mfa\nalice,a@x.com, user ; admin ,\nbob,b@x.com,,true\n".encode()
+    rows = parse_bulk_rows(body, "text/csv; charset=utf-8")
+    assert rows == [
+        (1, {"user_name": "alice", "email": "a@x.com", "roles": ["user", "admin"]}),
+        (2, {"user_name": "bob", "email": "b@x.com", "roles": [], "enable_mfa": "true"}),
+    ]
+
+
+def record(name: str, **overrides) -> dict:
+    return {
+        "user_name": name, "first_name": "First", "last_name": "Last",
+        "email": f"{name}@example.com", "roles": ["user"], **overrides,
+    }
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    """Fake Keycloak and MongoDB behind bulk_create_users."""
+    state = types.SimpleNamespace(
+        existing=(set(), set()), keycloak_failures=set(), created=[], deleted=[],
+        insert=lambda users: [], saved=None,
+    )
+
+    async def add_user_to_keycloak(user_name, *args, **kwargs):
+        if user_name in state.keycloak_failures:
+            return {"status": "error", "message": "Keycloak down"}
+        state.created.append(user_name)
+        return {"status": "success", "keycloakUserId": f"kc-{user_name}"}
+
+    async def delete_user_from_keycloak(keycloak_uid):
+        state.deleted.append(keycloak_uid)
+        return {"status": "success"}
+
+    async def find_existing_identities(usernames, emails):
+        return state.existing
+
+    def build_user(user_name, email, keycloak_uid, **kwargs):
+        return types.SimpleNamespace(id=ObjectId(), user_name=user_name, email=email, keycloak_uid=keycloak_uid)
+
+    async def insert_many_users(users):
+        return state.insert(users)
+
+    async def find_saved_user_ids(user_ids):
+        return state.saved(user_ids)
+
+    monkeypatch.setattr(user_manager, "add_user_to_keycloak", add_user_to_keycloak)
+    monkeypatch.setattr(user_manager, "delete_user_from_keycloak", delete_user_from_keycloak)
+    monkeypatch.setattr(user_manager, "find_existing_identities", find_existing_identities)
+    monkeypatch.setattr(user_manager, "build_user", build_user)
+    monkeypatch.setattr(user_manager, "insert_many_users", insert_many_users)
+    monkeypatch.setattr(user_manager, "find_saved_user_ids", find_saved_user_ids)
+    monkeypatch.setattr(user_manager, "is_valid_roles", lambda names: True)
+    monkeypatch.setattr(user_manager, "role_registry", types.SimpleNamespace(ids_of=lambda names: names))
+    monkeypatch.setattr(user_manager.settings, "BULK_INSERT_CHUNK_SIZE", 500)
+    return state
+
+
+async def run(rows) -> dict:
+    results = [result async for result in manager.bulk_create_users(rows)]
+    summary = results.pop()["summary"]
+    return {"rows": {result["row"]: result for result in results}, "summary": summary}
+
+
+async def test_invalid_and_duplicate_rows_fail_up_front(backend):
+    result = await run([
+        (1, record("alice")),
+        (2, ValueError("Invalid JSON: Expecting value")),
+        (3, ["not", "an", "object"]),
+        (4, record("bob", email="not-an-email")),
+        (5, record("Alice", email="other@example.com")),
+        (6, record("carol", email="alice@example.com")),
+        (7, record("dave", unknown="field")),
+    ])
+    rows = result["rows"]
+    assert rows[1]["status"] == "success"
+    assert rows[2]["message"] == "Invalid JSON: Expecting value"
+    assert rows[3]["message"] == "Row must be an object"
+    assert rows[4]["message"].startswith("email:")
+    assert rows[5]["message"] == "Duplicate username 'alice' in import"
+    assert rows[6]["message"] == "Duplicate email 'alice@example.com' in import"
+    assert rows[7]["message"].startswith("unknown:")
+    assert result["summary"] == {"total": 7, "created": 1, "failed": 6}
+    assert backend.created == ["alice"]
+
+
+async def test_existing_identities_are_not_created(backend):
+    backend.existing = ({"alice"}, {"b@example.com"})
+    result = await run([(1, record("alice")), (2, record("bob", email="b@example.com")), (3, record("carol"))])
+    assert result["rows"][1]["message"] == "Username 'alice' already exists"
+    assert result["rows"][2]["message"] == "Email 'b@example.com' already exists"
+    assert result["rows"][3]["status"] == "success"
+    assert backend.created == ["carol"]
+
+
+async def test_keycloak_failures_fail_only_their_rows(backend):
+    backend.keycloak_failures = {"bob"}
+    inserted = []
+    backend.insert = lambda users: inserted.extend(user.user_name for user in users) or []
+    result = await run([(1, record("alice")), (2, record("bob")), (3, record("carol"))])
+    assert result["rows"][2] == {"row": 2, "status": "failed", "message": "Error creating user in Keycloak: Keycloak down"}
+    assert result["rows"][1]["status"] == result["rows"][3]["status"] == "success"
+    assert inserted == ["alice", "carol"]
+    assert backend.deleted == []
+
+
+async def test_partial_insert_failure_rolls_back_only_failed_rows(backend):
+    backend.insert = lambda users: [1]
+    result = await run([(1, record("alice")), (2, record("bob")), (3, record("carol"))])
+    assert result["rows"][2] == {"row": 2, "status": "failed", "message": "Failed to save user to database"}
+    assert result["rows"][1]["status"] == result["rows"][3]["status"] == "success"
+    assert backend.deleted == ["kc-bob"]
+    assert result["summary"] == {"total": 3, "created": 2, "failed": 1}
+
+
+async def test_insert_error_keeps_the_documents_it_wrote(backend):
+    written = []
+
+    def insert(users):
+        written.append(users[0].id)
+        raise ExecutionTimeout("operation exceeded time limit")
+
+    backend.insert = insert
+    backend.saved = lambda user_ids: {user_id for user_id in user_ids if user_id in written}
+    result = await run([(1, record("alice")), (2, record("bob"))])
+    assert result["rows"][1]["status"] == "success"
+    assert result["rows"][2]["status"] == "failed"
+    assert backend.deleted == ["kc-bob"]
+
+
+async def test_insert_error_without_saved_check_rolls_back_everything(backend):
+    def unavailable(*args):
+        raise ExecutionTimeout("operation exceeded time limit")
+
+    backend.insert = backend.saved = unavailable
+    result = await run([(1, record("alice")), (2, record("bob"))])
+    assert result["summary"] == {"total": 2, "created": 0, "failed": 2}
+    assert sorted(backend.deleted) == ["kc-alice", "kc-bob"]
+
+
+async def test_too_many_rows_are_refused(backend, monkeypatch):
+    monkeypatch.setattr(user_manager.settings, "BULK_MAX_ROWS", 1)
+    results = [result async for result in manager.bulk_create_users([(1, record("a")), (2, record("b"))])]
+    assert results == [{"status": "failed", "message": "Too many rows: 2 (max 1)"}]
+    assert backend.created == []
+
+
+async def test_insert_many_users_reports_write_error_indexes(monkeypatch):
+    async def insert_many(users, ordered=True, session=None):
+        assert ordered is False
+        raise BulkWriteError({"writeErrors": [{"index": 2}, {"index": 0}, {"index": 2}]})
+
+    monkeypatch.setattr(user_db.User, "insert_many", insert_many)
+    users = [types.SimpleNamespace(id=None) for _ in range(3)]
+    assert await user_db.insert_many_users(users) == [0, 2]
+    assert all(isinstance(user.id, ObjectId) for user in users)
@@ -0,0 +1,138 @@
+import base64
+import json
+import types
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from shared.cache import ttl_cache
+from shared.identity import IdentityError, IdentityVerifier, decode_identity, encode_identity
+from shared.identity import envelope as envelope_module
+from shared.identity.envelope import CLOCK_SKEW
+
+KEY = "signing-key"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = {"t": 1_700_000_000.0}
+    fake = types.SimpleNamespace(time=lambda: now["t"], monotonic=lambda: now["t"])
+    monkeypatch.setattr(envelope_module, "time", fake)
+    monkeypatch.setattr(ttl_cache, "time", fake)
+    return now
+
+
+def b64(data: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).rstrip(b"=").decode()
+
+
+def test_round_trip(clock):
+    envelope = encode_identity(KEY, 60, user_id="u1", role_ids=["r1", "r2"])
+    assert envelope.startswith("v1.")
+    assert decode_identity(KEY, envelope) == {"i": "u1", "r": ["r1", "r2"], "e": 1_700_000_060}
+
+
+def test_tampered_payload_is_rejected(clock):
+    version, _, signature = encode_identity(KEY, 60, user_id="u1", role_ids=["user"]).split(".")
+    forged = b64({"i": "u1", "r": ["admin"], "e": 1_700_000_060})
+    with pytest.raises(IdentityError, match="signature"):
+        decode_identity(KEY, f"{version}.{forged}.{signature}")
+
+
+def test_tampered_signature_is_rejected(clock):
+    envelope = encode_identity(KEY, 60, user_id="u1", role_ids=[])
+    signature = envelope.rsplit(".", 1)[1]
+    tampered = envelope[:-len(signature)] + ("A" if signature[0] != "A" else "B") + signature[1:]
+    with pytest.raises(IdentityError, match="signature"):
+        decode_identity(KEY, tampered)
+
+
+def test_wrong_key_is_rejected(clock):
+    envelope = encode_identity(KEY, 60, user_id="u1", role_ids=[])
+    with pytest.raises(IdentityError, match="signature"):
+        decode_identity("other-key", envelope)
+
+
+def test_unsupported_version_is_rejected(clock):
+    _, payload, signature = encode_identity(KEY, 60, user_id="u1", role_ids=[]).split(".")
+    with pytest.raises(IdentityError, match="version"):
+        decode_identity(KEY, f"v2.{payload}.{signature}")
+
+
+@pytest.mark.parametrize("envelope", ["", "v1", "v1.payload", "v1.a.b.c"])
+def test_malformed_envelope_is_rejected(clock, envelope):
+    with pytest.raises(IdentityError, match="Malformed"):
+        decode_identity(KEY, envelope)
+
+
+def test_signed_payload_without_expiry_is_rejected(clock):
+    signed_part = f"v1.{b64({'i': 'u1', 'r': []})}"
+    with pytest.raises(IdentityError, match="Malformed"):
+        decode_identity(KEY, f"{signed_part}.{envelope_module._sign(KEY, signed_part)}")
+
+
+def test_expiry_allows_clock_skew(clock):
+    envelope = encode_identity(KEY, 60, user_id="u1", role_ids=[])
+    clock["t"] += 60 + CLOCK_SKEW
+    assert decode_identity(KEY, envelope)["i"] == "u1"
+    clock["t"] += 1
+    with pytest.raises(IdentityError, match="expired"):
+        decode_identity(KEY, envelope)
+
+
+def test_system_identity_maps_to_empty_user(clock):
+    verifier = IdentityVerifier(KEY)
+    assert verifier.verify(encode_identity(KEY, 60, system=True)) == {}
+    assert verifier.verify(encode_identity(KEY, 60, user_id="u1", role_ids=["r1"])) == {"id": "u1", "roles": ["r1"]}
+
+
+def test_verifier_cache_does_not_outlive_expiry(clock):
+    verifier = IdentityVerifier(KEY)
+    envelope = encode_identity(KEY, 60, user_id="u1", role_ids=[])
+    verifier.verify(envelope)
+    clock["t"] += 30
+    assert verifier.verify(envelope) == {"id": "u1", "roles": []}
+    assert verifier.cache.hits == 1
+    clock["t"] += 30 + CLOCK_SKEW + 1
+    with pytest.raises(IdentityError, match="expired"):
+        verifier.verify(envelope)
+
+
+def test_verifier_returns_copies(clock):
+    verifier = IdentityVerifier(KEY)
+    envelope = encode_identity(KEY, 60, user_id="u1", role_ids=[])
+    verifier.verify(envelope)["id"] = "someone-else"
+    assert verifier.verify(envelope)["id"] == "u1"
+
+
+@pytest.fixture
+def client(monkeypatch):
+    from core.config import settings
+    from utils import identity
+
+    monkeypatch.setattr(settings, "IDENTITY_SIGNING_KEY", KEY)
+    monkeypatch.setattr(identity, "identity_verifier", IdentityVerifier(KEY))
+    app = FastAPI()
+
+    @app.get("/whoami")
+    async def whoami(user: dict = Depends(identity.get_request_user)):
+        return user
+
+    return TestClient(app)
+
+
+def test_request_user_from_valid_identity(client):
+    envelope = encode_identity(KEY, 60, user_id="u1", role_ids=["r1"])
+    response = client.get("/whoami", headers={"X-Identity": envelope})
+    assert response.status_code == 200
+    assert response.json() == {"id": "u1", "roles": ["r1"]}
+
+
+def test_missing_identity_is_unauthorized(client):
+    response = client.get("/whoami", headers={"X-User": json.dumps({"id": "u1", "roles": ["admin"]})})
+    assert response.status_code == 401
+
+
+@pytest.mark.parametrize("envelope", ["garbage", encode_identity("other-key", 60, user_id="u1", role_ids=[])])
+def test_invalid_identity_is_unauthorized(client, envelope):
+    response = client.get("/whoami", headers={"X-Identity": envelope})
+    assert response.status_code == 401
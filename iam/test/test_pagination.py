@@ -0,0 +1,92 @@
+import base64
+from datetime import datetime, timedelta, timezone
+import mongomock
+import pytest
+from bson import ObjectId
+from domains.users.db.mongo import user as user_db
+from domains.users.schemas import ListUsers
+from domains.users.services.user_manager import manager
+from utils.pagination import decode_cursor, encode_cursor
+
+CREATED = datetime(2026, 1, 1, 12, 0, 0, tzinfo=timezone.utc)
+
+
+def test_cursor_round_trip():
+    last_id = ObjectId()
+    created_at = datetime(2026, 3, 4, 5, 6, 7, 891000, tzinfo=timezone.utc)
+    cursor = encode_cursor(created_at, last_id)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (created_at, last_id)
+
+
+@pytest.mark.parametrize("cursor", [
+    "",
+    "not base64!",
+    base64.urlsafe_b64encode(b'["2026-01-01T00:00:00"]').decode(),
+    base64.urlsafe_b64encode(b'["yesterday","665f1c0a3e1f2a0012345678"]').decode(),
+    base64.urlsafe_b64encode(b'["2026-01-01T00:00:00","not-an-object-id"]').decode(),
+])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(cursor)
+
+
+class AsyncCursor:
+    """The part of a Motor cursor used by list_users_page, over a mongomock cursor."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def sort(self, keys):
+        self._cursor = self._cursor.sort(keys)
+        return self
+
+    def limit(self, limit):
+        self._cursor = self._cursor.limit(limit)
+        return self
+
+    async def to_list(self, length):
+        return list(self._cursor)[:length]
+
+
+class AsyncCollection:
+    def __init__(self, collection):
+        self._collection = collection
+
+    def find(self, query, projection=None, session=None):
+        return AsyncCursor(self._collection.find(query, projection))
+
+
+@pytest.fixture
+def users(monkeypatch):
+    collection = mongomock.MongoClient(tz_aware=True).db.users
+    monkeypatch.setattr(user_db, "_lookup_collection", lambda primary=False: AsyncCollection(collection))
+    # five users created in the same millisecond between an older and a newer one
+    docs = [{"_id": ObjectId(), "user_name": "oldest", "created_at": CREATED - timedelta(seconds=1)}]
+    docs += [{"_id": ObjectId(), "user_name": f"same-{i}", "created_at": CREATED} for i in range(5)]
+    docs += [{"_id": ObjectId(), "user_name": "newest", "created_at": CREATED + timedelta(seconds=1)}]
+    collection.insert_many(docs)
+    return sorted(docs, key=lambda doc: (doc["created_at"], doc["_id"]), reverse=True)
+
+
+async def test_pages_break_created_at_ties_by_id(users):
+    seen, cursor = [], None
+    for _ in range(len(users)):
+        result = await manager.list_users(ListUsers(limit=2, cursor=cursor, fields=["id", "user_name"]))
+        assert result["status"] == "success"
+        seen += [user["user_name"] for user in result["data"]["users"]]
+        cursor = result["data"]["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == [doc["user_name"] for doc in users]
+
+
+async def test_page_after_a_tied_user_starts_at_the_next_id(users):
+    tied = [doc for doc in users if doc["created_at"] == CREATED]
+    docs = await user_db.list_users_page(10, (CREATED, tied[1]["_id"]))
+    assert [doc["_id"] for doc in docs] == [doc["_id"] for doc in tied[2:]] + [users[-1]["_id"]]
+
+
+async def test_invalid_cursor_fails_the_request(users):
+    result = await manager.list_users(ListUsers(cursor="garbage"))
+    assert result == {"status": "failed", "message": "error listing users"}
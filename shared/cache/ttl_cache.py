@@ -0,0 +1,141 @@
+"""
+In-process TTL cache with LRU eviction and single-flight loading.
+Used by services that keep hot lookups in memory between requests.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set, Tuple
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Bounded LRU cache where every entry expires after a TTL.
+
+    Concurrent misses on the same key share a single call to the loader,
+    so a burst of requests for a cold key results in one upstream call.
+    A load still running when its key is deleted (or the cache cleared)
+    returns its value to its callers but does not store it: it may predate
+    the change that caused the invalidation.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 60.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        # loads invalidated while running (by their future)
+        self._invalidated: Set[asyncio.Future] = set()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return a fresh cached value, or default if missing or expired."""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a value, evicting the least recently used entries when full."""
+        if self.max_size <= 0:
+            return
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> bool:
+        """
+        Remove a key. A load of it already running will not store its result.
+        Returns True if the key was present.
+        """
+        inflight = self._inflight.pop(key, None)
+        if inflight is not None:
+            self._invalidated.add(inflight)
+        return self._data.pop(key, None) is not None
+
+    def clear(self) -> None:
+        """Remove every key, and keep loads already running from storing their results."""
+        self._invalidated.update(self._inflight.values())
+        self._inflight.clear()
+        self._data.clear()
+
+    def items(self) -> list:
+        """Snapshot of unexpired (key, value) pairs, without touching LRU order."""
+        now = time.monotonic()
+        return [(key, value) for key, (expires_at, value) in list(self._data.items()) if expires_at > now]
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+    async def get_or_load(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: Optional[float] = None,
+        cache_none: bool = False,
+    ) -> Any:
+        """
+        Return the cached value for key, calling loader on a miss.
+
+        Args:
+            key: Cache key
+            loader: Coroutine factory producing the value
+            ttl: Optional TTL override for this entry
+            cache_none: Whether a None result should be cached
+
+        Returns:
+            The cached or freshly loaded value
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await loader()
+        except Exception as e:
+            future.set_exception(e)
+            # Retrieve the exception so it is not reported as never retrieved
+            future.exception()
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        else:
+            if (value is not None or cache_none) and future not in self._invalidated:
+                self.set(key, value, ttl)
+            future.set_result(value)
+            return value
+        finally:
+            self._invalidated.discard(future)
+            # a load started after an invalidation may have taken the key meanwhile
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
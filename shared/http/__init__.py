@@ -0,0 +1,4 @@
+from .responses import FastJSONResponse, dumps, loads
+from .compression import CompressionMiddleware
+
+__all__ = ["FastJSONResponse", "CompressionMiddleware", "dumps", "loads"]
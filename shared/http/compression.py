@@ -0,0 +1,169 @@
+"""
+Response compression negotiated from Accept-Encoding: gzip always, brotli
+and zstd when the 'brotli' / 'zstandard' packages are installed.
+
+Only allowlisted content types at or above a minimum size are compressed.
+Responses that already carry a Content-Encoding (e.g. compressed upstream
+bodies passed through by the gateway) are sent untouched. Streaming
+responses are compressed chunk by chunk and flushed after each chunk, so
+NDJSON progress still reaches the client as it is produced.
+"""
+
+import zlib
+from typing import Dict, Optional, Sequence
+from starlette.datastructures import Headers, MutableHeaders
+from auth_gateway_serverkit.logger import init_logger
+
+logger = init_logger(__name__)
+
+
+class _GzipEncoder:
+    def __init__(self):
+        self._compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+class _BrotliEncoder:
+    def __init__(self, brotli):
+        # quality 4 is a good speed/ratio trade-off for on-the-fly compression
+        self._compressor = brotli.Compressor(quality=4)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.process(data) + self._compressor.finish()
+
+
+class _ZstdEncoder:
+    def __init__(self, zstandard):
+        self._flush_block = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        self._compressor = zstandard.ZstdCompressor(level=3).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(self._flush_block)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+def _available_encoders(encodings: Sequence[str]) -> Dict[str, callable]:
+    factories = {}
+    for encoding in encodings:
+        if encoding == "gzip":
+            factories["gzip"] = _GzipEncoder
+        elif encoding == "br":
+            try:
+                import brotli
+                factories["br"] = lambda brotli=brotli: _BrotliEncoder(brotli)
+            except ImportError:
+                logger.warning("Brotli compression requested but the 'brotli' package is not installed")
+        elif encoding == "zstd":
+            try:
+                import zstandard
+                factories["zstd"] = lambda zstandard=zstandard: _ZstdEncoder(zstandard)
+            except ImportError:
+                logger.warning("Zstd compression requested but the 'zstandard' package is not installed")
+        else:
+            logger.warning(f"Unknown compression encoding '{encoding}' ignored")
+    return factories
+
+
+def _accepted(accept_encoding: str) -> Dict[str, float]:
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name.strip().lower()] = q
+    return accepted
+
+
+class CompressionMiddleware:
+    def __init__(
+        self,
+        app,
+        encodings: Sequence[str] = ("br", "zstd", "gzip"),
+        minimum_size: int = 1024,
+        content_types: Sequence[str] = ("application/json", "application/x-ndjson", "text/"),
+    ):
+        self.app = app
+        # server preference order, restricted to what is installed
+        self.encoders = _available_encoders(encodings)
+        self.minimum_size = minimum_size
+        self.content_types = tuple(content_types)
+
+    def _choose(self, scope) -> Optional[str]:
+        accept_encoding = Headers(scope=scope).get("accept-encoding")
+        if not accept_encoding:
+            return None
+        accepted = _accepted(accept_encoding)
+        for encoding in self.encoders:
+            if accepted.get(encoding, accepted.get("*", 0)) > 0:
+                return encoding
+        return None
+
+    async def __call__(self, scope, receive, send):
+        encoding = self._choose(scope) if scope["type"] == "http" and self.encoders else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        encoder = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, encoder, passthrough
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                content_type = headers.get("content-type", "")
+                if "content-encoding" in headers or not content_type.startswith(self.content_types):
+                    passthrough = True
+                    await send(message)
+                else:
+                    # wait for the first body chunk to know whether compression pays off
+                    start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start_message is not None:
+                headers = MutableHeaders(raw=start_message["headers"])
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                encoder = self.encoders[encoding]()
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if more_body:
+                    del headers["Content-Length"]
+                    body = encoder.compress(body)
+                else:
+                    body = encoder.finish(body)
+                    headers["Content-Length"] = str(len(body))
+                await send(start_message)
+                start_message = None
+                await send({"type": "http.response.body", "body": body, "more_body": more_body})
+                return
+
+            body = encoder.compress(body) if more_body else encoder.finish(body)
+            await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,33 @@
+"""
+JSON encoding for API responses: orjson when installed, the stdlib json
+module (with JSONResponse's compact settings) otherwise.
+"""
+
+import json
+from typing import Any
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize to compact UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(body: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+class FastJSONResponse(JSONResponse):
+    """Drop-in JSONResponse rendering through orjson when it is available."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
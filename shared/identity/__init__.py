@@ -0,0 +1,3 @@
+from .envelope import IdentityError, IdentityVerifier, decode_identity, encode_identity
+
+__all__ = ["IdentityError", "IdentityVerifier", "decode_identity", "encode_identity"]
@@ -0,0 +1,4 @@
+from .admin_token import AdminTokenManager
+from .instrumentation import keycloak_call, instrument_keycloak
+
+__all__ = ["AdminTokenManager", "keycloak_call", "instrument_keycloak"]
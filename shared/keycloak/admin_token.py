@@ -0,0 +1,233 @@
+"""
+Keycloak admin token manager shared by the gateway and IAM.
+Keeps one admin token in memory and renews it before it expires, so admin
+API calls do not each pay for a password-grant round trip.
+"""
+
+import asyncio
+import base64
+import json
+import sys
+import time
+from contextvars import ContextVar
+from functools import wraps
+from typing import Awaitable, Callable, List, Optional
+import httpx
+from auth_gateway_serverkit.logger import init_logger
+
+logger = init_logger(__name__)
+
+# serverkit modules that import get_admin_token() from its client module
+SERVERKIT_TOKEN_MODULES = (
+    "auth_gateway_serverkit.keycloak.user",
+    "auth_gateway_serverkit.keycloak.role",
+    "auth_gateway_serverkit.keycloak.initializer",
+)
+
+
+# status codes of the Keycloak responses seen by the current retry_unauthorized() call
+_response_statuses: ContextVar[Optional[List[int]]] = ContextVar("keycloak_admin_statuses", default=None)
+
+
+async def _record_status(response: httpx.Response):
+    statuses = _response_statuses.get()
+    if statuses is not None:
+        statuses.append(response.status_code)
+
+
+class _StatusRecordingHttpx:
+    """
+    Stands in for the httpx module inside serverkit helpers: their clients
+    report response status codes to retry_unauthorized(), since the helpers
+    themselves only return a status/message dict.
+    """
+
+    def __getattr__(self, name):
+        return getattr(httpx, name)
+
+    @staticmethod
+    def AsyncClient(*args, **kwargs) -> httpx.AsyncClient:
+        hooks = dict(kwargs.pop("event_hooks", None) or {})
+        hooks["response"] = [*hooks.get("response", []), _record_status]
+        return httpx.AsyncClient(*args, event_hooks=hooks, **kwargs)
+
+
+def token_lifetime(token: str) -> float:
+    """Seconds until the JWT's exp claim. The signature is not checked: Keycloak issued it to us."""
+    try:
+        payload = token.split(".")[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        return max(float(claims["exp"]) - time.time(), 0.0)
+    except (IndexError, KeyError, TypeError, ValueError):
+        return 0.0
+
+
+class AdminTokenManager:
+    """
+    Holds the Keycloak admin token and refreshes it at `refresh_fraction`
+    of its lifetime, either lazily on access or from a background task.
+
+    Concurrent refreshes are collapsed behind a lock, and `request()`
+    retries an admin call once with a new token when Keycloak answers 401.
+    """
+
+    def __init__(
+        self,
+        fetch_token: Callable[[], Awaitable[Optional[str]]],
+        refresh_fraction: float = 0.75,
+        retry_interval: float = 5.0,
+    ):
+        self._fetch_token = fetch_token
+        self.refresh_fraction = min(max(refresh_fraction, 0.1), 1.0)
+        self.retry_interval = retry_interval
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._refresh_at = 0.0
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.refreshes = 0
+        self.failures = 0
+        self.unauthorized_retries = 0
+        self.last_refresh_ms = 0.0
+        self._refresh_ms_total = 0.0
+
+    def _usable(self) -> bool:
+        return self._token is not None and time.monotonic() < self._refresh_at
+
+    async def get_token(self, force_refresh: bool = False) -> Optional[str]:
+        """Return a valid admin token, fetching a new one if due (or forced)."""
+        if not force_refresh and self._usable():
+            return self._token
+        stale = self._token
+        async with self._lock:
+            # Another caller refreshed while we waited for the lock
+            if self._token is not stale or (not force_refresh and self._usable()):
+                return self._token
+            return await self._refresh()
+
+    async def _refresh(self) -> Optional[str]:
+        started = time.monotonic()
+        try:
+            token = await self._fetch_token()
+        except Exception as e:
+            logger.error(f"Admin token refresh error: {e}")
+            token = None
+        elapsed_ms = (time.monotonic() - started) * 1000
+        self.last_refresh_ms = round(elapsed_ms, 2)
+
+        if not token:
+            self.failures += 1
+            # Keep serving the previous token while it has not expired, retrying later
+            if self._token and time.monotonic() < self._expires_at:
+                self._refresh_at = min(time.monotonic() + self.retry_interval, self._expires_at)
+                return self._token
+            self._token = None
+            return None
+
+        lifetime = token_lifetime(token)
+        now = time.monotonic()
+        self._token = token
+        self._expires_at = now + lifetime
+        self._refresh_at = now + lifetime * self.refresh_fraction
+        self.refreshes += 1
+        self._refresh_ms_total += elapsed_ms
+        return token
+
+    def invalidate(self):
+        """Forget the current token; the next get_token() fetches a new one."""
+        self._token = None
+        self._expires_at = 0.0
+        self._refresh_at = 0.0
+
+    async def request(self, client, method: str, url: str, **kwargs):
+        """
+        Send an admin API request with the bearer token, retrying once with a
+        fresh token on 401. Returns None if no token can be obtained.
+        """
+        headers = kwargs.pop("headers", None) or {}
+        response = None
+        for attempt in range(2):
+            token = await self.get_token(force_refresh=attempt > 0)
+            if not token:
+                return None
+            response = await client.request(method, url, headers={**headers, "Authorization": f"Bearer {token}"}, **kwargs)
+            if response.status_code != 401:
+                return response
+            if attempt == 0:
+                self.unauthorized_retries += 1
+        return response
+
+    def retry_unauthorized(self, func: Callable[..., Awaitable[dict]]) -> Callable[..., Awaitable[dict]]:
+        """
+        Wrap a serverkit admin helper: when Keycloak answers its first request
+        with 401, drop the token and run the helper once more. A 401 later in
+        the helper is not retried, since earlier requests may have written.
+        """
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            for attempt in range(2):
+                statuses: List[int] = []
+                context = _response_statuses.set(statuses)
+                try:
+                    result = await func(*args, **kwargs)
+                finally:
+                    _response_statuses.reset(context)
+                if attempt or not statuses or statuses[0] != 401:
+                    return result
+                self.unauthorized_retries += 1
+                self.invalidate()
+            return result
+        return wrapper
+
+    async def _refresh_periodically(self):
+        while True:
+            delay = self._refresh_at - time.monotonic() if self._usable() else self.retry_interval
+            await asyncio.sleep(delay)
+            try:
+                async with self._lock:
+                    if not self._usable():
+                        await self._refresh()
+            except Exception as e:
+                logger.error(f"Error in periodic admin token refresh: {e}")
+
+    def start_background_refresh(self):
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_periodically())
+
+    async def stop_background_refresh(self):
+        if self._refresh_task:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+
+    def stats(self) -> dict:
+        return {
+            "has_token": self._token is not None,
+            "expires_in": round(max(self._expires_at - time.monotonic(), 0.0), 1) if self._token else 0.0,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "unauthorized_retries": self.unauthorized_retries,
+            "last_refresh_ms": self.last_refresh_ms,
+            "avg_refresh_ms": round(self._refresh_ms_total / self.refreshes, 2) if self.refreshes else 0.0,
+        }
+
+    def install_for_serverkit(self):
+        """
+        Make the auth_gateway_serverkit Keycloak helpers (user, role,
+        initializer) take their admin token from this manager, and let
+        retry_unauthorized() see the status codes of their requests.
+        """
+        for name in SERVERKIT_TOKEN_MODULES:
+            module = sys.modules.get(name)
+            if module is None:
+                try:
+                    module = __import__(name, fromlist=["get_admin_token"])
+                except ImportError:
+                    continue
+            if hasattr(module, "get_admin_token"):
+                module.get_admin_token = self.get_token
+            if getattr(module, "httpx", None) is httpx:
+                module.httpx = _StatusRecordingHttpx()
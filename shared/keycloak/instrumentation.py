@@ -0,0 +1,27 @@
+"""
+Timing and tracing for calls to Keycloak: each call is observed under
+keycloak_request_duration_seconds{operation} and wrapped in a client span.
+"""
+
+from contextlib import asynccontextmanager
+from functools import wraps
+from shared.metrics import KEYCLOAK_LATENCY
+from shared.tracing import KIND_CLIENT, tracer
+
+
+@asynccontextmanager
+async def keycloak_call(operation: str):
+    with tracer.start_span(f"keycloak.{operation}", KIND_CLIENT, attributes={"keycloak.operation": operation}):
+        with KEYCLOAK_LATENCY.time(operation=operation):
+            yield
+
+
+def instrument_keycloak(operation: str):
+    """Decorator form of keycloak_call for async functions."""
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            async with keycloak_call(operation):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
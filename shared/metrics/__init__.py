@@ -0,0 +1,98 @@
+"""
+Process-wide metrics registry shared by the gateway and IAM, exposed in the
+Prometheus text format on each app's /metrics endpoint.
+
+Metrics are per process: with several workers each one reports its own
+series, so scrape every worker or run a single worker per container.
+"""
+
+import hmac
+from typing import Callable, Dict, Optional
+from starlette.responses import PlainTextResponse, Response
+from .registry import Counter, Histogram, Registry, timed
+from .middleware import MetricsMiddleware
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+registry = Registry()
+
+HTTP_LATENCY = registry.histogram(
+    "http_request_duration_seconds",
+    "Time spent serving HTTP requests, by route template.",
+    ("method", "route", "status", "service", "action"),
+)
+UPSTREAM_LATENCY = registry.histogram(
+    "upstream_request_duration_seconds",
+    "Gateway to upstream service call latency, until response headers.",
+    ("service", "action", "status"),
+)
+KEYCLOAK_LATENCY = registry.histogram(
+    "keycloak_request_duration_seconds",
+    "Keycloak call latency, by operation.",
+    ("operation",),
+)
+MONGO_LATENCY = registry.histogram(
+    "mongo_operation_duration_seconds",
+    "MongoDB operation latency, by collection and data access function.",
+    ("collection", "operation"),
+)
+
+_caches: Dict[str, Callable[[], dict]] = {}
+
+
+def register_cache(name: str, stats: Callable[[], dict]):
+    """Expose the hits/misses of a cache's stats() as metrics, read at scrape time."""
+    _caches[name] = stats
+
+
+def _cache_samples(*fields: str):
+    for name, stats in list(_caches.items()):
+        values = stats()
+        for field in fields:
+            if field in values:
+                yield {"cache": name, "result": field}, values[field]
+
+
+registry.callback(
+    "cache_requests", "Cache lookups, by cache and result.", "counter", ("cache", "result"),
+    lambda: _cache_samples("hits", "stale_hits", "misses"),
+)
+registry.callback(
+    "cache_hit_ratio", "Share of cache lookups served from the cache.", "gauge", ("cache",),
+    lambda: (({"cache": name}, stats().get("hit_ratio", 0.0)) for name, stats in list(_caches.items())),
+)
+registry.callback(
+    "cache_entries", "Current number of cache entries.", "gauge", ("cache",),
+    lambda: (({"cache": name}, stats().get("size", 0)) for name, stats in list(_caches.items())),
+)
+
+
+def metrics_response(
+    authorization: Optional[str] = None, token: Optional[str] = None, require_token: bool = False
+) -> Response:
+    """
+    Render the registry; when a token is configured, require it as a Bearer token.
+    With require_token, metrics are not served at all until a token is configured.
+    """
+    if not token:
+        if require_token:
+            return PlainTextResponse("Metrics disabled: no metrics token configured\n", status_code=404)
+    elif not hmac.compare_digest(authorization or "", f"Bearer {token}"):
+        return PlainTextResponse("Access denied\n", status_code=403)
+    return Response(content=registry.render(), media_type=CONTENT_TYPE)
+
+
+__all__ = [
+    "Counter",
+    "Histogram",
+    "Registry",
+    "MetricsMiddleware",
+    "registry",
+    "timed",
+    "register_cache",
+    "metrics_response",
+    "HTTP_LATENCY",
+    "UPSTREAM_LATENCY",
+    "KEYCLOAK_LATENCY",
+    "MONGO_LATENCY",
+]
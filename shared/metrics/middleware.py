@@ -0,0 +1,51 @@
+import time
+from typing import Sequence
+from .registry import OTHER, Histogram
+
+# responses that any caller can trigger with arbitrary paths; their path params are not used as labels
+_UNLABELED_STATUSES = frozenset({401, 403, 404})
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware observing request latency per route template.
+
+    The route label is the matched route's path template (never the raw
+    path), and only the listed path params (e.g. service/action) are used
+    as extra labels, so label cardinality stays bounded. Streaming responses
+    are timed until their last chunk has been sent.
+    """
+
+    def __init__(self, app, histogram: Histogram, path_params: Sequence[str] = (), skip_paths: Sequence[str] = ("/metrics",)):
+        self.app = app
+        self.histogram = histogram
+        self.path_params = tuple(path_params)
+        self.skip_paths = frozenset(skip_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            labels = {
+                "method": scope["method"],
+                "route": getattr(route, "path", None) or "unmatched",
+                "status": str(status_code),
+            }
+            params = scope.get("path_params") or {}
+            for name in self.path_params:
+                labels[name] = OTHER if name in params and status_code in _UNLABELED_STATUSES else params.get(name, "")
+            self.histogram.observe(time.perf_counter() - started, **labels)
@@ -0,0 +1,50 @@
+"""
+Request tracing shared by the gateway and IAM: W3C traceparent
+propagation, spans around Keycloak and MongoDB calls, and export to a
+JSON Lines file or an OTLP/HTTP collector.
+"""
+
+from typing import Optional
+from .tracer import (
+    KIND_CLIENT, KIND_INTERNAL, KIND_SERVER, Span, SpanContext, Tracer,
+    current_span, inject, parse_traceparent, traced, tracer,
+)
+from .exporters import BatchSpanProcessor, FileExporter, OTLPHttpExporter, build_processor
+from .middleware import TracingMiddleware
+
+
+def setup_tracing(service_name: str, exporter: str, sample_ratio: float, file_path: str, otlp_endpoint: Optional[str] = None):
+    """Configure the process tracer and start its exporter (call from the app lifespan)."""
+    processor = build_processor(exporter, service_name, file_path, otlp_endpoint)
+    tracer.configure(service_name, sample_ratio, processor)
+    if processor is not None:
+        processor.start()
+
+
+async def shutdown_tracing():
+    """Flush buffered spans and stop the exporter."""
+    processor = tracer.processor
+    tracer.configure(tracer.service_name, tracer.sample_ratio, None)
+    if processor is not None:
+        await processor.shutdown()
+
+
+__all__ = [
+    "KIND_CLIENT",
+    "KIND_INTERNAL",
+    "KIND_SERVER",
+    "Span",
+    "SpanContext",
+    "Tracer",
+    "BatchSpanProcessor",
+    "FileExporter",
+    "OTLPHttpExporter",
+    "TracingMiddleware",
+    "current_span",
+    "inject",
+    "parse_traceparent",
+    "traced",
+    "tracer",
+    "setup_tracing",
+    "shutdown_tracing",
+]
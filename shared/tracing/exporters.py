@@ -0,0 +1,174 @@
+"""
+Span export: a batching processor plus JSON Lines file and OTLP/HTTP exporters.
+Spans are exported from a background task, never on the request path.
+"""
+
+import asyncio
+import json
+from typing import List, Optional
+import httpx
+from auth_gateway_serverkit.logger import init_logger
+from .tracer import Span
+
+logger = init_logger(__name__)
+
+
+def _span_to_dict(span: Span, service_name: str) -> dict:
+    return {
+        "service": service_name,
+        "trace_id": span.context.trace_id,
+        "span_id": span.context.span_id,
+        "parent_span_id": span.parent_span_id,
+        "name": span.name,
+        "kind": span.kind,
+        "start_ns": span.start_ns,
+        "duration_ms": round((span.end_ns - span.start_ns) / 1e6, 3),
+        "attributes": span.attributes,
+        "error": span.error,
+    }
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _span_to_otlp(span: Span) -> dict:
+    otlp = {
+        "traceId": span.context.trace_id,
+        "spanId": span.context.span_id,
+        "name": span.name,
+        "kind": span.kind,
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns),
+        "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in span.attributes.items()],
+        "status": {"code": 2, "message": span.error} if span.error else {"code": 0},
+    }
+    if span.parent_span_id:
+        otlp["parentSpanId"] = span.parent_span_id
+    return otlp
+
+
+class FileExporter:
+    """Append finished spans as JSON Lines; handy for local inspection."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def _write(self, lines: List[str]):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.writelines(lines)
+
+    async def export(self, spans: List[Span], service_name: str):
+        lines = [json.dumps(_span_to_dict(span, service_name), default=str) + "\n" for span in spans]
+        await asyncio.to_thread(self._write, lines)
+
+    async def close(self):
+        pass
+
+
+class OTLPHttpExporter:
+    """POST spans to an OTLP/HTTP collector using the JSON encoding (e.g. http://collector:4318/v1/traces)."""
+
+    def __init__(self, endpoint: str, timeout: float = 5.0):
+        self.endpoint = endpoint
+        self._client = httpx.AsyncClient(timeout=timeout)
+
+    async def export(self, spans: List[Span], service_name: str):
+        body = {
+            "resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+                "scopeSpans": [{"scope": {"name": "auth-gateway"}, "spans": [_span_to_otlp(span) for span in spans]}],
+            }]
+        }
+        response = await self._client.post(self.endpoint, json=body)
+        response.raise_for_status()
+
+    async def close(self):
+        await self._client.aclose()
+
+
+class BatchSpanProcessor:
+    """
+    Buffer finished spans and hand them to the exporter in batches, every
+    `interval` seconds or as soon as `max_batch` spans are waiting. The
+    buffer is bounded; spans arriving while it is full are dropped.
+    """
+
+    def __init__(self, exporter, service_name: str, interval: float = 5.0, max_batch: int = 512, max_queue: int = 10000):
+        self.exporter = exporter
+        self.service_name = service_name
+        self.interval = interval
+        self.max_batch = max_batch
+        self.max_queue = max_queue
+        self._spans: List[Span] = []
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.exported = 0
+        self.dropped = 0
+        self.failures = 0
+
+    def on_end(self, span: Span):
+        if len(self._spans) >= self.max_queue:
+            self.dropped += 1
+            return
+        self._spans.append(span)
+        if len(self._spans) >= self.max_batch:
+            self._wakeup.set()
+
+    async def flush(self):
+        while self._spans:
+            batch, self._spans = self._spans[:self.max_batch], self._spans[self.max_batch:]
+            try:
+                await self.exporter.export(batch, self.service_name)
+                self.exported += len(batch)
+            except Exception as e:
+                self.failures += 1
+                self.dropped += len(batch)
+                logger.warning(f"Span export failed: {e}")
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def shutdown(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        await self.exporter.close()
+
+    def stats(self) -> dict:
+        return {"queued": len(self._spans), "exported": self.exported, "dropped": self.dropped, "failures": self.failures}
+
+
+def build_processor(exporter: str, service_name: str, file_path: str, otlp_endpoint: Optional[str]) -> Optional[BatchSpanProcessor]:
+    """Processor for the configured exporter ("file", "otlp" or "none")."""
+    if exporter == "file":
+        return BatchSpanProcessor(FileExporter(file_path), service_name)
+    if exporter == "otlp":
+        if not otlp_endpoint:
+            logger.warning("Tracing exporter 'otlp' needs an OTLP endpoint; tracing export disabled")
+            return None
+        return BatchSpanProcessor(OTLPHttpExporter(otlp_endpoint), service_name)
+    if exporter not in ("", "none"):
+        logger.warning(f"Unknown tracing exporter '{exporter}'; tracing export disabled")
+    return None
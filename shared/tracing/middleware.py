@@ -0,0 +1,51 @@
+from .tracer import KIND_SERVER, SpanContext, parse_traceparent, tracer
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware opening a server span per request, continuing the
+    incoming traceparent when there is one. With trust_sampled=False the
+    caller's trace id is kept for correlation but the sampling decision is
+    made locally, so external clients cannot force spans to be recorded.
+    """
+
+    def __init__(self, app, trust_sampled: bool = True, skip_paths=("/metrics", "/health", "/readyz")):
+        self.app = app
+        self.trust_sampled = trust_sampled
+        self.skip_paths = frozenset(skip_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+
+        parent = None
+        for key, value in scope["headers"]:
+            if key == b"traceparent":
+                parent = parse_traceparent(value.decode("latin-1"))
+                break
+        if parent is not None and not self.trust_sampled:
+            parent = SpanContext(parent.trace_id, parent.span_id, tracer._should_sample(parent.trace_id))
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = [*message["headers"], (b"traceparent", span.context.traceparent.encode())]
+            await send(message)
+
+        with tracer.start_span(f"{scope['method']} {scope['path']}", KIND_SERVER, parent=parent) as span:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = scope.get("route")
+                if route is not None:
+                    span.name = f"{scope['method']} {route.path}"
+                span.set_attribute("http.method", scope["method"])
+                span.set_attribute("http.target", scope["path"])
+                span.set_attribute("http.status_code", status_code)
+                if status_code >= 500:
+                    span.set_error(f"HTTP {status_code}")
@@ -0,0 +1,181 @@
+"""
+W3C trace context (traceparent) propagation and lightweight spans.
+
+The current span lives in a ContextVar, so it follows a request through
+awaits without being passed around. Sampling is decided once at the root
+(TRACING_SAMPLE_RATIO) and inherited from the incoming traceparent after
+that; unsampled spans only carry ids for propagation and are never
+recorded, which keeps the cost at full traffic to a couple of random ids.
+"""
+
+import random
+import re
+import time
+from contextvars import ContextVar
+from functools import wraps
+from typing import Optional
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+_INVALID_TRACE_ID = "0" * 32
+_INVALID_SPAN_ID = "0" * 16
+
+KIND_INTERNAL = 1
+KIND_SERVER = 2
+KIND_CLIENT = 3
+
+
+class SpanContext:
+    __slots__ = ("trace_id", "span_id", "sampled")
+
+    def __init__(self, trace_id: str, span_id: str, sampled: bool):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[SpanContext]:
+    """Parse a version 00 traceparent header; None if absent or malformed."""
+    if not header:
+        return None
+    match = _TRACEPARENT.match(header.strip().lower())
+    if not match:
+        return None
+    trace_id, span_id, flags = match.groups()
+    if trace_id == _INVALID_TRACE_ID or span_id == _INVALID_SPAN_ID:
+        return None
+    return SpanContext(trace_id, span_id, bool(int(flags, 16) & 1))
+
+
+def _new_span_id() -> str:
+    return f"{random.getrandbits(64) or 1:016x}"
+
+
+def _new_trace_id() -> str:
+    return f"{random.getrandbits(128) or 1:032x}"
+
+
+_current: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class Span:
+    __slots__ = ("name", "kind", "context", "parent_span_id", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, kind: int, context: SpanContext, parent_span_id: Optional[str], attributes: Optional[dict]):
+        self.name = name
+        self.kind = kind
+        self.context = context
+        self.parent_span_id = parent_span_id
+        self.attributes = dict(attributes) if attributes and context.sampled else {}
+        self.error: Optional[str] = None
+        self.start_ns = time.time_ns() if context.sampled else 0
+        self.end_ns = 0
+
+    def set_attribute(self, key: str, value):
+        if self.context.sampled:
+            self.attributes[key] = value
+
+    def set_error(self, message: str):
+        if self.context.sampled:
+            self.error = message
+
+
+class _SpanScope:
+    """Sync/async context manager making a span current for its duration."""
+
+    def __init__(self, tracer: "Tracer", span: Span):
+        self.tracer = tracer
+        self.span = span
+        self._token = None
+
+    def __enter__(self) -> Span:
+        self._token = _current.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self._token)
+        if exc_type is not None and not issubclass(exc_type, GeneratorExit):
+            self.span.set_error(f"{exc_type.__name__}: {exc}")
+        self.tracer.end(self.span)
+        return False
+
+    async def __aenter__(self) -> Span:
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+
+class Tracer:
+    def __init__(self):
+        self.service_name = "unknown"
+        self.sample_ratio = 0.0
+        self.processor = None
+
+    def configure(self, service_name: str, sample_ratio: float, processor=None):
+        self.service_name = service_name
+        self.sample_ratio = max(0.0, min(1.0, sample_ratio))
+        self.processor = processor
+
+    def _should_sample(self, trace_id: str) -> bool:
+        # deterministic on the trace id, so every root in a trace agrees
+        return self.processor is not None and int(trace_id[-8:], 16) < self.sample_ratio * 0x100000000
+
+    def start_span(
+        self,
+        name: str,
+        kind: int = KIND_INTERNAL,
+        parent: Optional[SpanContext] = None,
+        attributes: Optional[dict] = None,
+    ) -> _SpanScope:
+        """
+        Start a span as a child of `parent` (e.g. an incoming traceparent)
+        or of the current span; a new root trace is started otherwise.
+        """
+        if parent is None:
+            current = _current.get()
+            parent = current.context if current is not None else None
+        if parent is None:
+            trace_id = _new_trace_id()
+            context = SpanContext(trace_id, _new_span_id(), self._should_sample(trace_id))
+            parent_span_id = None
+        else:
+            context = SpanContext(parent.trace_id, _new_span_id(), parent.sampled and self.processor is not None)
+            parent_span_id = parent.span_id
+        return _SpanScope(self, Span(name, kind, context, parent_span_id, attributes))
+
+    def end(self, span: Span):
+        if span.context.sampled and self.processor is not None:
+            span.end_ns = time.time_ns()
+            self.processor.on_end(span)
+
+
+tracer = Tracer()
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def inject(headers: dict) -> dict:
+    """Add the current span's traceparent to outgoing request headers."""
+    span = _current.get()
+    if span is not None:
+        headers["traceparent"] = span.context.traceparent
+    return headers
+
+
+def traced(name: Optional[str] = None, kind: int = KIND_INTERNAL, **attributes):
+    """Decorator running an async function inside a span (named after it by default)."""
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            with tracer.start_span(span_name, kind, attributes=attributes):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator